@@ -0,0 +1,3 @@
+"""
+Database backends tuned for the deployments this project runs on
+"""
@@ -0,0 +1,201 @@
+"""
+Process-wide database connection pool
+
+Used by the pooled PostgreSQL backend (DB_POOL=True). Django keeps one
+connection per thread and "closes" it at the end of every request; the
+pooled backend hands those connections back here instead, so a gunicorn
+worker reuses a small set of open connections instead of reconnecting on
+every request or holding one idle connection per thread forever.
+"""
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout"""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections
+
+    Connections are opened lazily with the factory passed to getconn(),
+    up to max_size. Idle connections above min_size are closed after
+    max_idle seconds, and every connection is recycled after max_lifetime.
+    An idle connection the server or a proxy dropped is caught by the
+    check passed to getconn() and replaced before it is handed out.
+    """
+
+    def __init__(self, min_size=1, max_size=10, timeout=30.0, max_idle=300.0, max_lifetime=3600.0):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+
+        self._cond = threading.Condition()
+        self._idle = deque()      # (connection, opened_at, returned_at)
+        self._opened_at = {}      # id(connection) -> opened_at, for checked out connections
+        self._size = 0            # open connections, idle + checked out
+
+        # Metrics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._opened = 0
+        self._closed = 0
+        self._failed_checks = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def getconn(self, factory, check=None):
+        """
+        Check out a connection, opening a new one with factory() if the pool has room
+
+        check(connection, idle_seconds) vets an idle connection before it is handed
+        out; if it returns False or raises, the connection is closed and the next
+        idle one (or a new one) is tried instead.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            with self._cond:
+                while True:
+                    self._close_expired_locked()
+                    if self._idle:
+                        connection, opened_at, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        # Reserve the slot, connect outside the lock
+                        self._size += 1
+                        connection = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f'No database connection available after {self.timeout}s (pool size {self.max_size})'
+                        )
+                    self._cond.wait(remaining)
+
+            if connection is None or check is None or _passes(check, connection, time.monotonic() - returned_at):
+                break
+            with self._cond:
+                self._size -= 1
+                self._closed += 1
+                self._failed_checks += 1
+                self._cond.notify()
+            _close_quietly(connection)
+
+        if connection is None:
+            try:
+                connection = factory()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            opened_at = time.monotonic()
+            with self._cond:
+                self._opened += 1
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._opened_at[id(connection)] = opened_at
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._recent_waits.append(waited)
+        return connection
+
+    def putconn(self, connection, discard=False):
+        """
+        Return a checked out connection; discarded connections are closed instead
+        """
+        now = time.monotonic()
+        with self._cond:
+            opened_at = self._opened_at.pop(id(connection), now)
+            expired = now - opened_at > self.max_lifetime
+            if discard or expired or getattr(connection, 'closed', False):
+                self._size -= 1
+                self._closed += 1
+                self._cond.notify()
+            else:
+                self._idle.append((connection, opened_at, now))
+                self._cond.notify()
+                connection = None
+
+        if connection is not None:
+            _close_quietly(connection)
+
+    def closeall(self):
+        """Close every idle connection (checked out ones are closed when returned)"""
+        with self._cond:
+            idle = [item[0] for item in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._closed += len(idle)
+        for connection in idle:
+            _close_quietly(connection)
+
+    def stats(self):
+        """Snapshot of pool usage for the metrics endpoint"""
+        with self._cond:
+            waits = sorted(self._recent_waits)
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'connections_opened': self._opened,
+                'connections_closed': self._closed,
+                'failed_checks': self._failed_checks,
+                'wait_ms_avg': round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0,
+                'wait_ms_p99': round(_percentile(waits, 99) * 1000, 3),
+                'wait_ms_max': round(self._wait_max * 1000, 3),
+            }
+
+    def _close_expired_locked(self):
+        """Drop idle connections past max_idle (keeping min_size) or max_lifetime"""
+        now = time.monotonic()
+        keep = deque()
+        expired = []
+        while self._idle:
+            connection, opened_at, returned_at = self._idle.popleft()
+            too_old = now - opened_at > self.max_lifetime
+            too_idle = now - returned_at > self.max_idle and self._size - len(expired) > self.min_size
+            if too_old or too_idle:
+                expired.append(connection)
+            else:
+                keep.append((connection, opened_at, returned_at))
+        self._idle = keep
+        self._size -= len(expired)
+        self._closed += len(expired)
+        for connection in expired:
+            _close_quietly(connection)
+
+
+def _passes(check, connection, idle_seconds):
+    try:
+        return bool(check(connection, idle_seconds))
+    except Exception:
+        return False
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
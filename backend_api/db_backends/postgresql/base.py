@@ -0,0 +1,109 @@
+"""
+PostgreSQL backend with a process-wide connection pool (enabled with DB_POOL=True)
+
+Connections come from backend_api.db_backends.pool.ConnectionPool, sized
+by settings.DATABASE_POOL. Django's per-request close() hands the
+connection back to the pool instead of closing the socket, so requests
+skip the TCP/TLS/auth handshake and a worker never holds more than
+MAX_SIZE connections. With psycopg 3, PREPARE_THRESHOLD turns on
+server-side prepared statements, which then live as long as the pooled
+connection instead of a single request.
+
+Django's own health check (CONN_HEALTH_CHECKS) doesn't apply to pooled
+connections, so the pool vets them instead: closed or broken connections
+are always replaced, and one idle for CHECK_IDLE seconds or more is
+pinged first, since hosted Postgres and proxies drop idle connections.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+from backend_api import metrics
+from backend_api.db_backends.pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    """Return the pool for a database alias, creating it in this process if needed"""
+    key = (os.getpid(), alias)  # Never share sockets with a forked parent
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = settings.DATABASE_POOL
+            pool = ConnectionPool(
+                min_size=options['MIN_SIZE'],
+                max_size=options['MAX_SIZE'],
+                timeout=options['TIMEOUT'],
+                max_idle=options['MAX_IDLE'],
+                max_lifetime=options['MAX_LIFETIME'],
+            )
+            _pools[key] = pool
+        return pool
+
+
+def pool_stats():
+    """Metrics of every pool opened by this process"""
+    pid = os.getpid()
+    return {alias: pool.stats() for (owner, alias), pool in list(_pools.items()) if owner == pid}
+
+
+metrics.register('database_pool', pool_stats)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        prepare_threshold = settings.DATABASE_POOL['PREPARE_THRESHOLD']
+        if is_psycopg3 and prepare_threshold is not None:
+            conn_params['prepare_threshold'] = prepare_threshold
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        """
+        Check out a pooled connection (opening one through the stock backend when the pool has room)
+        """
+        connection = get_pool(self.alias).getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            check=self._pooled_connection_usable,
+        )
+        # The stock backend sets this while connecting; reused connections need it too
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = IsolationLevel(options.get('isolation_level', IsolationLevel.READ_COMMITTED))
+        return connection
+
+    @staticmethod
+    def _pooled_connection_usable(connection, idle_seconds):
+        """Whether an idle pooled connection can be handed out (errors count as no)"""
+        # psycopg 3 marks connections lost mid-use as broken; psycopg2 sets closed
+        if connection.closed or getattr(connection, 'broken', False):
+            return False
+        if idle_seconds < settings.DATABASE_POOL['CHECK_IDLE']:
+            return True
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            # Django switches autocommit on after checkout, which fails inside a transaction
+            connection.rollback()
+        return True
+
+    def _close(self):
+        """
+        Return the connection to the pool, discarding it if it is broken or mid-transaction
+        """
+        if self.connection is None:
+            return
+
+        discard = bool(self.connection.closed)
+        if not discard and not self.get_autocommit():
+            try:
+                self.connection.rollback()
+            except self.Database.Error:
+                discard = True
+
+        get_pool(self.alias).putconn(self.connection, discard=discard)
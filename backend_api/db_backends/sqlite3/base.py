@@ -0,0 +1,36 @@
+"""
+SQLite backend for single-node deployments (enabled with SQLITE_TUNING=True)
+
+- Every new connection gets the PRAGMAs from settings.SQLITE_PRAGMAS
+  (WAL journaling, synchronous=NORMAL, busy_timeout, mmap and cache size)
+- Transactions opened by atomic() start with BEGIN IMMEDIATE, so the write
+  lock is taken up front instead of failing with "database is locked" when
+  a reader tries to upgrade to a writer halfway through the transaction
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _start_transaction_under_autocommit(self):
+        """
+        Start the transaction holding the write lock (default is a deferred BEGIN)
+        """
+        self.cursor().execute("BEGIN IMMEDIATE")
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Apply the configured PRAGMAs to a freshly opened connection
+    """
+    if not isinstance(connection, DatabaseWrapper):
+        return
+
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='sqlite_tuning_pragmas')
@@ -0,0 +1,17 @@
+"""
+Registry of runtime metrics exposed by GET /api/metrics/
+
+Components register a callable returning a JSON-serializable dict; the
+endpoint calls every registered provider when it is scraped.
+"""
+_providers = {}
+
+
+def register(name, provider):
+    """Register (or replace) the metrics provider for `name`"""
+    _providers[name] = provider
+
+
+def snapshot():
+    """Collect the current metrics of every registered provider"""
+    return {name: provider() for name, provider in sorted(_providers.items())}
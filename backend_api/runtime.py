@@ -0,0 +1,35 @@
+"""
+Private directory for runtime files shared by the app's processes on a host
+
+Lock files and the shared snapshot used to live directly in the temp
+directory under predictable names, where any local user could create them
+first. They now go to tempdir/backend_api-<uid>, which must be a real
+directory owned by the current user with mode 0700.
+"""
+import os
+import stat
+import tempfile
+
+
+def owned_by_current_user(file_stat):
+    """Whether a stat result belongs to this process's user (always True where there are no uids)"""
+    return not hasattr(os, 'getuid') or file_stat.st_uid == os.getuid()
+
+
+def private_directory():
+    """Path of this user's runtime directory, created if needed; PermissionError if it isn't private"""
+    user = os.getuid() if hasattr(os, 'getuid') else os.getlogin()
+    path = os.path.join(tempfile.gettempdir(), f'backend_api-{user}')
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    # lstat: a symlink planted under this name is refused, not followed
+    path_stat = os.lstat(path)
+    if (
+        not stat.S_ISDIR(path_stat.st_mode)
+        or not owned_by_current_user(path_stat)
+        or (hasattr(os, 'getuid') and path_stat.st_mode & 0o077)
+    ):
+        raise PermissionError(f'{path} must be a directory owned by this user with mode 0700')
+    return path
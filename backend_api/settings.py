@@ -86,6 +86,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend_api.wsgi.application'
 
+# Serve the messaging endpoints (conversations, mark-read) with native async views
+# Use with an ASGI server: gunicorn backend_api.asgi:application -k uvicorn.workers.UvicornWorker
+ASYNC_MESSAGING = os.environ.get('ASYNC_MESSAGING', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -94,18 +98,49 @@ WSGI_APPLICATION = 'backend_api.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Opt-in SQLite tuning for single-node deployments running several gunicorn workers
+# Applies the PRAGMAs below on every new connection and opens write transactions with BEGIN IMMEDIATE
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'False') == 'True'
+if SQLITE_TUNING:
+    DATABASES['default']['ENGINE'] = 'backend_api.db_backends.sqlite3'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers no longer block the writer
+    'synchronous': 'NORMAL',  # Safe with WAL, avoids an fsync per commit
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),  # Wait for the write lock instead of failing
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64000)),  # Negative value = size in KiB
+}
+
 # Use PostgreSQL if DATABASE_URL is provided (Railway/Render)
+# DB_POOL=True switches to a process-wide connection pool sized by DATABASE_POOL below
+DB_POOL = os.environ.get('DB_POOL', 'False') == 'True'
+
 import dj_database_url
 if 'DATABASE_URL' in os.environ:
     DATABASES['default'] = dj_database_url.parse(
         os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
-        conn_health_checks=True,
+        conn_max_age=0 if DB_POOL else 600,  # Pooled connections go back to the pool after each request
+        conn_health_checks=not DB_POOL,  # The pool checks idle connections itself (DATABASE_POOL['CHECK_IDLE'])
     )
+    if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES['default']['ENGINE'] = 'backend_api.db_backends.postgresql'
+
+DATABASE_POOL = {
+    'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+    'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),  # Per worker process
+    'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),  # Seconds to wait for a free connection
+    'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    'MAX_LIFETIME': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+    # Seconds idle after which a connection is pinged before reuse (0 = on every checkout)
+    'CHECK_IDLE': float(os.environ.get('DB_POOL_CHECK_IDLE', 10)),
+    # psycopg 3 only: prepare statements server-side after this many executions (None = driver default)
+    'PREPARE_THRESHOLD': int(os.environ['DB_PREPARE_THRESHOLD']) if 'DB_PREPARE_THRESHOLD' in os.environ else None,
+}
 
 
 # Password validation
@@ -127,6 +162,33 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing policy
+# PASSWORD_HASHER (pbkdf2, argon2 or scrypt) picks the hasher for new hashes; the others still verify
+# Outdated hashes are upgraded in the background after a successful login (myapp/passwords.py)
+PASSWORD_HASHING = {
+    'ALGORITHM': os.environ.get('PASSWORD_HASHER', 'pbkdf2'),
+    # Tuning parameters (None = Django's default for that hasher)
+    'PBKDF2_ITERATIONS': int(os.environ['PBKDF2_ITERATIONS']) if 'PBKDF2_ITERATIONS' in os.environ else None,
+    'ARGON2_TIME_COST': int(os.environ['ARGON2_TIME_COST']) if 'ARGON2_TIME_COST' in os.environ else None,
+    'ARGON2_MEMORY_COST': int(os.environ['ARGON2_MEMORY_COST']) if 'ARGON2_MEMORY_COST' in os.environ else None,  # KiB
+    'ARGON2_PARALLELISM': int(os.environ['ARGON2_PARALLELISM']) if 'ARGON2_PARALLELISM' in os.environ else None,
+    'SCRYPT_WORK_FACTOR': int(os.environ['SCRYPT_WORK_FACTOR']) if 'SCRYPT_WORK_FACTOR' in os.environ else None,
+    'SCRYPT_BLOCK_SIZE': int(os.environ['SCRYPT_BLOCK_SIZE']) if 'SCRYPT_BLOCK_SIZE' in os.environ else None,
+    'SCRYPT_PARALLELISM': int(os.environ['SCRYPT_PARALLELISM']) if 'SCRYPT_PARALLELISM' in os.environ else None,
+    # Hash in a pool of this many processes per worker (0 = hash on the request thread)
+    'PROCESSES': int(os.environ.get('PASSWORD_HASHING_PROCESSES', 0)),
+}
+
+_PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'myapp.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'myapp.hashers.TunedArgon2PasswordHasher',
+    'scrypt': 'myapp.hashers.TunedScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHER_CLASSES[PASSWORD_HASHING['ALGORITHM']]] + [
+    hasher for name, hasher in _PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHING['ALGORITHM']
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -192,6 +254,123 @@ REST_FRAMEWORK = {
     ],
 }
 
+# In-memory per-city day index behind GET /api/events/calendar/ (myapp/calendar_index.py)
+CALENDAR_INDEX = {
+    'ENABLED': os.environ.get('CALENDAR_INDEX', 'True') == 'True',
+    # Seconds between delta syncs picking up events changed by other worker processes
+    'SYNC_INTERVAL': float(os.environ.get('CALENDAR_INDEX_SYNC_INTERVAL', 5)),
+    # Seconds before a city is reloaded from scratch (drops events hard-deleted elsewhere)
+    'MAX_AGE': float(os.environ.get('CALENDAR_INDEX_MAX_AGE', 600)),
+    # Cities kept per worker (least recently looked up evicted first); also bounds the load queue
+    'MAX_CITIES': int(os.environ.get('CALENDAR_INDEX_MAX_CITIES', 200)),
+}
+
+# Seconds GET /api/events/facets/ results are cached per filter signature (also invalidated on event changes)
+EVENT_FACETS_CACHE_TIMEOUT = int(os.environ.get('EVENT_FACETS_CACHE_TIMEOUT', 60))
+
+# Memory-mapped snapshot of categories, host rating summaries and hot event fragments
+# shared by the workers on a host (myapp/snapshot.py)
+SHARED_SNAPSHOT = {
+    'ENABLED': os.environ.get('SHARED_SNAPSHOT', 'True') == 'True',
+    # Default: a file named after the database (so test databases get their own) in this user's
+    # 0700 runtime directory, tempdir/backend_api-<uid>; a custom path's directory should be private too
+    'PATH': os.environ.get('SHARED_SNAPSHOT_PATH'),
+    # Seconds before a worker rebuilds it in the background (host ratings lag reviews by up to this)
+    'MAX_AGE': float(os.environ.get('SHARED_SNAPSHOT_MAX_AGE', 60)),
+    # Seconds between checks for a snapshot written by another worker
+    'CHECK_INTERVAL': float(os.environ.get('SHARED_SNAPSHOT_CHECK_INTERVAL', 1)),
+    # Event list fragments copied from the rebuilding worker's LRU
+    'MAX_FRAGMENTS': int(os.environ.get('SHARED_SNAPSHOT_MAX_FRAGMENTS', 2000)),
+}
+
+# Caches: the default stays per-process; Idempotency-Key replays (myapp/idempotency.py) go to Redis
+# when REDIS_URL is set, so retries that land on another worker are still replayed
+REDIS_URL = os.environ.get('REDIS_URL')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'idempotency',
+    } if REDIS_URL else {
+        # Per-process LRU, bounded by MAX_ENTRIES
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'idempotency',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('IDEMPOTENCY_MAX_ENTRIES', 10000))},
+    },
+}
+# Hot payloads (event detail, upcoming) behind myapp/singleflight.py; Redis also makes its locks cross-worker
+CACHES['singleflight'] = {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': REDIS_URL,
+    'KEY_PREFIX': 'singleflight',
+} if REDIS_URL else {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'singleflight',
+    'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('SINGLE_FLIGHT_MAX_ENTRIES', 2000))},
+}
+# Rows of .cached() reads on tracked tables and the table versions invalidating them (myapp/querycache.py);
+# the per-process fallback is only used when QUERY_CACHE['ENABLED'] is overridden (tests, single process)
+CACHES['querycache'] = {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': REDIS_URL,
+    'KEY_PREFIX': 'querycache',
+} if REDIS_URL else {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'querycache',
+    'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('QUERY_CACHE_MAX_ENTRIES', 5000))},
+}
+if REDIS_URL:
+    # Second tier behind the per-process LRU of serialized event list fragments (myapp/fragments.py)
+    CACHES['fragments'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'fragments',
+    }
+    # Token versions checked by stateless auth (myapp/authentication.py); shared so a revocation
+    # reaches every worker. Without it the version is read from the database on every request
+    CACHES['auth'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'auth',
+    }
+
+# Per-event cache of serialized EventListSerializer output used to assemble list pages
+EVENT_FRAGMENTS = {
+    'ENABLED': os.environ.get('EVENT_FRAGMENTS', 'True') == 'True',
+    # Fragments kept in each worker's LRU
+    'MAX_ENTRIES': int(os.environ.get('EVENT_FRAGMENTS_MAX_ENTRIES', 5000)),
+    # Seconds a fragment lives in the 'fragments' cache (Redis only; keys change with every edit)
+    'TIMEOUT': int(os.environ.get('EVENT_FRAGMENTS_TIMEOUT', 24 * 60 * 60)),
+}
+
+# Idempotency-Key handling for POST endpoints that create things
+IDEMPOTENCY = {
+    'TTL': int(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60)),  # Seconds a stored response is replayed
+    'LOCK_TIMEOUT': int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)),  # Seconds an in-flight claim lasts if its worker dies
+    'WAIT_TIMEOUT': float(os.environ.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)),  # Seconds a duplicate waits for the in-flight request
+}
+
+# Single-flight recomputation of hot cached payloads (myapp/singleflight.py)
+SINGLE_FLIGHT = {
+    'TTL': int(os.environ.get('SINGLE_FLIGHT_TTL', 30)),  # Seconds a payload is fresh
+    'STALE_TTL': int(os.environ.get('SINGLE_FLIGHT_STALE_TTL', 300)),  # Seconds after that it may be served while one worker recomputes
+    'LOCK_TIMEOUT': int(os.environ.get('SINGLE_FLIGHT_LOCK_TIMEOUT', 30)),  # Seconds a recompute lock lasts if its worker dies
+    'WAIT_TIMEOUT': float(os.environ.get('SINGLE_FLIGHT_WAIT_TIMEOUT', 5)),  # Seconds a request with nothing stale waits before computing itself
+}
+
+# Opt-in ORM result cache, QuerySet.cached() (myapp/querycache.py)
+QUERY_CACHE = {
+    # Redis only: with per-process caches each worker keeps its own table versions, so a write in one
+    # worker (a password change bumping token_version, a deleted user) wouldn't invalidate the others
+    'ENABLED': bool(REDIS_URL) and os.environ.get('QUERY_CACHE', 'True') == 'True',
+    # Seconds cached rows live; writes invalidate them sooner through the table versions
+    'TIMEOUT': int(os.environ.get('QUERY_CACHE_TIMEOUT', 300)),
+}
+
 # CORS settings - Configured for Vercel frontend
 CORS_ALLOW_CREDENTIALS = True
 
@@ -212,6 +391,12 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
     r"^https://.*\.vercel\.app$",  # All Vercel preview deployments
 ]
 
+# Let browsers send Idempotency-Key and read Idempotent-Replayed (myapp/idempotency.py)
+from corsheaders.defaults import default_headers
+
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
 # JWT settings
 from datetime import timedelta
 
@@ -240,3 +425,8 @@ SIMPLE_JWT = {
     
     'JTI_CLAIM': 'jti',
 }
+
+# Stateless auth: build request.user from the token's name/email/version claims instead of a DB query
+# Seconds a user's token version stays in the 'auth' cache (Redis only); any change to the user drops it at once
+JWT_STATELESS_AUTH = os.environ.get('JWT_STATELESS_AUTH', 'False') == 'True'
+JWT_VERSION_CHECK_INTERVAL = int(os.environ.get('JWT_VERSION_CHECK_INTERVAL', 300))
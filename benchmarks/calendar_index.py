@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+Calendar query benchmark: in-memory day index vs SQL
+
+Fills a throwaway SQLite database with --events multi-day events (1-14
+days) spread over two years and --cities cities, then answers random
+"event ids per day for this city" queries for day, week and month windows
+both with the SQL fallback and with myapp.calendar_index.CalendarIndex.
+Also reports how long loading a city and applying incremental updates
+take.
+
+Usage:
+    python benchmarks/calendar_index.py --events 500000 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+WINDOWS = [('day', 1), ('week', 7), ('month', 30)]
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index] * 1000
+
+
+def populate(event_count, city_count):
+    from datetime import date, time as dtime, timedelta
+    from myapp.models import User, Event, combine_local
+
+    host = User.objects.create(name='Host', email='host@bench.local', password='x')
+    first_day = date.today() - timedelta(days=365)
+    rng = random.Random(42)
+
+    batch = []
+    for i in range(event_count):
+        start_date = first_day + timedelta(days=rng.randrange(730))
+        end_date = start_date + timedelta(days=rng.randrange(14))
+        # bulk_create skips Event.save(), so fill starts_at/ends_at here
+        batch.append(Event(
+            title=f'Event {i}', description='Benchmark', max_attendees=50,
+            start_date=start_date, end_date=end_date, start_time=dtime(18, 0), end_time=dtime(22, 0),
+            starts_at=combine_local(start_date, dtime(18, 0)), ends_at=combine_local(end_date, dtime(22, 0)),
+            street='1 Main St', city=f'City {i % city_count}', state='BS', postal_code='00000',
+            organizer_id=host, organizer_name=host.name, organizer_email=host.email,
+        ))
+        if len(batch) == 5000:
+            Event.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Event.objects.bulk_create(batch)
+    return first_day
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=500000, help='Events to create')
+    parser.add_argument('--cities', type=int, default=20, help='Distinct cities')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per window size and mode')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['SQLITE_PATH'] = os.path.join(tmp.name, 'bench.sqlite3')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_api.settings')
+    import django
+    django.setup()
+    from datetime import timedelta
+    from django.core.management import call_command
+    from myapp.calendar_index import CalendarIndex, events_by_day_from_database
+    from myapp.models import Event
+
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    first_day = populate(args.events, args.cities)
+    print(f'{args.events} events in {args.cities} cities created in {time.perf_counter() - started:.1f}s\n')
+
+    cities = [f'City {i}' for i in range(args.cities)]
+    index = CalendarIndex(sync_interval=3600, max_age=float('inf'))
+    load_times = []
+    for city in cities:
+        started = time.perf_counter()
+        index.load_city(city)
+        load_times.append(time.perf_counter() - started)
+    # Consume the first delta sync (it re-reads the rows just created) before timing lookups
+    index.sync()
+    load_times.sort()
+    stats = index.stats()
+    print(f'index: {stats["events"]} events in {stats["day_buckets"]} day buckets, '
+          f'city load p50 {percentile(load_times, 50):.0f}ms, max {load_times[-1] * 1000:.0f}ms\n')
+
+    rng = random.Random(7)
+    print(f'{"window":<8}{"sql p50 ms":>12}{"sql p99 ms":>12}{"index p50 ms":>14}{"index p99 ms":>14}{"ids/query":>11}')
+    for label, days in WINDOWS:
+        queries = [
+            (rng.choice(cities), first_day + timedelta(days=rng.randrange(730 - days)))
+            for _ in range(args.queries)
+        ]
+        sql_times, index_times, ids = [], [], 0
+        for city, start in queries:
+            end = start + timedelta(days=days - 1)
+
+            began = time.perf_counter()
+            expected = events_by_day_from_database(city, start, end)
+            sql_times.append(time.perf_counter() - began)
+
+            began = time.perf_counter()
+            result = index.lookup(city, start, end)
+            index_times.append(time.perf_counter() - began)
+
+            assert result == expected
+            ids += sum(len(event_ids) for event_ids in result.values())
+        sql_times.sort()
+        index_times.sort()
+        print(f'{label:<8}{percentile(sql_times, 50):>12.2f}{percentile(sql_times, 99):>12.2f}'
+              f'{percentile(index_times, 50):>14.3f}{percentile(index_times, 99):>14.3f}{ids // args.queries:>11}')
+
+    # Incremental maintenance: what the post_save receiver does per saved event
+    events = list(Event.objects.values_list('id', 'city', 'start_date', 'end_date')[:10000])
+    started = time.perf_counter()
+    for event_id, city, start_date, end_date in events:
+        index.update_event(event_id, city, start_date + timedelta(days=1), end_date + timedelta(days=1), True)
+    elapsed = time.perf_counter() - started
+    print(f'\nincremental update: {elapsed / len(events) * 1e6:.1f}us per event ({len(events)} events)')
+
+    tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
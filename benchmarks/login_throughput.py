@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Login throughput benchmark for the password hashing policies
+
+For each configuration, --threads client threads log in through
+POST /api/token/ for --seconds while one more thread keeps requesting
+GET /api/categories/. Reports logins per second, login p99 and the p99 of
+the cheap request, which shows how much hashing stalls everything else
+running in the same worker process.
+
+Configurations are run in fresh processes against a throwaway SQLite
+database. Argon2 runs are skipped when argon2-cffi is not installed.
+
+Usage:
+    python benchmarks/login_throughput.py --threads 4 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+CONFIGURATIONS = [
+    ('pbkdf2 (Django default)', {'PASSWORD_HASHER': 'pbkdf2'}),
+    ('pbkdf2 + 2 processes', {'PASSWORD_HASHER': 'pbkdf2', 'PASSWORD_HASHING_PROCESSES': '2'}),
+    ('argon2 (19 MiB, t=2, p=1)', {
+        'PASSWORD_HASHER': 'argon2', 'ARGON2_MEMORY_COST': '19456', 'ARGON2_TIME_COST': '2', 'ARGON2_PARALLELISM': '1',
+    }),
+    ('argon2 + 2 processes', {
+        'PASSWORD_HASHER': 'argon2', 'ARGON2_MEMORY_COST': '19456', 'ARGON2_TIME_COST': '2', 'ARGON2_PARALLELISM': '1',
+        'PASSWORD_HASHING_PROCESSES': '2',
+    }),
+    ('scrypt (Django default)', {'PASSWORD_HASHER': 'scrypt'}),
+]
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index] * 1000
+
+
+def run_configuration(env, threads, seconds):
+    """Runs inside a fresh process with the configuration's environment applied"""
+    os.environ.update(env)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_api.settings')
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from myapp.models import User
+    from myapp.passwords import hash_password, shutdown_process_pool
+
+    call_command('migrate', verbosity=0)
+    call_command('populate_categories', verbosity=0, stdout=open(os.devnull, 'w'))
+    for i in range(threads):
+        User.objects.create(name=f'User {i}', email=f'user{i}@bench.local', password=hash_password('benchmark-password'))
+
+    deadline = time.perf_counter() + seconds
+    login_latencies, other_latencies = [], []
+    lock = threading.Lock()
+
+    def login_worker(i):
+        client = Client()
+        local = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post(
+                '/api/token/',
+                {'email': f'user{i}@bench.local', 'password': 'benchmark-password'},
+                content_type='application/json',
+            )
+            assert response.status_code == 200, response.content
+            local.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            login_latencies.extend(local)
+
+    def other_worker():
+        client = Client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get('/api/categories/')
+            other_latencies.append(time.perf_counter() - started)
+        connection.close()
+
+    workers = [threading.Thread(target=login_worker, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=other_worker))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    # Otherwise this process waits for the idle hashing processes on exit
+    shutdown_process_pool()
+
+    login_latencies.sort()
+    other_latencies.sort()
+    return (
+        len(login_latencies) / seconds,
+        percentile(login_latencies, 99),
+        percentile(other_latencies, 99),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=4, help='Concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+    args = parser.parse_args()
+
+    try:
+        import argon2  # noqa: F401
+        has_argon2 = True
+    except ImportError:
+        has_argon2 = False
+
+    print(f'{args.threads} login threads + 1 categories thread, {args.seconds}s per run\n')
+    print(f'{"configuration":<28}{"logins/s":>10}{"login p99 ms":>14}{"other p99 ms":>14}')
+
+    ctx = multiprocessing.get_context('spawn')
+    for label, env in CONFIGURATIONS:
+        if env['PASSWORD_HASHER'] == 'argon2' and not has_argon2:
+            print(f'{label:<28}{"skipped (argon2-cffi not installed)":>38}')
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(env, SQLITE_PATH=os.path.join(tmp, 'bench.sqlite3'), ALLOWED_HOSTS='testserver')
+            # Not a multiprocessing.Pool: its daemonic workers can't start the hashing process pool
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                rate, login_p99, other_p99 = executor.submit(run_configuration, env, args.threads, args.seconds).result()
+        print(f'{label:<28}{rate:>10.1f}{login_p99:>14.1f}{other_p99:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Concurrency benchmark for message sends on SQLite
+
+Runs the same load twice against a throwaway database file, once with the
+default SQLite configuration and once with SQLITE_TUNING=True, and reports
+message-send throughput and failures ("database is locked") for each.
+
+Every worker process logs in as its own attendee and sends messages to the
+same event through POST /api/conversations/, like several gunicorn workers
+handling chat traffic.
+
+Usage:
+    python benchmarks/sqlite_message_throughput.py --workers 6 --messages 200
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_api.settings')
+    import django
+    django.setup()
+
+
+def prepare_database(worker_count):
+    """Migrate the benchmark database and create one event plus one attendee per worker"""
+    setup_django()
+    from datetime import date, time as dtime, timedelta
+    from django.core.management import call_command
+    from django.contrib.auth.hashers import make_password
+    from myapp.models import User, Event
+
+    call_command('migrate', verbosity=0)
+
+    host = User.objects.create(name='Host', email='host@bench.local', password=make_password('x'))
+    event = Event.objects.create(
+        title='Benchmark event', description='Load test', max_attendees=1000,
+        start_date=date.today() + timedelta(days=7), end_date=date.today() + timedelta(days=7),
+        start_time=dtime(18, 0), end_time=dtime(22, 0),
+        street='1 Main St', city='Bench', state='BS', postal_code='00000',
+        organizer_id=host, organizer_name=host.name, organizer_email=host.email,
+    )
+    attendee_ids = [
+        User.objects.create(name=f'Attendee {i}', email=f'attendee{i}@bench.local', password='x').id
+        for i in range(worker_count)
+    ]
+    return event.id, attendee_ids
+
+
+def send_messages(args):
+    """Worker: send `count` messages as one attendee, return (sent, failed)"""
+    event_id, user_id, count = args
+    setup_django()
+    from django.test import Client
+    from myapp.models import User
+    from myapp.jwt_utils import get_tokens_for_user
+
+    access = get_tokens_for_user(User.objects.get(id=user_id))['access']
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    sent = failed = 0
+    for i in range(count):
+        response = client.post(
+            '/api/conversations/',
+            {'event_id': event_id, 'message': f'Message {i} from {user_id}'},
+            content_type='application/json',
+        )
+        if response.status_code == 201:
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
+
+
+def run(tuned, workers, messages):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SQLITE_PATH'] = os.path.join(tmp, 'bench.sqlite3')
+        os.environ['SQLITE_TUNING'] = 'True' if tuned else 'False'
+        os.environ['ALLOWED_HOSTS'] = 'testserver'
+
+        # Fresh interpreters so every process reads the settings for this run
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1) as pool:
+            event_id, attendee_ids = pool.apply(prepare_database, (workers,))
+
+        with ctx.Pool(workers, initializer=setup_django) as pool:
+            started = time.perf_counter()
+            results = pool.map(send_messages, [(event_id, user_id, messages) for user_id in attendee_ids])
+            elapsed = time.perf_counter() - started
+
+    sent = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    return sent, failed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=6, help='Concurrent worker processes')
+    parser.add_argument('--messages', type=int, default=200, help='Messages sent per worker')
+    args = parser.parse_args()
+
+    print(f'{args.workers} workers x {args.messages} messages\n')
+    print(f'{"mode":<10}{"sent":>8}{"failed":>8}{"seconds":>10}{"msg/s":>10}')
+    for tuned in (False, True):
+        sent, failed, elapsed = run(tuned, args.workers, args.messages)
+        label = 'tuned' if tuned else 'default'
+        print(f'{label:<10}{sent:>8}{failed:>8}{elapsed:>10.2f}{sent / elapsed:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
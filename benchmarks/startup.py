@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Startup benchmark: what a cold start costs before the first response
+
+Runs every measurement in a fresh interpreter against a throwaway SQLite
+database, --runs times:
+
+- the pre-gunicorn step: the old "migrate && populate_categories" versus
+  "manage.py boot" once nothing changed (and boot on an empty database);
+- inside one worker: importing Django and the settings, django.setup(),
+  building the WSGI application, and the first request
+  (GET /api/categories/) through it.
+
+Usage:
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a fresh interpreter; prints the phase timings in seconds as JSON
+WORKER = '''
+import json, time
+started = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+imported = time.perf_counter()
+django.setup()
+set_up = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+from django.test import Client
+response = Client(HTTP_HOST='localhost').get('/api/categories/')
+assert response.status_code == 200, response.status_code
+finished = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'setup': set_up - imported,
+    'wsgi app': loaded - set_up,
+    'first request': finished - loaded,
+}))
+'''
+
+
+def run(command, env):
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode:
+        sys.exit(f'{" ".join(command)} failed:\n{result.stderr}')
+    return elapsed, result.stdout
+
+
+def manage(*args):
+    return [sys.executable, 'manage.py', *args]
+
+
+def report(label, seconds):
+    seconds = sorted(seconds)
+    print(f'{label:<36}{statistics.median(seconds) * 1000:>10.0f}{seconds[0] * 1000:>10.0f}{seconds[-1] * 1000:>10.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per measurement')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='backend_api.settings')
+    database = os.path.join(tmp.name, 'bench.sqlite3')
+
+    print(f'{"ms":<36}{"median":>10}{"min":>10}{"max":>10}')
+
+    empty = []
+    for i in range(args.runs):
+        env['SQLITE_PATH'] = os.path.join(tmp.name, f'empty{i}.sqlite3')
+        empty.append(run(manage('boot'), env)[0])
+    report('boot, empty database', empty)
+
+    env['SQLITE_PATH'] = database
+    run(manage('boot'), env)
+
+    old = [
+        run(manage('migrate'), env)[0] + run(manage('populate_categories'), env)[0]
+        for _ in range(args.runs)
+    ]
+    report('migrate && populate_categories', old)
+    report('boot, nothing changed', [run(manage('boot'), env)[0] for _ in range(args.runs)])
+
+    phases = {}
+    for _ in range(args.runs):
+        _, output = run([sys.executable, '-c', WORKER], env)
+        for phase, seconds in json.loads(output).items():
+            phases.setdefault(phase, []).append(seconds)
+    print()
+    for phase, seconds in phases.items():
+        report(f'worker: {phase}', seconds)
+    report('worker: total', [sum(run_phases) for run_phases in zip(*phases.values())])
+
+    tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,11 +9,8 @@ pip install -r requirements.txt
 echo "Collecting static files..."
 python manage.py collectstatic --no-input
 
-echo "Running migrations..."
-python manage.py migrate
-
-echo "Populating categories..."
-python manage.py populate_categories
+echo "Running migrations and populating categories (skipped when unchanged)..."
+python manage.py boot
 
 echo "Build complete!"
 
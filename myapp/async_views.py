@@ -0,0 +1,367 @@
+"""
+Native async versions of the messaging endpoints
+
+Same URLs, request bodies and responses as create_conversation,
+get_conversation, get_my_conversations and mark_messages_as_read in
+views.py, written against Django's async ORM so a single ASGI worker
+(uvicorn/daphne) can hold many slow mobile clients without blocking a
+thread per request. Enabled with ASYNC_MESSAGING=True (see urls.py).
+
+DRF's @api_view only supports sync functions, so these are plain Django
+async views that authenticate with CustomJWTAuthentication and render
+with DRF's JSON encoder to keep responses byte-compatible.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import OuterRef, Q, Subquery
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import CustomJWTAuthentication
+from .idempotency import run_idempotent
+from .inbox import mark_read, send_message
+from .models import Event, Conversation, Message
+from .serializers import MessageSerializer
+
+
+def _response(data, status=status.HTTP_200_OK, headers=None):
+    """JSON response rendered like DRF's Response"""
+    return JsonResponse(data, status=status, encoder=JSONEncoder, headers=headers, json_dumps_params={'ensure_ascii': False})
+
+
+def _exception_response(exc):
+    """Mirror DRF's exception handler for authentication and method errors"""
+    headers = {}
+    if getattr(exc, 'auth_header', None):
+        headers['WWW-Authenticate'] = exc.auth_header
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return _response(data, status=exc.status_code, headers=headers)
+
+
+async def _authenticate(request, allowed_methods):
+    """
+    Check the method and JWT credentials, returning (user, None) or (None, error response)
+    """
+    authenticator = CustomJWTAuthentication()
+    try:
+        # Same order as DRF: authentication and permissions first, then the method check
+        if getattr(request, '_force_auth_user', None) is not None:
+            # Sub-request of POST /api/batch/, already authenticated (see batch.py)
+            result = (request._force_auth_user, None)
+        else:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        if request.method not in allowed_methods:
+            raise exceptions.MethodNotAllowed(request.method)
+        return result[0], None
+
+    except exceptions.APIException as exc:
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED and not getattr(exc, 'auth_header', None):
+            exc.auth_header = authenticator.authenticate_header(request)
+        return None, _exception_response(exc)
+
+
+def _request_data(request):
+    """Parse a JSON or form-encoded request body; raises ParseError (400) on malformed JSON"""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
+    return request.POST
+
+
+def _conversation_payload(conversation, message_count):
+    """Conversation block shared by the detail responses"""
+    event = conversation.event
+    return {
+        'id': conversation.id,
+        'status': conversation.status,
+        'created_at': conversation.created_at,
+        'updated_at': conversation.updated_at,
+        'confirmed_at': conversation.confirmed_at,
+        'rejected_at': conversation.rejected_at,
+        'event': {
+            'id': event.id,
+            'title': event.title,
+            'description': event.description,
+            'start_date': event.start_date,
+            'end_date': event.end_date,
+            'start_time': event.start_time,
+            'end_time': event.end_time,
+            'city': event.city,
+            'state': event.state,
+            'max_attendees': event.max_attendees,
+            'confirmed_attendees': event.confirmed_attendees,
+            'is_full': event.is_full
+        },
+        'user': {
+            'id': conversation.user.id,
+            'name': conversation.user.name,
+            'email': conversation.user.email
+        },
+        'host': {
+            'id': conversation.host.id,
+            'name': conversation.host.name,
+            'email': conversation.host.email
+        },
+        'message_count': message_count
+    }
+
+
+async def _send_message(authenticated_user, data):
+    event_id = data.get('event_id')
+    message_text = data.get('message')
+
+    if not event_id or not message_text:
+        return _response({
+            'success': False,
+            'message': 'event_id and message are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Transactional upsert; the async ORM can't run transactions, so it runs in a thread
+    try:
+        conversation, created, message_count = await sync_to_async(send_message)(
+            event_id, authenticated_user, message_text
+        )
+    except Event.DoesNotExist:
+        return _response({
+            'success': False,
+            'message': 'Event not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    conversation_exists = not created
+
+    return _response({
+        'success': True,
+        'message': 'Message sent successfully' if conversation_exists else 'Conversation created successfully',
+        'conversation_id': conversation.id,
+        'event_id': conversation.event_id,
+        'user_id': conversation.user_id,
+        'host_id': conversation.host_id,
+        'message_count': message_count,
+        'is_new_conversation': not conversation_exists
+    }, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+async def create_conversation(request):
+    """
+    Create a new conversation or add message to existing conversation
+    POST /api/conversations/
+    Input: event_id, message
+
+    Async counterpart of views.create_conversation, including Idempotency-Key handling
+    Authentication required: Yes
+    """
+    authenticated_user, error = await _authenticate(request, ['POST'])
+    if error:
+        return error
+
+    try:
+        data = _request_data(request)
+        return await run_idempotent(
+            request, authenticated_user.id, data,
+            lambda: _send_message(authenticated_user, data),
+            _response
+        )
+
+    except exceptions.ParseError as exc:
+        return _exception_response(exc)
+    except Exception as e:
+        return _response({
+            'success': False,
+            'message': 'An error occurred while processing your request',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def get_conversation(request, conversation_id):
+    """
+    Get a specific conversation with all messages (Authenticated)
+    GET /api/conversations/{conversation_id}/
+
+    Async counterpart of views.get_conversation
+    Authentication required: Yes
+    """
+    authenticated_user, error = await _authenticate(request, ['GET'])
+    if error:
+        return error
+
+    try:
+        try:
+            conversation = await Conversation.objects.select_related('event', 'user', 'host').aget(id=conversation_id)
+        except Conversation.DoesNotExist:
+            return _response({
+                'success': False,
+                'message': 'Conversation not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        messages = [
+            message async for message in
+            conversation.messages.select_related('sender').order_by('created_at')
+        ]
+
+        return _response({
+            'success': True,
+            'conversation': _conversation_payload(conversation, conversation.message_count),
+            'messages': MessageSerializer(messages, many=True).data
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return _response({
+            'success': False,
+            'message': 'An error occurred while fetching conversation',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+async def get_my_conversations(request):
+    """
+    Get all conversations for authenticated user
+    GET /api/conversations/my-conversations/
+
+    Async counterpart of views.get_my_conversations
+    Authentication required: Yes
+    """
+    authenticated_user, error = await _authenticate(request, ['GET'])
+    if error:
+        return error
+
+    try:
+        # The last message id is a subquery and the counts are columns, so no thread is loaded
+        conversations = [conversation async for conversation in Conversation.objects.filter(
+            Q(user=authenticated_user) | Q(host=authenticated_user)
+        ).select_related('event', 'user', 'host').annotate(
+            last_message_id=Subquery(
+                Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id').values('id')[:1]
+            ),
+        )]
+        last_messages = await Message.objects.select_related('sender').ain_bulk(
+            [conversation.last_message_id for conversation in conversations if conversation.last_message_id]
+        )
+
+        conversations_data = []
+        for conversation in conversations:
+            if conversation.user_id == authenticated_user.id:
+                other_person = conversation.host
+                my_role = 'attendee'
+            else:
+                other_person = conversation.user
+                my_role = 'host'
+
+            last_message = last_messages.get(conversation.last_message_id)
+            if last_message is not None:
+                # is_read reads the watermark from its conversation
+                last_message.conversation = conversation
+            unread_count = getattr(conversation, conversation.unread_count_field(authenticated_user.id))
+
+            conversations_data.append({
+                'conversation_id': conversation.id,
+                'status': conversation.status,
+                'created_at': conversation.created_at,
+                'updated_at': conversation.updated_at,
+                'my_role': my_role,
+                'event': {
+                    'id': conversation.event.id,
+                    'title': conversation.event.title,
+                    'start_date': conversation.event.start_date,
+                    'end_date': conversation.event.end_date,
+                    'city': conversation.event.city,
+                    'state': conversation.event.state
+                },
+                'other_person': {
+                    'id': other_person.id,
+                    'name': other_person.name,
+                    'email': other_person.email
+                },
+                'last_message': {
+                    'id': last_message.id,
+                    'text': last_message.text,
+                    'sender_name': last_message.sender.name,
+                    'sender_id': last_message.sender.id,
+                    'created_at': last_message.created_at,
+                    'is_read': last_message.is_read
+                } if last_message else None,
+                'message_count': conversation.message_count,
+                'unread_count': unread_count,
+                'last_message_time': last_message.created_at if last_message else conversation.created_at
+            })
+
+        # Sort by last message time (most recent first)
+        conversations_data.sort(key=lambda x: x['last_message_time'], reverse=True)
+        for conv in conversations_data:
+            del conv['last_message_time']
+
+        return _response({
+            'success': True,
+            'count': len(conversations_data),
+            'conversations': conversations_data
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return _response({
+            'success': False,
+            'message': 'An error occurred while fetching conversations',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@csrf_exempt
+async def mark_messages_as_read(request):
+    """
+    Mark messages as read for a conversation
+    POST /api/messages/mark-read/
+    Input: conversation_id
+
+    Async counterpart of views.mark_messages_as_read
+    Authentication required: Yes
+    """
+    authenticated_user, error = await _authenticate(request, ['POST'])
+    if error:
+        return error
+
+    try:
+        conversation_id = _request_data(request).get('conversation_id')
+
+        if not conversation_id:
+            return _response({
+                'success': False,
+                'message': 'conversation_id is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            conversation = await Conversation.objects.aget(id=conversation_id)
+        except Conversation.DoesNotExist:
+            return _response({
+                'success': False,
+                'message': 'Conversation not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # Verify user is part of the conversation
+        if authenticated_user.id not in [conversation.user_id, conversation.host_id]:
+            return _response({
+                'success': False,
+                'message': 'You are not authorized to access this conversation'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        # Move the user's read watermark to the latest message (a single conversation row write)
+        unread_count = await sync_to_async(mark_read)(conversation, authenticated_user)
+
+        return _response({
+            'success': True,
+            'message': f'{unread_count} messages marked as read',
+            'marked_count': unread_count
+        }, status=status.HTTP_200_OK)
+
+    except exceptions.ParseError as exc:
+        return _exception_response(exc)
+    except Exception as e:
+        return _response({
+            'success': False,
+            'message': 'An error occurred while marking messages as read',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,15 +1,52 @@
 """
 Custom JWT Authentication for Custom User Model
 """
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 from .models import User
 
 
+# Fields carried in the token claims (see jwt_utils.add_user_claims)
+CLAIM_FIELDS = ['id', 'name', 'email', 'token_version']
+
+
+def token_version_cache_key(user_id):
+    return f'jwt:token_version:{user_id}'
+
+
+def _version_cache():
+    """The 'auth' cache shared by every worker, or None (Redis only, see settings)"""
+    return caches['auth'] if 'auth' in settings.CACHES else None
+
+
+def current_token_version(user_id):
+    """user_id's token_version, from the shared cache when configured; None if there's no such user"""
+    cache = _version_cache()
+    version = cache.get(token_version_cache_key(user_id)) if cache is not None else None
+    if version is None:
+        version = User.objects.filter(id=user_id).values_list('token_version', flat=True).first()
+        if version is not None and cache is not None:
+            cache.set(token_version_cache_key(user_id), version, settings.JWT_VERSION_CHECK_INTERVAL)
+    return version
+
+
+def forget_token_version(user_id):
+    """Drop user_id's cached token version after a write to the user (signals.py)"""
+    cache = _version_cache()
+    if cache is not None:
+        cache.delete(token_version_cache_key(user_id))
+
+
 class CustomJWTAuthentication(JWTAuthentication):
     """
     Custom JWT Authentication that uses our custom User model
     instead of Django's default auth.User
+    
+    With JWT_STATELESS_AUTH enabled, tokens carrying name/email/version claims
+    are authenticated without loading the User row (see get_stateless_user)
     """
     
     def get_user(self, validated_token):
@@ -21,12 +58,45 @@ class CustomJWTAuthentication(JWTAuthentication):
             if user_id is None:
                 raise InvalidToken('Token contained no recognizable user identification')
             
-            # Get user from our custom User model
-            user = User.objects.get(id=user_id)
+            if settings.JWT_STATELESS_AUTH and 'ver' in validated_token:
+                return self.get_stateless_user(validated_token)
+            
+            # Get user from our custom User model (cached until the users table changes)
+            user = User.objects.cached().get(id=user_id)
+            
+            # Reject tokens issued before the last revocation (e.g. password change)
+            if validated_token.get('ver', user.token_version) != user.token_version:
+                raise AuthenticationFailed('Token has been revoked', code='token_revoked')
             return user
             
         except User.DoesNotExist:
             raise AuthenticationFailed('User not found', code='user_not_found')
+    
+    def get_stateless_user(self, validated_token):
+        """
+        Build the user from the token claims instead of the database
+        
+        The returned User only has id, name, email and token_version loaded;
+        any other field (created_at, password) is fetched from the database
+        the first time a view touches it. The claims are trusted because any
+        change to them bumps token_version (update_my_profile), and the version
+        comes from the shared 'auth' cache or the database (current_token_version),
+        so a revoked or outdated token is refused by every worker at once.
+        """
+        user_id = int(validated_token['user_id'])
+        
+        current_version = current_token_version(user_id)
+        if current_version is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        
+        if validated_token['ver'] != current_version:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        
+        return User.from_db(
+            router.db_for_read(User),
+            CLAIM_FIELDS,
+            [user_id, validated_token['name'], validated_token['email'], validated_token['ver']]
+        )
 
 
 
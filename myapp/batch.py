@@ -0,0 +1,86 @@
+"""
+In-process dispatch of GET sub-requests for POST /api/batch/
+
+Each sub-request is resolved against the project URLconf and its view is
+called directly: no middleware, no second authentication. The batch
+request's already authenticated user is handed to the sub-view through
+_force_auth_user, which DRF's Request honours (and so does
+async_views._authenticate), so JWT decoding and the token version check
+run once per batch.
+"""
+import json
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+
+# Only API endpoints can be batched, and never the batch endpoint itself
+ALLOWED_PREFIX = '/api/'
+BATCH_PATH = '/api/batch/'
+
+
+class InvalidSubRequest(ValueError):
+    """Raised for sub-requests that can't be batched"""
+
+
+def validate_sub_request(item):
+    """Check one item of a batch body before anything runs; raises InvalidSubRequest"""
+    if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+        raise InvalidSubRequest('Each request needs a path')
+    method = item.get('method', 'GET')
+    if not isinstance(method, str) or method.upper() != 'GET':
+        raise InvalidSubRequest('Only GET requests can be batched')
+
+
+def _sub_request(request, path, query_string):
+    """A bare GET HttpRequest carrying the batch request's headers and user"""
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {
+        key: value for key, value in request.META.items()
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH')
+    }
+    sub.META.update(REQUEST_METHOD='GET', PATH_INFO=path, QUERY_STRING=query_string, CONTENT_LENGTH='0')
+    sub.GET = QueryDict(query_string)
+    sub._force_auth_user = request.user
+    # CSRF doesn't apply: the sub-request never reaches the middleware and is read-only
+    sub._dont_enforce_csrf_checks = True
+    return sub
+
+
+def _body(response):
+    """Response body as data to embed in the batch response"""
+    if hasattr(response, 'data'):
+        return response.data
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content or b'null')
+    return None
+
+
+def dispatch_get(request, url):
+    """
+    Run a GET sub-request for url (path plus optional query string) as the
+    batch request's user; returns (status, body). Raises InvalidSubRequest.
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith(ALLOWED_PREFIX):
+        raise InvalidSubRequest(f'path must start with {ALLOWED_PREFIX}')
+    if parts.path == BATCH_PATH:
+        raise InvalidSubRequest('batch requests cannot be nested')
+
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return status.HTTP_404_NOT_FOUND, {'success': False, 'message': 'Not found'}
+
+    sub = _sub_request(request, parts.path, parts.query)
+    sub.resolver_match = match
+    view = match.func
+    if iscoroutinefunction(view):
+        # async_views (ASYNC_MESSAGING=True)
+        view = async_to_sync(view)
+    response = view(sub, *match.args, **match.kwargs)
+    return response.status_code, _body(response)
@@ -0,0 +1,253 @@
+"""
+In-memory per-city day index for GET /api/events/calendar/
+
+"Which events overlap these days in this city" is an unselective range
+predicate on both start_date and end_date, so every calendar page scans
+most of a city's events. Each worker process instead keeps, per city, a
+bucket of active event ids for every day an event covers; a calendar
+window is then a handful of dict lookups.
+
+- Cities are loaded on first use by one background loader thread fed
+  by a bounded queue; until then (cold index), or when the queue is full,
+  calendar queries are answered from the database.
+- Only cities with active events are kept, and at most MAX_CITIES of
+  them: the least recently looked up city is evicted first, so arbitrary
+  ?city= values can't grow the index or start threads.
+- Saves and deletes in this process update the buckets directly
+  (signals.py). Changes made by other worker processes are picked up by
+  a delta sync on updated_at every SYNC_INTERVAL seconds.
+- Cities are reloaded after MAX_AGE seconds, which also drops events that
+  were hard-deleted by another process.
+"""
+import datetime
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from backend_api import metrics
+
+from .models import Event
+
+# Re-read rows updated this long before the last sync, for transactions that committed late
+SYNC_OVERLAP = datetime.timedelta(seconds=2)
+
+
+def _days(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += datetime.timedelta(days=1)
+
+
+class CalendarIndex:
+    """Day buckets of active event ids for the cities loaded so far"""
+
+    def __init__(self, sync_interval=5.0, max_age=600.0, max_cities=200):
+        self.sync_interval = sync_interval
+        self.max_age = max_age
+        self.max_cities = max_cities
+
+        self._lock = threading.RLock()
+        self._cities = OrderedDict()  # city -> {day: set of event ids}, least recently looked up first
+        self._events = {}          # event id -> (city, start_date, end_date), indexed events only
+        self._loaded_at = {}       # city -> monotonic time of the last full load
+        self._loading = set()      # cities queued for or being loaded by the loader thread
+        self._queue = queue.Queue(maxsize=max_cities)
+        self._loader = None
+        self._synced_at = None     # updated_at watermark of the last delta sync
+        self._next_sync = 0.0
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._loads = 0
+        self._evictions = 0
+        self._dropped_loads = 0
+        self._synced_rows = 0
+
+    def lookup(self, city, start, end):
+        """
+        Event ids per day between start and end (inclusive), or None if the city isn't loaded yet
+        """
+        self._sync_if_due()
+        with self._lock:
+            days = self._cities.get(city)
+            if days is None or time.monotonic() - self._loaded_at[city] > self.max_age:
+                self._misses += 1
+                self._load_in_background(city)
+                if days is None:
+                    return None
+            else:
+                self._hits += 1
+            self._cities.move_to_end(city)
+            return {day: sorted(days.get(day, ())) for day in _days(start, end)}
+
+    def update_event(self, event_id, city, start_date, end_date, is_active):
+        """Apply a saved event; events of cities that aren't loaded are ignored"""
+        with self._lock:
+            self._remove_locked(event_id)
+            days = self._cities.get(city)
+            if days is None or not is_active or start_date is None or end_date is None:
+                return
+            for day in _days(start_date, max(start_date, end_date)):
+                days.setdefault(day, set()).add(event_id)
+            self._events[event_id] = (city, start_date, end_date)
+
+    def remove_event(self, event_id):
+        with self._lock:
+            self._remove_locked(event_id)
+
+    def load_city(self, city):
+        """(Re)build the buckets of one city from the database; a city without active events is dropped"""
+        started = timezone.now()
+        rows = Event.objects.filter(city=city, is_active=True).values_list('id', 'start_date', 'end_date')
+
+        days = {}
+        events = {}
+        for event_id, start_date, end_date in rows.iterator(chunk_size=5000):
+            for day in _days(start_date, max(start_date, end_date)):
+                days.setdefault(day, set()).add(event_id)
+            events[event_id] = (city, start_date, end_date)
+
+        with self._lock:
+            self._drop_city_locked(city)
+            self._loads += 1
+            if events:
+                self._cities[city] = days
+                self._events.update(events)
+                self._loaded_at[city] = time.monotonic()
+                while len(self._cities) > self.max_cities:
+                    self._drop_city_locked(next(iter(self._cities)))
+                    self._evictions += 1
+            # Replay anything saved while the rows were being read
+            if self._synced_at is None or started < self._synced_at:
+                self._synced_at = started
+            self._next_sync = 0.0
+
+    def sync(self):
+        """Apply events changed (by any process) since the last sync"""
+        with self._lock:
+            if self._synced_at is None:
+                return
+            since = self._synced_at - SYNC_OVERLAP
+        started = timezone.now()
+        rows = list(Event.objects.filter(updated_at__gte=since).values_list(
+            'id', 'city', 'start_date', 'end_date', 'is_active'
+        ))
+        with self._lock:
+            for row in rows:
+                self.update_event(*row)
+            self._synced_at = started
+            self._synced_rows += len(rows)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cities': len(self._cities),
+                'events': len(self._events),
+                'day_buckets': sum(len(days) for days in self._cities.values()),
+                'hits': self._hits,
+                'misses': self._misses,
+                'loads': self._loads,
+                'evictions': self._evictions,
+                'dropped_loads': self._dropped_loads,
+                'synced_rows': self._synced_rows,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cities.clear()
+            self._events.clear()
+            self._loaded_at.clear()
+            self._synced_at = None
+
+    def _drop_city_locked(self, city):
+        days = self._cities.pop(city, None)
+        self._loaded_at.pop(city, None)
+        for event_ids in (days or {}).values():
+            for event_id in event_ids:
+                self._events.pop(event_id, None)
+
+    def _remove_locked(self, event_id):
+        entry = self._events.pop(event_id, None)
+        if entry is None:
+            return
+        city, start_date, end_date = entry
+        days = self._cities.get(city, {})
+        for day in _days(start_date, max(start_date, end_date)):
+            bucket = days.get(day)
+            if bucket is not None:
+                bucket.discard(event_id)
+                if not bucket:
+                    del days[day]
+
+    def _sync_if_due(self):
+        with self._lock:
+            now = time.monotonic()
+            if not self._cities or now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+        self.sync()
+
+    def _load_in_background(self, city):
+        """Queue city for the loader thread (called with the lock held)"""
+        if city in self._loading:
+            return
+        try:
+            self._queue.put_nowait(city)
+        except queue.Full:
+            # Served from the database; the next lookup queues it again
+            self._dropped_loads += 1
+            return
+        self._loading.add(city)
+        if self._loader is None or not self._loader.is_alive():
+            self._loader = threading.Thread(target=self._run_loader, name='calendar-index-loader', daemon=True)
+            self._loader.start()
+
+    def _run_loader(self):
+        while True:
+            city = self._queue.get()
+            try:
+                self.load_city(city)
+            except Exception:
+                pass  # The next lookup of the city queues it again
+            finally:
+                with self._lock:
+                    self._loading.discard(city)
+                connection.close()
+
+
+calendar_index = CalendarIndex(
+    sync_interval=settings.CALENDAR_INDEX['SYNC_INTERVAL'],
+    max_age=settings.CALENDAR_INDEX['MAX_AGE'],
+    max_cities=settings.CALENDAR_INDEX['MAX_CITIES'],
+)
+metrics.register('calendar_index', calendar_index.stats)
+
+
+def events_by_day_from_database(city, start, end):
+    """SQL fallback: event ids per day for active events overlapping the window"""
+    result = {day: [] for day in _days(start, end)}
+    rows = Event.objects.filter(
+        city=city, is_active=True, start_date__lte=end, end_date__gte=start
+    ).values_list('id', 'start_date', 'end_date').order_by('id')
+    for event_id, start_date, end_date in rows:
+        for day in _days(max(start, start_date), min(end, max(start_date, end_date))):
+            result[day].append(event_id)
+    return result
+
+
+def get_events_by_day(city, start, end):
+    """
+    Event ids per day for a city and window, and where they came from ('index' or 'database')
+    """
+    if settings.CALENDAR_INDEX['ENABLED']:
+        days = calendar_index.lookup(city, start, end)
+        if days is not None:
+            return days, 'index'
+    return events_by_day_from_database(city, start, end), 'database'
@@ -0,0 +1,107 @@
+"""
+Incremental maintenance of EventStats
+
+Writes adjust the counters with F() deltas in the same transaction as the
+write that caused them (receivers in signals.py, plus explicit calls from
+code paths that use QuerySet.update()). If an event has no stats row yet,
+it is computed from scratch instead. rebuild_event_stats() recomputes
+everything, e.g. after bulk imports that bypass signals.
+"""
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Conversation, Event, EventStats, Message, Review
+
+STATUS_FIELDS = {
+    'pending': 'pending_count',
+    'confirmed': 'confirmed_count',
+    'rejected': 'rejected_count',
+}
+
+
+def status_deltas(old_status, new_status):
+    """Counter deltas for a conversation moving from old_status (None if new) to new_status (None if deleted)"""
+    deltas = {}
+    if old_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[old_status]] = -1
+    if new_status in STATUS_FIELDS:
+        field = STATUS_FIELDS[new_status]
+        deltas[field] = deltas.get(field, 0) + 1
+    return {field: delta for field, delta in deltas.items() if delta}
+
+
+def adjust_event_stats(event_id, create_missing=True, **deltas):
+    """
+    Apply counter deltas, e.g. adjust_event_stats(1, pending_count=-1, confirmed_count=1)
+
+    Without a stats row the event's stats are computed from scratch (which includes the
+    write being counted), unless create_missing is False: deletes pass that, since
+    the row may already be gone as part of the event's own cascade delete.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = EventStats.objects.filter(event_id=event_id).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated and create_missing:
+        rebuild_event_stats([event_id])
+
+
+def compute_event_stats(event_ids=None):
+    """Counters computed from scratch, {event_id: {field: value}}, in three grouped queries"""
+    def scoped(queryset, field):
+        return queryset.filter(**{f'{field}__in': event_ids}) if event_ids is not None else queryset
+
+    stats = {}
+
+    def row(event_id):
+        if event_id not in stats:
+            stats[event_id] = {
+                'pending_count': 0, 'confirmed_count': 0, 'rejected_count': 0,
+                'message_count': 0, 'review_count': 0, 'rating_sum': 0,
+            }
+        return stats[event_id]
+
+    conversations = scoped(Conversation.objects, 'event_id').order_by().values('event_id').annotate(
+        **{field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()}
+    )
+    for values in conversations:
+        row(values.pop('event_id')).update(values)
+
+    messages = scoped(Message.objects, 'conversation__event_id').order_by().values(
+        'conversation__event_id'
+    ).annotate(count=Count('id'))
+    for values in messages:
+        row(values['conversation__event_id'])['message_count'] = values['count']
+
+    reviews = scoped(Review.objects, 'event_id').order_by().values('event_id').annotate(
+        count=Count('id'), total=Sum('rating')
+    )
+    for values in reviews:
+        stats_row = row(values['event_id'])
+        stats_row['review_count'] = values['count']
+        stats_row['rating_sum'] = values['total'] or 0
+
+    return stats
+
+
+def rebuild_event_stats(event_ids=None):
+    """Recompute and store the stats rows of the given events (all events if None)"""
+    events = Event.objects.all() if event_ids is None else Event.objects.filter(id__in=event_ids)
+    existing_ids = list(events.values_list('id', flat=True))
+    computed = compute_event_stats(None if event_ids is None else existing_ids)
+
+    rows = [EventStats(event_id=event_id, **computed.get(event_id, {})) for event_id in existing_ids]
+    EventStats.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['event'],
+        update_fields=[
+            'pending_count', 'confirmed_count', 'rejected_count',
+            'message_count', 'review_count', 'rating_sum', 'updated_at',
+        ],
+    )
+    return len(rows)
@@ -0,0 +1,108 @@
+"""
+Facet counts for the event browser (GET /api/events/facets/)
+
+All facets come from one grouped query over the filtered events, grouped
+by (category, city, state, date bucket) and rolled up per facet in
+Python. Results are cached per filter signature; the key includes a
+version bumped whenever an event is saved or deleted (signals.py), so
+edits show up without waiting for the timeout.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Value, When
+
+EVENTS_VERSION_KEY = 'events:version'
+
+# Query parameters that don't change which events match
+IGNORED_PARAMS = {'page', 'page_size', 'ordering', 'limit', 'cursor', 'include_my_status'}
+
+DATE_BUCKETS = ['past', 'ongoing', 'this_week', 'this_month', 'later']
+
+
+def get_events_version():
+    version = cache.get(EVENTS_VERSION_KEY)
+    if version is None:
+        cache.add(EVENTS_VERSION_KEY, 1, timeout=None)
+        version = cache.get(EVENTS_VERSION_KEY, 1)
+    return version
+
+
+def bump_events_version():
+    """Invalidate cached facet counts (called when events change)"""
+    try:
+        cache.incr(EVENTS_VERSION_KEY)
+    except ValueError:
+        cache.add(EVENTS_VERSION_KEY, 1, timeout=None)
+
+
+def filter_signature(query_params, today):
+    """Stable hash of the filtering query parameters"""
+    items = sorted(
+        (key, value)
+        for key in query_params
+        if key not in IGNORED_PARAMS
+        for value in query_params.getlist(key)
+    )
+    raw = repr((today.isoformat(), items)).encode()
+    return hashlib.sha1(raw).hexdigest()
+
+
+def date_bucket(today):
+    """Case expression putting each event in one of DATE_BUCKETS"""
+    return Case(
+        When(end_date__lt=today, then=Value('past')),
+        When(start_date__lte=today, then=Value('ongoing')),
+        When(start_date__lte=today + timedelta(days=7), then=Value('this_week')),
+        When(start_date__lte=today + timedelta(days=30), then=Value('this_month')),
+        default=Value('later'),
+        output_field=CharField(),
+    )
+
+
+def compute_facets(queryset, today):
+    """Per-facet counts for the events in queryset, from a single grouped query"""
+    rows = queryset.order_by().values(
+        'category_id', 'category__name', 'city', 'state', bucket=date_bucket(today)
+    ).annotate(count=Count('id'))
+
+    categories, cities, states = {}, {}, {}
+    buckets = dict.fromkeys(DATE_BUCKETS, 0)
+    total = 0
+    for row in rows:
+        count = row['count']
+        total += count
+        key = row['category_id']
+        if key not in categories:
+            categories[key] = {'id': key, 'name': row['category__name'], 'count': 0}
+        categories[key]['count'] += count
+        cities[row['city']] = cities.get(row['city'], 0) + count
+        states[row['state']] = states.get(row['state'], 0) + count
+        buckets[row['bucket']] += count
+
+    def by_count(counts):
+        return [
+            {'value': value, 'count': count}
+            for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        ]
+
+    return {
+        'total': total,
+        'category': sorted(categories.values(), key=lambda item: (-item['count'], item['name'] or '')),
+        'city': by_count(cities),
+        'state': by_count(states),
+        'date': [{'value': bucket, 'count': buckets[bucket]} for bucket in DATE_BUCKETS],
+    }
+
+
+def get_facets(queryset, query_params, today):
+    """Cached compute_facets(); returns (facets, cached)"""
+    key = f'events:facets:{get_events_version()}:{filter_signature(query_params, today)}'
+    facets = cache.get(key)
+    if facets is not None:
+        return facets, True
+    facets = compute_facets(queryset, today)
+    cache.set(key, facets, settings.EVENT_FACETS_CACHE_TIMEOUT)
+    return facets, False
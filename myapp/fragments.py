@@ -0,0 +1,241 @@
+"""
+Per-event fragment cache for event list pages
+
+Every filter combination used to re-serialize each event on the page
+through EventListSerializer (several queries per event). A list page is
+now assembled from fragments: the filtered queryset only returns the
+page's ids and updated_at, the serialized dict of each event is looked up
+by (id, updated_at), and only the misses are loaded and serialized.
+
+- Fragments live in a per-process LRU, then the host's shared snapshot
+  (snapshot.py, which also holds the host rating summaries), then the
+  'fragments' cache (Redis) when it is configured.
+- Any edit moves updated_at, so stale fragments are never looked up again;
+  image uploads and deletes touch their event (signals.py). Category edits
+  don't, so keys also hold a digest of the event's category as read with
+  the page's ids.
+- Keys also hold the day (is_upcoming and is_past depend on it) and the
+  request's scheme and host (image URLs are absolute).
+- Fields that don't belong to the event alone are never cached: the host's
+  rating stats come from host_stats() and the viewer's
+  my_request_status/my_review_id from the queryset's annotations.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Avg, Count
+
+from backend_api import metrics
+
+from .models import Event, Review
+from .serializers import EventListSerializer
+from .snapshot import fragment_key, host_rating_key, shared_snapshot
+
+# Bump when EventListSerializer output changes, so old fragments are ignored
+FRAGMENT_VERSION = 1
+
+HOST_FIELDS = ('host_average_rating', 'host_total_reviews')
+VIEWER_FIELDS = ('my_request_status', 'my_review_id')
+
+# Columns the list endpoints read from the filtered queryset instead of whole events
+ROW_FIELDS = ('id', 'updated_at', 'organizer_id')
+# The category_details a fragment shows, read with the row so a rename is seen at once
+CATEGORY_FIELDS = ('category__name', 'category__description', 'category__icon')
+
+
+class FragmentCache:
+    """Bounded LRU of serialized events in front of an optional shared cache"""
+
+    def __init__(self, max_entries, timeout, backend_alias=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.backend_alias = backend_alias
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        # Metrics
+        self._local_hits = 0
+        self._snapshot_hits = 0
+        self._backend_hits = 0
+        self._misses = 0
+        self._assemblies = 0
+        self._assembly_seconds = 0.0
+        self._last_assembly_seconds = 0.0
+
+    def get_many(self, keys):
+        """{key: fragment} for the keys found: LRU first, then the snapshot, then the shared cache"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                fragment = self._entries.get(key)
+                if fragment is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = fragment
+            self._local_hits += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            snapshot = shared_snapshot.get_many([fragment_key(key) for key in missing])
+            if snapshot:
+                shared = {key: snapshot[fragment_key(key)] for key in missing if fragment_key(key) in snapshot}
+                self._remember(shared)
+                found.update(shared)
+                with self._lock:
+                    self._snapshot_hits += len(shared)
+                missing = [key for key in missing if key not in found]
+
+        if missing and self.backend_alias:
+            shared = caches[self.backend_alias].get_many(missing)
+            if shared:
+                self._remember(shared)
+                found.update(shared)
+            with self._lock:
+                self._backend_hits += len(shared)
+
+        with self._lock:
+            self._misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, fragments):
+        self._remember(fragments)
+        if fragments and self.backend_alias:
+            caches[self.backend_alias].set_many(fragments, self.timeout)
+
+    def _remember(self, fragments):
+        with self._lock:
+            for key, fragment in fragments.items():
+                self._entries[key] = fragment
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hottest(self, count):
+        """Up to count most recently used (key, fragment) pairs, least recent first"""
+        with self._lock:
+            return list(self._entries.items())[-count:] if count else []
+
+    def record_assembly(self, seconds):
+        with self._lock:
+            self._assemblies += 1
+            self._assembly_seconds += seconds
+            self._last_assembly_seconds = seconds
+
+    def stats(self):
+        with self._lock:
+            hits = self._local_hits + self._snapshot_hits + self._backend_hits
+            lookups = hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'shared_cache': self.backend_alias,
+                'local_hits': self._local_hits,
+                'snapshot_hits': self._snapshot_hits,
+                'shared_hits': self._backend_hits,
+                'misses': self._misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else None,
+                'assemblies': self._assemblies,
+                'assembly_ms_avg': round(self._assembly_seconds * 1000 / self._assemblies, 3) if self._assemblies else None,
+                'assembly_ms_last': round(self._last_assembly_seconds * 1000, 3),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+fragment_cache = FragmentCache(
+    max_entries=settings.EVENT_FRAGMENTS['MAX_ENTRIES'] if settings.EVENT_FRAGMENTS['ENABLED'] else 0,
+    timeout=settings.EVENT_FRAGMENTS['TIMEOUT'],
+    backend_alias='fragments' if settings.EVENT_FRAGMENTS['ENABLED'] and 'fragments' in settings.CACHES else None,
+)
+metrics.register('event_fragments', fragment_cache.stats)
+
+
+def fragment_rows(queryset, include_my_status=False):
+    """The filtered event queryset reduced to the columns assemble_events() needs"""
+    fields = ROW_FIELDS + CATEGORY_FIELDS + (VIEWER_FIELDS if include_my_status else ())
+    return queryset.select_related(None).prefetch_related(None).values(*fields)
+
+
+def _category_digest(values):
+    return hashlib.sha1(repr(values).encode()).hexdigest()[:12]
+
+
+def _fragment_key(event_id, updated_at, category, today, base):
+    return f'event:{FRAGMENT_VERSION}:{event_id}:{updated_at.isoformat()}:{category}:{today.isoformat()}:{base}'
+
+
+def host_stats(host_ids):
+    """
+    {host id: (average rating, review count)}, from the shared snapshot where
+    it has them, else in one grouped query
+    """
+    host_ids = set(host_ids)
+    snapshot = shared_snapshot.get_many([host_rating_key(host_id) for host_id in host_ids])
+    stats = {host_id: snapshot[host_rating_key(host_id)] for host_id in host_ids if host_rating_key(host_id) in snapshot}
+    missing = host_ids - stats.keys()
+    if missing:
+        rows = Review.objects.filter(host_id__in=missing).order_by().values('host_id').annotate(
+            average=Avg('rating'), total=Count('id')
+        )
+        stats.update(
+            (row['host_id'], (round(row['average'], 1) if row['average'] else 0, row['total']))
+            for row in rows
+        )
+    return stats
+
+
+def assemble_events(rows, request, today, include_my_status=False):
+    """
+    EventListSerializer output for rows from fragment_rows(), in order,
+    serializing only the events whose fragment isn't cached
+    """
+    started = time.perf_counter()
+    rows = list(rows)
+    base = hashlib.sha1(request.build_absolute_uri('/').encode()).hexdigest()[:12] if request else '-'
+    keys = [
+        _fragment_key(row['id'], row['updated_at'], _category_digest([row[field] for field in CATEGORY_FIELDS]), today, base)
+        for row in rows
+    ]
+    stats = host_stats(row['organizer_id'] for row in rows)
+
+    fragments = fragment_cache.get_many(keys)
+    missing = {row['id']: key for row, key in zip(rows, keys) if key not in fragments}
+    if missing:
+        events = list(Event.objects.filter(id__in=missing).select_related('category').prefetch_related(
+            'images'
+        ).with_computed_fields(today))
+        serializer = EventListSerializer(events, many=True, context={'request': request, 'host_stats': stats})
+        fresh = {}
+        for event, data in zip(events, serializer.data):
+            data = {name: value for name, value in data.items() if name not in HOST_FIELDS}
+            # Stored under the updated_at and category it was serialized with, which are newer than the row's if it was just edited
+            category = event.category
+            digest = _category_digest([category.name, category.description, category.icon] if category else [None] * 3)
+            fresh[_fragment_key(event.id, event.updated_at, digest, today, base)] = data
+            fragments[missing[event.id]] = data
+        fragment_cache.set_many(fresh)
+
+    field_names = [
+        name for name in EventListSerializer.Meta.fields
+        if include_my_status or name not in VIEWER_FIELDS
+    ]
+    results = []
+    for row, key in zip(rows, keys):
+        fragment = fragments.get(key)
+        if fragment is None:
+            # Deleted between the id query and loading the misses
+            continue
+        average, total = stats.get(row['organizer_id'], (0, 0))
+        values = dict(fragment, host_average_rating=average, host_total_reviews=total)
+        if include_my_status:
+            values.update((field, row[field]) for field in VIEWER_FIELDS)
+        results.append({name: values[name] for name in field_names})
+
+    fragment_cache.record_assembly(time.perf_counter() - started)
+    return results
@@ -0,0 +1,35 @@
+"""
+Password hashers with parameters taken from settings.PASSWORD_HASHING
+
+Each hasher keeps the algorithm name of the Django hasher it extends, so
+existing hashes stay verifiable; when the configured parameters change,
+must_update() flags old hashes and they are upgraded on the next login
+(see passwords.py).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+def _param(name, default):
+    value = settings.PASSWORD_HASHING.get(name)
+    return default if value is None else value
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = _param('PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    time_cost = _param('ARGON2_TIME_COST', Argon2PasswordHasher.time_cost)
+    memory_cost = _param('ARGON2_MEMORY_COST', Argon2PasswordHasher.memory_cost)  # KiB
+    parallelism = _param('ARGON2_PARALLELISM', Argon2PasswordHasher.parallelism)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = _param('SCRYPT_WORK_FACTOR', ScryptPasswordHasher.work_factor)
+    block_size = _param('SCRYPT_BLOCK_SIZE', ScryptPasswordHasher.block_size)
+    parallelism = _param('SCRYPT_PARALLELISM', ScryptPasswordHasher.parallelism)
@@ -0,0 +1,177 @@
+"""
+Idempotency-Key support for POST endpoints that create things
+
+Mobile clients retry on flaky networks. A request with an Idempotency-Key
+header runs once per (user, key): its response is stored in the
+'idempotency' cache (Redis or a per-process LRU, see settings.CACHES) and
+replayed to retries, with an Idempotent-Replayed: true header, without
+running the view again.
+
+- A duplicate arriving while the first request is still running waits for
+  its response (cache.add() on a lock key marks the request in flight),
+  and gets 409 if it doesn't finish within WAIT_TIMEOUT.
+- Reusing a key with a different request body is rejected with 422.
+- 5xx responses aren't stored, so retrying after a server error runs again.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks while waiting for an in-flight duplicate
+POLL_INTERVAL = 0.05
+
+
+def _cache():
+    return caches['idempotency']
+
+
+def request_fingerprint(request, data):
+    """Hash of the method, path and parsed body, to spot a key reused for another request"""
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    raw = json.dumps([request.method, request.path, data], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _cache_keys(user_id, key):
+    # Hashed: client keys may contain characters some cache backends reject
+    scope = f'{user_id}:{hashlib.sha256(key.encode()).hexdigest()}'
+    return f'response:{scope}', f'lock:{scope}'
+
+
+def _claim(response_key, lock_key, fingerprint):
+    """
+    One attempt at taking the request: ('replay', stored), ('mismatch', None),
+    ('run', None) if this request should run the view, or ('wait', None)
+    """
+    cache = _cache()
+    stored = cache.get(response_key)
+    if stored is None and cache.add(lock_key, fingerprint, settings.IDEMPOTENCY['LOCK_TIMEOUT']):
+        # The previous holder may have stored its response just before releasing the lock
+        stored = cache.get(response_key)
+        if stored is None:
+            return 'run', None
+        cache.delete(lock_key)
+    if stored is not None:
+        return ('replay' if stored['fingerprint'] == fingerprint else 'mismatch'), stored
+    in_flight = cache.get(lock_key)
+    return ('mismatch' if in_flight not in (None, fingerprint) else 'wait'), None
+
+
+def _resolve(response_key, lock_key, fingerprint):
+    deadline = time.monotonic() + settings.IDEMPOTENCY['WAIT_TIMEOUT']
+    while True:
+        outcome, stored = _claim(response_key, lock_key, fingerprint)
+        if outcome != 'wait' or time.monotonic() >= deadline:
+            return outcome, stored
+        time.sleep(POLL_INTERVAL)
+
+
+async def _aresolve(response_key, lock_key, fingerprint):
+    deadline = time.monotonic() + settings.IDEMPOTENCY['WAIT_TIMEOUT']
+    while True:
+        outcome, stored = await sync_to_async(_claim)(response_key, lock_key, fingerprint)
+        if outcome != 'wait' or time.monotonic() >= deadline:
+            return outcome, stored
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def _store(response_key, fingerprint, status_code, data):
+    if status_code < 500:
+        _cache().set(response_key, {
+            'fingerprint': fingerprint,
+            'status': status_code,
+            'data': data,
+        }, settings.IDEMPOTENCY['TTL'])
+
+
+def _error(outcome):
+    """(body, status, headers) for the outcomes that don't run or replay the view"""
+    if outcome == 'invalid':
+        return {
+            'success': False,
+            'message': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'
+        }, status.HTTP_400_BAD_REQUEST, {}
+    if outcome == 'mismatch':
+        return {
+            'success': False,
+            'message': f'{HEADER} was already used for a different request'
+        }, status.HTTP_422_UNPROCESSABLE_ENTITY, {}
+    return {
+        'success': False,
+        'message': f'A request with this {HEADER} is still being processed'
+    }, status.HTTP_409_CONFLICT, {'Retry-After': '1'}
+
+
+def idempotent(view):
+    """
+    Decorator for DRF views (innermost, so request.user is authenticated):
+    honour the Idempotency-Key header. For ViewSet methods use method_decorator(idempotent).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            body, code, headers = _error('invalid')
+            return Response(body, status=code, headers=headers)
+
+        response_key, lock_key = _cache_keys(request.user.id, key)
+        fingerprint = request_fingerprint(request, request.data)
+        outcome, stored = _resolve(response_key, lock_key, fingerprint)
+        if outcome == 'replay':
+            return Response(stored['data'], status=stored['status'], headers={REPLAYED_HEADER: 'true'})
+        if outcome != 'run':
+            body, code, headers = _error(outcome)
+            return Response(body, status=code, headers=headers)
+
+        try:
+            response = view(request, *args, **kwargs)
+            _store(response_key, fingerprint, response.status_code, response.data)
+            return response
+        finally:
+            _cache().delete(lock_key)
+    return wrapper
+
+
+async def run_idempotent(request, user_id, data, handler, render):
+    """
+    Async counterpart of idempotent() for the views in async_views.py, called
+    after authentication: awaits handler() at most once per key and builds
+    replies with render(data, status, headers)
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return await handler()
+    if len(key) > MAX_KEY_LENGTH:
+        body, code, headers = _error('invalid')
+        return render(body, status=code, headers=headers)
+
+    response_key, lock_key = _cache_keys(user_id, key)
+    fingerprint = request_fingerprint(request, data)
+    outcome, stored = await _aresolve(response_key, lock_key, fingerprint)
+    if outcome == 'replay':
+        return render(stored['data'], status=stored['status'], headers={REPLAYED_HEADER: 'true'})
+    if outcome != 'run':
+        body, code, headers = _error(outcome)
+        return render(body, status=code, headers=headers)
+
+    try:
+        response = await handler()
+        await sync_to_async(_store)(response_key, fingerprint, response.status_code, json.loads(response.content))
+        return response
+    finally:
+        await sync_to_async(_cache().delete)(lock_key)
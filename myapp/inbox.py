@@ -0,0 +1,253 @@
+"""
+Sending messages, read watermarks and the unread counters behind the badge
+
+Each conversation keeps its message count and an unread count per
+participant (messages past their read watermark), and each user an
+InboxCounter with the totals: unread messages and conversations with
+anything unread. New messages (record_message()), deletes (signals.py)
+and mark_read() apply single-row F() deltas in the same transaction as the
+write, so the badge is a primary key lookup. rebuild_inbox_counters() recomputes all of them from
+the messages and watermarks (manage.py reconcile_inbox_counters).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, Exists, F, FilteredRelation, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .event_stats import adjust_event_stats
+from .models import Conversation, Event, InboxCounter, Message, User
+
+
+def adjust_unread(conversation_id, reader_id, field, delta, create_missing=True, **updates):
+    """
+    Add delta to one participant's unread count (field) in a conversation and
+    to their InboxCounter; extra updates are applied to the conversation in
+    the same UPDATE
+
+    Two single-row statements. The counter's thread delta is read back from
+    the conversation row in the same statement: the conversation UPDATE holds
+    the row lock, so concurrent deltas see each other's result.
+    """
+    with transaction.atomic():
+        if delta:
+            updates[field] = Greatest(F(field) + delta, 0)
+        if not Conversation.objects.filter(id=conversation_id).update(**updates) or not delta:
+            return
+
+        # A thread becomes unread when its count goes from 0 to delta, read when it drops to 0
+        became = Conversation.objects.filter(id=conversation_id, **{field: max(delta, 0)})
+        updated = InboxCounter.objects.filter(user_id=reader_id).update(
+            unread_messages=Greatest(F('unread_messages') + delta, 0),
+            unread_threads=Greatest(F('unread_threads') + Case(
+                When(Exists(became), then=Value(1 if delta > 0 else -1)), default=Value(0)
+            ), 0),
+            updated_at=timezone.now(),
+        )
+        if not updated and create_missing:
+            rebuild_inbox_counters([reader_id])
+
+
+def _reader_id(conversation, sender_id):
+    """The participant a message from sender_id is for (None for a conversation with oneself)"""
+    reader_id = conversation.host_id if sender_id == conversation.user_id else conversation.user_id
+    return reader_id if reader_id != sender_id else None
+
+
+def record_message(message, conversation):
+    """
+    Count a new message: its conversation's message count and last message time,
+    the recipient's unread count and InboxCounter, and its event's EventStats
+    """
+    reader_id = _reader_id(conversation, message.sender_id)
+    adjust_unread(
+        conversation.id, reader_id, conversation.unread_count_field(reader_id), 1 if reader_id else 0,
+        message_count=F('message_count') + 1,
+        last_message_at=message.created_at,
+    )
+    adjust_event_stats(conversation.event_id, message_count=1)
+
+
+def forget_message(message):
+    """Uncount a deleted message (and its unread count if its recipient hadn't read it), in one conversation UPDATE"""
+    conversation = Conversation.objects.filter(id=message.conversation_id).only(
+        'user_id', 'host_id', 'user_last_read_id', 'host_last_read_id'
+    ).first()
+    if conversation is None:
+        return
+    reader_id = _reader_id(conversation, message.sender_id)
+    unread = reader_id is not None and message.id > conversation.last_read_id(reader_id)
+    adjust_unread(
+        conversation.id, reader_id, conversation.unread_count_field(reader_id), -1 if unread else 0,
+        create_missing=False,
+        message_count=Greatest(F('message_count') - 1, 0),
+        # post_delete: the message is already gone, so this is the newest remaining one
+        last_message_at=Subquery(
+            Message.objects.filter(conversation_id=OuterRef('id')).order_by('-created_at').values('created_at')[:1]
+        ),
+    )
+
+
+def send_message(event_id, sender, text):
+    """
+    Add a message to the sender's conversation for an event, creating the
+    conversation with the first message
+
+    Returns (conversation, created, message_count); raises Event.DoesNotExist.
+    One query finds the event together with the sender's conversation (as
+    attendee or host); the first message inserts the conversation (and counts
+    it in EventStats). Then, in one transaction, the message INSERT and
+    record_message(): single-row UPDATEs of the conversation, the recipient's
+    InboxCounter and EventStats. Concurrent first messages both try the
+    conversation INSERT; the loser's unique_together violation is caught and
+    it continues with the winner's conversation.
+    """
+    mine = FilteredRelation('conversations', condition=Q(conversations__user=sender) | Q(conversations__host=sender))
+    rows = list(Event.objects.filter(id=event_id).annotate(mine=mine).values(
+        'id', 'organizer_id', 'mine__id', 'mine__user_id', 'mine__host_id', 'mine__message_count'
+    ))
+    if not rows:
+        raise Event.DoesNotExist('Event not found')
+    if len(rows) > 1:
+        raise Conversation.MultipleObjectsReturned('More than one conversation matches this event and user')
+    row = rows[0]
+
+    with transaction.atomic():
+        if row['mine__id'] is not None:
+            # Only carries the ids the response needs; never saved
+            conversation = Conversation(
+                id=row['mine__id'], event_id=row['id'], user_id=row['mine__user_id'], host_id=row['mine__host_id']
+            )
+            created, message_count = False, row['mine__message_count'] + 1
+        else:
+            try:
+                with transaction.atomic():
+                    conversation = Conversation.objects.create(
+                        event_id=row['id'], user=sender, host_id=row['organizer_id']
+                    )
+                created, message_count = True, 1
+            except IntegrityError:
+                conversation = Conversation.objects.get(event_id=row['id'], user=sender, host_id=row['organizer_id'])
+                created, message_count = False, conversation.message_count + 1
+
+        message = Message(conversation=conversation, sender=sender, text=text)
+        # Counted below, not by the post_save receiver for messages created elsewhere
+        message._counted = True
+        message.save()
+        record_message(message, conversation)
+    return conversation, created, message_count
+
+
+def mark_read(conversation, user):
+    """
+    Move user's read watermark to the latest message; returns how many messages
+    from the other participant that marked as read
+
+    Writes the conversation row (and the user's InboxCounter) whatever the thread length.
+    """
+    last_read_field, read_at_field = conversation.read_fields(user.id)
+    newer = Message.objects.filter(conversation=conversation, id__gt=getattr(conversation, last_read_field)).aggregate(
+        latest_id=Max('id'),
+        unread_count=Count('id', filter=~Q(sender=user))
+    )
+    if not newer['latest_id']:
+        return 0
+
+    with transaction.atomic():
+        # Conditional so a concurrent, further-ahead mark never moves the watermark back
+        moved = Conversation.objects.filter(
+            id=conversation.id, **{f'{last_read_field}__lt': newer['latest_id']}
+        ).update(**{last_read_field: newer['latest_id'], read_at_field: timezone.now()})
+        if not moved:
+            return 0
+        adjust_unread(conversation.id, user.id, conversation.unread_count_field(user.id), -newer['unread_count'])
+    return newer['unread_count']
+
+
+def compute_unread_counts(user_ids=None):
+    """
+    Unread counts from the watermarks: {(conversation id, field): count} for
+    conversations with unread messages, in two grouped queries
+    """
+    counts = {}
+    sides = [
+        # (field, reader, other participant)
+        ('user_unread_count', 'user', 'host'),
+        ('host_unread_count', 'host', 'user'),
+    ]
+    for field, reader, other in sides:
+        messages = Message.objects.filter(
+            sender_id=F(f'conversation__{other}_id'),
+            id__gt=F(f'conversation__{reader}_last_read_id'),
+        ).exclude(sender_id=F(f'conversation__{reader}_id'))
+        if user_ids is not None:
+            messages = messages.filter(**{f'conversation__{reader}_id__in': user_ids})
+        for row in messages.order_by().values('conversation_id').annotate(count=Count('id')):
+            counts[(row['conversation_id'], field)] = row['count']
+    return counts
+
+
+def rebuild_inbox_counters(user_ids=None):
+    """
+    Recompute the conversation counts (messages and unread) and InboxCounters of
+    the given users (everyone if None); returns (users, conversations fixed, counters fixed)
+    """
+    counts = compute_unread_counts(user_ids)
+    users = User.objects.all() if user_ids is None else User.objects.filter(id__in=user_ids)
+    totals = {user_id: [0, 0] for user_id in users.values_list('id', flat=True)}
+
+    conversations = Conversation.objects.all()
+    if user_ids is not None:
+        conversations = conversations.filter(Q(user_id__in=user_ids) | Q(host_id__in=user_ids))
+
+    message_totals = {
+        row['conversation_id']: (row['count'], row['latest'])
+        for row in Message.objects.filter(conversation__in=conversations).order_by().values('conversation_id').annotate(
+            count=Count('id'), latest=Max('created_at')
+        )
+    }
+
+    changed = []
+    fields = ['message_count', 'last_message_at', 'user_unread_count', 'host_unread_count']
+    for conversation in conversations.only('id', 'user_id', 'host_id', *fields).iterator():
+        message_count, last_message_at = message_totals.get(conversation.id, (0, None))
+        dirty = (conversation.message_count, conversation.last_message_at) != (message_count, last_message_at)
+        conversation.message_count, conversation.last_message_at = message_count, last_message_at
+        for field, reader_id in (('user_unread_count', conversation.user_id), ('host_unread_count', conversation.host_id)):
+            if reader_id not in totals:
+                continue
+            count = counts.get((conversation.id, field), 0)
+            if count:
+                totals[reader_id][0] += count
+                totals[reader_id][1] += 1
+            if getattr(conversation, field) != count:
+                setattr(conversation, field, count)
+                dirty = True
+        if dirty:
+            changed.append(conversation)
+    Conversation.objects.bulk_update(changed, fields, batch_size=1000)
+
+    counters = InboxCounter.objects.all() if user_ids is None else InboxCounter.objects.filter(user_id__in=user_ids)
+    existing = {
+        counter.user_id: (counter.unread_messages, counter.unread_threads)
+        for counter in counters
+    }
+    counters_fixed = sum(1 for user_id, total in totals.items() if existing.get(user_id) != tuple(total))
+    InboxCounter.objects.bulk_create(
+        [InboxCounter(user_id=user_id, unread_messages=messages, unread_threads=threads)
+         for user_id, (messages, threads) in totals.items()],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['unread_messages', 'unread_threads', 'updated_at'],
+    )
+    return len(totals), len(changed), counters_fixed
+
+
+def get_inbox_counter(user):
+    """The user's InboxCounter, computed on first use"""
+    counter = InboxCounter.objects.filter(user_id=user.id).first()
+    if counter is None:
+        with transaction.atomic():
+            rebuild_inbox_counters([user.id])
+        counter = InboxCounter.objects.get(user_id=user.id)
+    return counter
@@ -18,6 +18,7 @@ def get_tokens_for_user(user):
     
     # Add custom claims
     refresh['user_id'] = str(user.id)  # Use our custom User's ID
+    add_user_claims(refresh, user)
     
     return {
         'refresh': str(refresh),
@@ -25,5 +26,15 @@ def get_tokens_for_user(user):
     }
 
 
+def add_user_claims(token, user):
+    """
+    Embed the profile fields and token version used by the stateless auth mode
+    (JWT_STATELESS_AUTH), so authentication can build the user without a query
+    """
+    token['name'] = user.name
+    token['email'] = user.email
+    token['ver'] = user.token_version
+
+
 
 
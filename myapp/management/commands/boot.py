@@ -0,0 +1,171 @@
+"""
+Management command run before gunicorn on every start: migrate and populate_categories, only when needed
+Run: python manage.py boot [--force]
+
+Compares the migrations on disk with the migrations applied to the
+database, and the predefined categories (myapp.categories) with the
+categories table. When both match, which is every restart that doesn't
+ship a migration or a category change, it exits after a few queries.
+Otherwise it runs the steps that are needed under an advisory lock
+(pg_advisory_lock on PostgreSQL, a file lock elsewhere) so instances
+starting together don't migrate concurrently, re-checking once it holds
+the lock in case another instance already did the work.
+
+Loading the migration graph imports every migration module, so once the
+migrations on disk are fully applied, boot records a hash of the files
+and of django_migrations in the runtime directory (backend_api/runtime.py).
+While both still match, the graph isn't loaded at all.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Count, Max
+
+from backend_api.runtime import private_directory
+
+from myapp.categories import CATEGORIES, fingerprint
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to running unlocked
+    fcntl = None
+
+# pg_advisory_lock key shared by every instance of the app
+LOCK_KEY = zlib.crc32(b'backend_api.boot')
+
+
+@contextmanager
+def advisory_lock():
+    """Hold a lock shared by all instances using this database until the block ends"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [LOCK_KEY])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [LOCK_KEY])
+        return
+
+    with open(runtime_path('lock'), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def runtime_path(suffix):
+    """Per-database file in the private runtime directory"""
+    database = hashlib.sha1(str(connection.settings_dict['NAME']).encode()).hexdigest()[:12]
+    return os.path.join(private_directory(), f'boot_{database}.{suffix}')
+
+
+def migrations_on_disk():
+    """Hash of every installed app's migration files, read without importing them"""
+    digest = hashlib.sha256()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        spec = importlib.util.find_spec(module_name) if module_name else None
+        for directory in (spec.submodule_search_locations or []) if spec else []:
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.py'):
+                    with open(os.path.join(directory, name), 'rb') as f:
+                        digest.update(f'{app_config.label}/{name}\0'.encode() + f.read() + b'\0')
+    return digest.hexdigest()
+
+
+def applied_migrations():
+    """(count, latest applied) from django_migrations, which changes whenever anyone migrates"""
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table():
+        return None
+    summary = recorder.migration_qs.aggregate(count=Count('id'), latest=Max('applied'))
+    return [summary['count'], summary['latest'].isoformat() if summary['latest'] else None]
+
+
+def recorded_state():
+    """What the last boot that left nothing pending recorded, or None"""
+    try:
+        with open(runtime_path('json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def record_state(on_disk):
+    """Record that the migrations on disk are all applied to the database as it is now"""
+    path = runtime_path('json')
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump({'migrations': on_disk, 'applied': applied_migrations()}, f)
+    os.replace(temporary, path)
+
+
+def pending_migrations():
+    """Migrations on disk not applied yet; loads (imports) the whole migration graph"""
+    executor = MigrationExecutor(connection)
+    graph = executor.loader.graph
+    return [migration for migration, backwards in executor.migration_plan(graph.leaf_nodes()) if not backwards]
+
+
+def categories_changed():
+    """Whether the categories table differs from CATEGORIES (extra rows don't count)"""
+    from myapp.models import Category
+
+    stored = Category.objects.filter(name__in=[category['name'] for category in CATEGORIES]).values(
+        'name', 'description', 'icon'
+    )
+    return fingerprint(stored) != fingerprint(CATEGORIES)
+
+
+class Command(BaseCommand):
+    help = 'Run migrate and populate_categories only if migrations or categories changed'
+    # Part of every cold start: gunicorn doesn't run the system checks either
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Run both steps even if nothing changed')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        on_disk = migrations_on_disk()
+        recorded = not options['force'] and recorded_state() == {
+            'migrations': on_disk, 'applied': applied_migrations(),
+        }
+        pending = [] if recorded else pending_migrations()
+        # With migrations pending the categories table may not even exist yet
+        needs_categories = options['force'] or bool(pending) or categories_changed()
+        self.stdout.write(
+            f'Migrations {on_disk[:12]}: '
+            f'{"applied as of the last boot" if recorded else f"{len(pending)} pending"}; '
+            f'categories {"changed" if needs_categories else "unchanged"}'
+        )
+
+        if options['force'] or pending or needs_categories:
+            with advisory_lock():
+                # Another instance may have finished while we waited for the lock
+                if options['force'] or pending_migrations():
+                    call_command('migrate', interactive=False, verbosity=options['verbosity'])
+                if options['force'] or categories_changed():
+                    call_command('populate_categories', verbosity=options['verbosity'])
+        else:
+            self.stdout.write('Nothing changed, skipping migrate and populate_categories')
+
+        if not recorded:
+            try:
+                record_state(on_disk)
+            except OSError as exc:
+                self.stderr.write(f'Could not record the migration state, the next boot loads the graph: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(f'Boot checks done in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,25 @@
+"""
+Management command to write the shared snapshot (categories, host rating summaries, hot event fragments)
+Run: python manage.py build_shared_snapshot
+
+Workers rebuild it themselves once it is older than SHARED_SNAPSHOT['MAX_AGE'];
+run this at deploy time so new workers start warm.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.snapshot import shared_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Write the memory-mapped snapshot shared by the workers on this host'
+
+    def handle(self, *args, **options):
+        if not settings.SHARED_SNAPSHOT['ENABLED']:
+            raise CommandError('The shared snapshot is disabled (SHARED_SNAPSHOT=False)')
+        # Keep the previous snapshot's fragments: this process has no LRU of its own
+        count = shared_snapshot.rebuild(carry_over_fragments=True)
+        stats = shared_snapshot.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote snapshot version {stats["version"]} with {count} entries to {stats["path"]}'
+        ))
@@ -3,7 +3,9 @@ Management command to populate predefined event categories
 Run: python manage.py populate_categories
 """
 from django.core.management.base import BaseCommand
+from myapp.categories import CATEGORIES
 from myapp.models import Category
+from myapp.snapshot import shared_snapshot
 
 
 class Command(BaseCommand):
@@ -12,171 +14,10 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         """Create all predefined categories"""
         
-        categories_data = [
-            # Social & Networking
-            {
-                'name': 'Networking',
-                'description': 'Professional networking events, meetups, and business connections',
-                'icon': '🤝'
-            },
-            {
-                'name': 'Social Gathering',
-                'description': 'Casual social events, parties, and get-togethers',
-                'icon': '🎉'
-            },
-            
-            # Sports & Fitness
-            {
-                'name': 'Sports',
-                'description': 'Sports tournaments, games, and athletic competitions',
-                'icon': '⚽'
-            },
-            {
-                'name': 'Fitness & Wellness',
-                'description': 'Yoga, gym sessions, running clubs, and health activities',
-                'icon': '🏃'
-            },
-            {
-                'name': 'Outdoor Adventures',
-                'description': 'Hiking, camping, climbing, and outdoor activities',
-                'icon': '🏕️'
-            },
-            
-            # Arts & Culture
-            {
-                'name': 'Music & Concerts',
-                'description': 'Live music, concerts, DJ nights, and musical performances',
-                'icon': '🎵'
-            },
-            {
-                'name': 'Arts & Crafts',
-                'description': 'Painting, pottery, DIY workshops, and creative activities',
-                'icon': '🎨'
-            },
-            {
-                'name': 'Theater & Performances',
-                'description': 'Theater shows, stand-up comedy, dance performances',
-                'icon': '🎭'
-            },
-            {
-                'name': 'Film & Photography',
-                'description': 'Movie screenings, film festivals, photography exhibitions',
-                'icon': '📸'
-            },
-            
-            # Education & Learning
-            {
-                'name': 'Workshops & Classes',
-                'description': 'Educational workshops, skill-building classes, and training sessions',
-                'icon': '📚'
-            },
-            {
-                'name': 'Tech & Innovation',
-                'description': 'Hackathons, coding workshops, tech meetups, and innovation events',
-                'icon': '💻'
-            },
-            {
-                'name': 'Business & Career',
-                'description': 'Business conferences, career fairs, professional development',
-                'icon': '💼'
-            },
-            {
-                'name': 'Science & Education',
-                'description': 'Science fairs, lectures, seminars, and academic events',
-                'icon': '🔬'
-            },
-            
-            # Food & Drink
-            {
-                'name': 'Food & Dining',
-                'description': 'Food festivals, cooking classes, restaurant events, tastings',
-                'icon': '🍽️'
-            },
-            {
-                'name': 'Wine & Beer Tasting',
-                'description': 'Wine tastings, brewery tours, cocktail workshops',
-                'icon': '🍷'
-            },
-            
-            # Community & Volunteering
-            {
-                'name': 'Community Service',
-                'description': 'Volunteer work, charity events, community clean-ups',
-                'icon': '🤲'
-            },
-            {
-                'name': 'Environmental',
-                'description': 'Beach clean-ups, tree planting, sustainability events',
-                'icon': '🌱'
-            },
-            {
-                'name': 'Fundraising & Charity',
-                'description': 'Charity galas, fundraisers, donation drives',
-                'icon': '❤️'
-            },
-            
-            # Family & Kids
-            {
-                'name': 'Family & Kids',
-                'description': 'Family-friendly events, kids activities, playdates',
-                'icon': '👨‍👩‍👧‍👦'
-            },
-            
-            # Special Interests
-            {
-                'name': 'Gaming & Esports',
-                'description': 'Video game tournaments, board game nights, esports events',
-                'icon': '🎮'
-            },
-            {
-                'name': 'Book Clubs & Literature',
-                'description': 'Book readings, author meetups, literary discussions',
-                'icon': '📖'
-            },
-            {
-                'name': 'Fashion & Beauty',
-                'description': 'Fashion shows, beauty workshops, styling events',
-                'icon': '👗'
-            },
-            {
-                'name': 'Pets & Animals',
-                'description': 'Pet meetups, adoption events, animal welfare activities',
-                'icon': '🐾'
-            },
-            
-            # Travel & Tourism
-            {
-                'name': 'Travel & Tourism',
-                'description': 'Travel meetups, group trips, cultural tours',
-                'icon': '✈️'
-            },
-            
-            # Spiritual & Wellness
-            {
-                'name': 'Spirituality & Religion',
-                'description': 'Meditation sessions, religious gatherings, spiritual retreats',
-                'icon': '🧘'
-            },
-            
-            # Seasonal & Holidays
-            {
-                'name': 'Holiday & Seasonal',
-                'description': 'Christmas parties, Halloween events, seasonal celebrations',
-                'icon': '🎄'
-            },
-            
-            # Other
-            {
-                'name': 'Other',
-                'description': 'Events that don\'t fit into other categories',
-                'icon': '📌'
-            },
-        ]
-        
         created_count = 0
         updated_count = 0
         
-        for cat_data in categories_data:
+        for cat_data in CATEGORIES:
             category, created = Category.objects.get_or_create(
                 name=cat_data['name'],
                 defaults={
@@ -208,4 +49,6 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS(f'Total categories: {Category.objects.count()}')
         )
+        # The saves above rebuild the shared snapshot in a daemon thread: don't exit mid-write
+        shared_snapshot.wait()
 
@@ -0,0 +1,23 @@
+"""
+Management command to recompute the organizer dashboard counters (EventStats)
+Run: python manage.py rebuild_event_stats [--event ID ...]
+
+Counters are maintained incrementally; run this after bulk imports or
+manual SQL that bypassed the model signals.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp.event_stats import rebuild_event_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute event stats (conversation, message and review counters) from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', dest='event_ids', help='Only rebuild this event (repeatable)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_event_stats(options['event_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} events'))
@@ -0,0 +1,25 @@
+"""
+Management command to fix drift in the unread badge counters
+Run: python manage.py reconcile_inbox_counters [--user ID ...]
+
+Recomputes each conversation's unread counts and each user's InboxCounter
+from the read watermarks and reports how many were wrong.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp.inbox import rebuild_inbox_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute unread counters (per conversation and per user) from the read watermarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only reconcile this user (repeatable)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users, conversations_fixed, counters_fixed = rebuild_inbox_counters(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled {users} users: fixed {conversations_fixed} conversation counts and {counters_fixed} inbox counters'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_review'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped to revoke previously issued JWTs'),
+        ),
+    ]
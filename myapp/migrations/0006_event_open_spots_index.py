@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('confirmed_attendees__lt', models.F('max_attendees')), ('is_active', True)), fields=['city', 'start_date'], name='events_city_open_start_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:50
+
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_starts_at_ends_at(apps, schema_editor):
+    """Same values Event.save() maintains: date + time in TIME_ZONE"""
+    Event = apps.get_model('myapp', 'Event')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for event in Event.objects.using(db_alias).only(
+        'id', 'start_date', 'start_time', 'end_date', 'end_time'
+    ).iterator(chunk_size=2000):
+        event.starts_at = timezone.make_aware(datetime.datetime.combine(event.start_date, event.start_time))
+        event.ends_at = timezone.make_aware(datetime.datetime.combine(event.end_date, event.end_time))
+        batch.append(event)
+        if len(batch) >= 2000:
+            Event.objects.using(db_alias).bulk_update(batch, ['starts_at', 'ends_at'])
+            batch = []
+    if batch:
+        Event.objects.using(db_alias).bulk_update(batch, ['starts_at', 'ends_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_event_open_spots_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, help_text='end_date + end_time (maintained on save)', null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, help_text='start_date + start_time (maintained on save)', null=True),
+        ),
+        migrations.RunPython(backfill_starts_at_ends_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['starts_at', 'ends_at'], name='events_active_starts_at_idx'),
+        ),
+    ]
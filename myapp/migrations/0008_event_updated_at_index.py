@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_event_starts_at_ends_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['updated_at'], name='events_updated_1a904d_idx'),
+        ),
+    ]
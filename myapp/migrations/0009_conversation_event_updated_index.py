@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_event_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['event', '-updated_at'], name='myapp_conve_event_i_90e200_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_event_stats(apps, schema_editor):
+    """Compute the counters Event stats are incrementally maintained from"""
+    Event = apps.get_model('myapp', 'Event')
+    EventStats = apps.get_model('myapp', 'EventStats')
+    Conversation = apps.get_model('myapp', 'Conversation')
+    Message = apps.get_model('myapp', 'Message')
+    Review = apps.get_model('myapp', 'Review')
+    db_alias = schema_editor.connection.alias
+
+    stats = {event_id: {} for event_id in Event.objects.using(db_alias).values_list('id', flat=True)}
+    for row in Conversation.objects.using(db_alias).order_by().values('event_id').annotate(
+        pending_count=Count('id', filter=Q(status='pending')),
+        confirmed_count=Count('id', filter=Q(status='confirmed')),
+        rejected_count=Count('id', filter=Q(status='rejected')),
+    ):
+        stats[row.pop('event_id')].update(row)
+    for row in Message.objects.using(db_alias).order_by().values('conversation__event_id').annotate(count=Count('id')):
+        stats[row['conversation__event_id']]['message_count'] = row['count']
+    for row in Review.objects.using(db_alias).order_by().values('event_id').annotate(count=Count('id'), total=Sum('rating')):
+        stats[row['event_id']].update(review_count=row['count'], rating_sum=row['total'] or 0)
+
+    EventStats.objects.using(db_alias).bulk_create(
+        [EventStats(event_id=event_id, **values) for event_id, values in stats.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_conversation_event_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventStats',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='myapp.event')),
+                ('pending_count', models.IntegerField(default=0, help_text='Conversations with status pending')),
+                ('confirmed_count', models.IntegerField(default=0, help_text='Conversations with status confirmed')),
+                ('rejected_count', models.IntegerField(default=0, help_text='Conversations with status rejected')),
+                ('message_count', models.IntegerField(default=0, help_text="Messages in the event's conversations")),
+                ('review_count', models.IntegerField(default=0, help_text='Reviews of the event')),
+                ('rating_sum', models.IntegerField(default=0, help_text='Sum of review ratings')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Event stats',
+                'verbose_name_plural': 'Event stats',
+                'db_table': 'event_stats',
+            },
+        ),
+        migrations.RunPython(backfill_event_stats, migrations.RunPython.noop),
+    ]
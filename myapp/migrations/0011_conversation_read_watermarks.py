@@ -0,0 +1,95 @@
+# Generated by Django 5.0.14 on 2026-10-19 06:00
+
+from django.db import migrations, models
+from django.db.models import Max, Min, Q
+
+
+def flags_to_watermarks(apps, schema_editor):
+    """
+    Each participant's watermark becomes the id just below the first unread
+    message from the other participant (or the latest message if none are unread)
+    """
+    Conversation = apps.get_model('myapp', 'Conversation')
+    Message = apps.get_model('myapp', 'Message')
+    db_alias = schema_editor.connection.alias
+    messages = Message.objects.using(db_alias).order_by()
+
+    latest = dict(messages.values('conversation_id').annotate(latest=Max('id')).values_list('conversation_id', 'latest'))
+    by_sender = {
+        (row['conversation_id'], row['sender_id']): row
+        for row in messages.values('conversation_id', 'sender_id').annotate(
+            first_unread=Min('id', filter=Q(is_read=False)),
+            last_read_at=Max('read_at'),
+        )
+    }
+
+    conversations = list(Conversation.objects.using(db_alias).filter(id__in=latest))
+    for conversation in conversations:
+        for reader, other in (('user', conversation.host_id), ('host', conversation.user_id)):
+            row = by_sender.get((conversation.id, other))
+            first_unread = row['first_unread'] if row else None
+            setattr(conversation, f'{reader}_last_read_id', first_unread - 1 if first_unread else latest[conversation.id])
+            setattr(conversation, f'{reader}_read_at', row['last_read_at'] if row else None)
+    Conversation.objects.using(db_alias).bulk_update(
+        conversations,
+        ['user_last_read_id', 'user_read_at', 'host_last_read_id', 'host_read_at'],
+        batch_size=1000,
+    )
+
+
+def watermarks_to_flags(apps, schema_editor):
+    Conversation = apps.get_model('myapp', 'Conversation')
+    Message = apps.get_model('myapp', 'Message')
+    db_alias = schema_editor.connection.alias
+
+    for conversation in Conversation.objects.using(db_alias).iterator():
+        messages = Message.objects.using(db_alias).filter(conversation_id=conversation.id)
+        messages.filter(sender_id=conversation.host_id, id__lte=conversation.user_last_read_id).update(
+            is_read=True, read_at=conversation.user_read_at
+        )
+        messages.filter(sender_id=conversation.user_id, id__lte=conversation.host_last_read_id).update(
+            is_read=True, read_at=conversation.host_read_at
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_event_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='user_last_read_id',
+            field=models.BigIntegerField(default=0, help_text='Highest message id the attendee has read'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_read_at',
+            field=models.DateTimeField(blank=True, help_text='When the attendee last marked the thread read', null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='host_last_read_id',
+            field=models.BigIntegerField(default=0, help_text='Highest message id the host has read'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='host_read_at',
+            field=models.DateTimeField(blank=True, help_text='When the host last marked the thread read', null=True),
+        ),
+        migrations.RunPython(flags_to_watermarks, watermarks_to_flags),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='myapp_messa_is_read_b90a34_idx',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='read_at',
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def backfill_inbox_counters(apps, schema_editor):
+    """Unread counts past each participant's read watermark, per conversation and per user"""
+    User = apps.get_model('myapp', 'User')
+    Conversation = apps.get_model('myapp', 'Conversation')
+    Message = apps.get_model('myapp', 'Message')
+    InboxCounter = apps.get_model('myapp', 'InboxCounter')
+    db_alias = schema_editor.connection.alias
+
+    totals = {user_id: [0, 0] for user_id in User.objects.using(db_alias).values_list('id', flat=True)}
+    changed = {}
+    for field, reader, other in (('user_unread_count', 'user', 'host'), ('host_unread_count', 'host', 'user')):
+        rows = Message.objects.using(db_alias).filter(
+            sender_id=F(f'conversation__{other}_id'),
+            id__gt=F(f'conversation__{reader}_last_read_id'),
+        ).exclude(sender_id=F(f'conversation__{reader}_id')).order_by().values(
+            'conversation_id', f'conversation__{reader}_id'
+        ).annotate(count=Count('id'))
+        for row in rows:
+            # Unsaved instances only carry the counts for bulk_update (both default to 0)
+            conversation = changed.setdefault(row['conversation_id'], Conversation(id=row['conversation_id']))
+            setattr(conversation, field, row['count'])
+            totals[row[f'conversation__{reader}_id']][0] += row['count']
+            totals[row[f'conversation__{reader}_id']][1] += 1
+
+    Conversation.objects.using(db_alias).bulk_update(
+        list(changed.values()), ['user_unread_count', 'host_unread_count'], batch_size=1000
+    )
+    InboxCounter.objects.using(db_alias).bulk_create(
+        [InboxCounter(user_id=user_id, unread_messages=messages, unread_threads=threads)
+         for user_id, (messages, threads) in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_conversation_read_watermarks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inbox_counter', serialize=False, to='myapp.user')),
+                ('unread_messages', models.IntegerField(default=0, help_text='Unread messages across all conversations')),
+                ('unread_threads', models.IntegerField(default=0, help_text='Conversations with at least one unread message')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'inbox_counters',
+            },
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='host_unread_count',
+            field=models.IntegerField(default=0, help_text="Messages from the attendee the host hasn't read"),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_unread_count',
+            field=models.IntegerField(default=0, help_text="Messages from the host the attendee hasn't read"),
+        ),
+        migrations.RunPython(backfill_inbox_counters, migrations.RunPython.noop),
+    ]
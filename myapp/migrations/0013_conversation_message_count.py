@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:08
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def backfill_message_counts(apps, schema_editor):
+    Conversation = apps.get_model('myapp', 'Conversation')
+    Message = apps.get_model('myapp', 'Message')
+    db_alias = schema_editor.connection.alias
+
+    conversations = [
+        Conversation(id=row['conversation_id'], message_count=row['count'], last_message_at=row['latest'])
+        for row in Message.objects.using(db_alias).order_by().values('conversation_id').annotate(
+            count=Count('id'), latest=Max('created_at')
+        )
+    ]
+    Conversation.objects.using(db_alias).bulk_update(conversations, ['message_count', 'last_message_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_inbox_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, help_text='When the latest message was sent', null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='message_count',
+            field=models.IntegerField(default=0, help_text='Messages in the conversation'),
+        ),
+        migrations.RunPython(backfill_message_counts, migrations.RunPython.noop),
+    ]
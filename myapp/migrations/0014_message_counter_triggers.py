@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 06:10
+
+from django.db import migrations
+
+# This migration used to install database triggers that counted new messages
+# and conversations. That counting is done by inbox.send_message() (and the
+# receivers in signals.py) again; 0015 drops the triggers from databases that
+# applied the earlier version of this migration.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_conversation_message_count'),
+    ]
+
+    operations = []
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-19 07:30
+
+from django.db import migrations
+
+# Left behind by the first version of 0014 on SQLite and PostgreSQL; they would
+# count every new message twice now that inbox.send_message() counts it
+DROP_STATEMENTS = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS message_counters',
+        'DROP TRIGGER IF EXISTS conversation_status_counters',
+    ],
+    'postgresql': [
+        'DROP TRIGGER IF EXISTS message_counters ON myapp_message',
+        'DROP FUNCTION IF EXISTS message_counters()',
+        'DROP TRIGGER IF EXISTS conversation_status_counters ON myapp_conversation',
+        'DROP FUNCTION IF EXISTS conversation_status_counters()',
+    ],
+}
+
+
+def drop_triggers(apps, schema_editor):
+    # No other backend ever had them
+    for statement in DROP_STATEMENTS.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_message_counter_triggers'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_drop_message_counter_triggers'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='conversation',
+            name='myapp_conve_event_i_90e200_idx',
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['event', '-created_at'], name='myapp_conve_event_i_c6c90b_idx'),
+        ),
+    ]
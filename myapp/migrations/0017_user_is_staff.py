@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_conversation_event_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='is_staff',
+            field=models.BooleanField(default=False, help_text='Can read operational endpoints such as /api/metrics/'),
+        ),
+    ]
@@ -1,8 +1,14 @@
-from django.db import models
+import datetime
+
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, Q, Value
+from django.db.models.functions import Greatest
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.contrib.auth.models import User as DjangoUser
 
+from .querycache import CachingQuerySet
+
 # Create your models here.
 
 class Category(models.Model):
@@ -14,6 +20,9 @@ class Category(models.Model):
     icon = models.CharField(max_length=50, blank=True, help_text="Icon name or emoji")
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Rarely written: reads can opt into the query cache with .cached()
+    objects = CachingQuerySet.as_manager()
+    
     def __str__(self):
         return self.name
     
@@ -29,6 +38,10 @@ class User(models.Model):
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    token_version = models.PositiveIntegerField(default=0, help_text="Bumped to revoke previously issued JWTs")
+    is_staff = models.BooleanField(default=False, help_text="Can read operational endpoints such as /api/metrics/")
+
+    objects = CachingQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -55,6 +68,103 @@ class User(models.Model):
         ordering = ['-created_at']
 
 
+SCHEDULE_FIELDS = {'start_date', 'start_time', 'end_date', 'end_time'}
+
+# Denormalized datetime -> the (date, time) fields it combines
+DERIVED_DATETIMES = {'starts_at': ('start_date', 'start_time'), 'ends_at': ('end_date', 'end_time')}
+
+
+def combine_local(day, time_of_day):
+    """Aware datetime for a date and wall-clock time in TIME_ZONE (None if either is missing)"""
+    if day is None or time_of_day is None:
+        return None
+    if isinstance(day, str):
+        day = datetime.date.fromisoformat(day)
+    if isinstance(time_of_day, str):
+        time_of_day = datetime.time.fromisoformat(time_of_day)
+    return timezone.make_aware(datetime.datetime.combine(day, time_of_day))
+
+
+def start_of_day(day):
+    """Aware datetime for midnight at the start of `day` in TIME_ZONE"""
+    return combine_local(day, datetime.time.min)
+
+
+def set_derived_datetimes(event):
+    """Fill starts_at and ends_at from the event's dates and times"""
+    for field, (day, time_of_day) in DERIVED_DATETIMES.items():
+        setattr(event, field, combine_local(getattr(event, day), getattr(event, time_of_day)))
+
+
+def with_derived_fields(fields):
+    """fields plus starts_at and ends_at if any schedule field is among them"""
+    fields = list(fields)
+    if SCHEDULE_FIELDS & set(fields):
+        fields += [field for field in DERIVED_DATETIMES if field not in fields]
+    return fields
+
+
+class EventQuerySet(CachingQuerySet):
+    """
+    Keeps starts_at and ends_at in step with the schedule fields on the bulk
+    paths that bypass Event.save(): bulk_create(), bulk_update() and update()
+    """
+
+    def bulk_create(self, objs, *args, update_fields=None, **kwargs):
+        objs = list(objs)
+        for event in objs:
+            set_derived_datetimes(event)
+        if update_fields:
+            update_fields = with_derived_fields(update_fields)
+        return super().bulk_create(objs, *args, update_fields=update_fields, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if SCHEDULE_FIELDS & set(fields):
+            for event in objs:
+                set_derived_datetimes(event)
+        return super().bulk_update(objs, with_derived_fields(fields), *args, **kwargs)
+
+    def update(self, **kwargs):
+        recompute = []
+        for field, pair in DERIVED_DATETIMES.items():
+            if not set(pair) & set(kwargs):
+                continue
+            if all(name in kwargs and not hasattr(kwargs[name], 'resolve_expression') for name in pair):
+                # Both halves are plain values: set the datetime in the same UPDATE
+                kwargs[field] = combine_local(*(kwargs[name] for name in pair))
+            else:
+                recompute.append(field)
+        if not recompute:
+            return super().update(**kwargs)
+
+        # The other half (or an expression's result) is per row: read them back after updating
+        with transaction.atomic(using=self.db):
+            ids = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            events = list(
+                self.model._base_manager.using(self.db).filter(pk__in=ids).only('pk', *SCHEDULE_FIELDS)
+            )
+            for event in events:
+                set_derived_datetimes(event)
+            self.model._base_manager.using(self.db).bulk_update(events, recompute, batch_size=500)
+        return rows
+
+    def with_computed_fields(self, today=None):
+        """
+        Annotate available_spots, is_full, is_upcoming and is_past so they can be
+        filtered and ordered in SQL; the annotations also fill the matching Event
+        properties, so serializing a page doesn't call timezone.now() per row
+        """
+        today = today or timezone.now().date()
+        return self.annotate(
+            available_spots=Greatest(F('max_attendees') - F('confirmed_attendees'), Value(0)),
+            is_full=ExpressionWrapper(Q(confirmed_attendees__gte=F('max_attendees')), output_field=models.BooleanField()),
+            is_upcoming=ExpressionWrapper(Q(start_date__gte=today), output_field=models.BooleanField()),
+            is_past=ExpressionWrapper(Q(end_date__lt=today), output_field=models.BooleanField()),
+        )
+
+
 class Event(models.Model):
     """
     Event model to store event information
@@ -98,6 +208,9 @@ class Event(models.Model):
     )
     confirmed_attendees = models.PositiveIntegerField(default=0, help_text="Number of confirmed attendees")
     is_active = models.BooleanField(default=True, help_text="Whether the event is active")
+    # Denormalized from the date/time fields in save() and EventQuerySet's bulk paths, so feeds can range-scan one column
+    starts_at = models.DateTimeField(null=True, editable=False, help_text="start_date + start_time (maintained on save)")
+    ends_at = models.DateTimeField(null=True, editable=False, help_text="end_date + end_time (maintained on save)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -107,32 +220,77 @@ class Event(models.Model):
         """Return formatted full address"""
         return f"{self.street}, {self.city}, {self.state} {self.postal_code}"
     
+    # The setters receive EventQuerySet.with_computed_fields() annotations
+    def _capacity(self):
+        # Read from __dict__ so a deferred field isn't loaded just to stash an annotation
+        return self.__dict__.get('max_attendees'), self.__dict__.get('confirmed_attendees')
+    
     @property
     def available_spots(self):
         """Calculate available spots"""
+        # The annotation holds while the fields it was computed from are unchanged in memory
+        value, capacity = self.__dict__.get('available_spots', (None, None))
+        if capacity is not None and capacity == self._capacity():
+            return value
         return max(0, self.max_attendees - self.confirmed_attendees)
     
+    @available_spots.setter
+    def available_spots(self, value):
+        self.__dict__['available_spots'] = (value, self._capacity())
+    
     @property
     def is_full(self):
         """Check if event is full"""
+        value, capacity = self.__dict__.get('is_full', (None, None))
+        if capacity is not None and capacity == self._capacity():
+            return value
         return self.available_spots <= 0
     
+    @is_full.setter
+    def is_full(self, value):
+        self.__dict__['is_full'] = (value, self._capacity())
+    
     @property
     def is_upcoming(self):
         """Check if event is upcoming"""
+        if 'is_upcoming' in self.__dict__:
+            return self.__dict__['is_upcoming']
         now = timezone.now().date()
         return self.start_date >= now
     
+    @is_upcoming.setter
+    def is_upcoming(self, value):
+        self.__dict__['is_upcoming'] = value
+    
     @property
     def is_past(self):
         """Check if event is past"""
+        if 'is_past' in self.__dict__:
+            return self.__dict__['is_past']
         now = timezone.now().date()
         return self.end_date < now
     
+    @is_past.setter
+    def is_past(self, value):
+        self.__dict__['is_past'] = value
+    
+    
+    def save(self, *args, **kwargs):
+        # Annotated is_upcoming/is_past may not match edited dates; recompute them after saving
+        self.__dict__.pop('is_upcoming', None)
+        self.__dict__.pop('is_past', None)
+        
+        set_derived_datetimes(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = with_derived_fields(update_fields)
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.title} - {self.start_date}"
     
+    objects = EventQuerySet.as_manager()
+    
     class Meta:
         db_table = 'events'
         verbose_name = 'Event'
@@ -143,6 +301,19 @@ class Event(models.Model):
             models.Index(fields=['city', 'state']),
             models.Index(fields=['organizer_id']),  # Fixed: organizer → organizer_id
             models.Index(fields=['is_active']),
+            models.Index(fields=['updated_at']),  # Calendar index delta sync
+            # Chronological feeds: upcoming, past and happening_now range-scan starts_at
+            models.Index(
+                fields=['starts_at', 'ends_at'],
+                name='events_active_starts_at_idx',
+                condition=Q(is_active=True),
+            ),
+            # "Upcoming events with free spots in a city" (?city=&status=upcoming&has_spots=true)
+            models.Index(
+                fields=['city', 'start_date'],
+                name='events_city_open_start_idx',
+                condition=Q(is_active=True, confirmed_attendees__lt=F('max_attendees')),
+            ),
         ]
 
 
@@ -199,33 +370,77 @@ class Conversation(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     confirmed_at = models.DateTimeField(null=True, blank=True)
     rejected_at = models.DateTimeField(null=True, blank=True)
+    # Read watermarks: each participant has read every message with id <= their value
+    user_last_read_id = models.BigIntegerField(default=0, help_text="Highest message id the attendee has read")
+    user_read_at = models.DateTimeField(null=True, blank=True, help_text="When the attendee last marked the thread read")
+    host_last_read_id = models.BigIntegerField(default=0, help_text="Highest message id the host has read")
+    host_read_at = models.DateTimeField(null=True, blank=True, help_text="When the host last marked the thread read")
+    # Maintained on every new message (see inbox.py) instead of counting messages
+    message_count = models.IntegerField(default=0, help_text="Messages in the conversation")
+    last_message_at = models.DateTimeField(null=True, blank=True, help_text="When the latest message was sent")
+    # Messages past each watermark, kept with the per-user InboxCounter (see inbox.py)
+    user_unread_count = models.IntegerField(default=0, help_text="Messages from the host the attendee hasn't read")
+    host_unread_count = models.IntegerField(default=0, help_text="Messages from the attendee the host hasn't read")
 
     class Meta:
         unique_together = ('event', 'user', 'host')  # Prevent duplicate conversations
+        indexes = [
+            models.Index(fields=['event', '-created_at']),  # Host attendee list, newest request first
+        ]
 
     def __str__(self):
         return f"Conversation for {self.event.title} with {self.user.name}"
 
+    def read_fields(self, user_id):
+        """(watermark field, read at field) of participant user_id"""
+        if user_id == self.user_id:
+            return 'user_last_read_id', 'user_read_at'
+        return 'host_last_read_id', 'host_read_at'
+
+    def unread_count_field(self, user_id):
+        return 'user_unread_count' if user_id == self.user_id else 'host_unread_count'
+
+    def last_read_id(self, user_id):
+        return getattr(self, self.read_fields(user_id)[0])
+
+    def read_at(self, user_id):
+        return getattr(self, self.read_fields(user_id)[1])
+
 
 class Message(models.Model):
     """
-    Stores actual text messages with read tracking
+    Stores actual text messages
+
+    Read state lives on the conversation (per-participant watermarks), so
+    is_read/read_at are derived from it rather than stored per message.
     """
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     text = models.TextField()
-    is_read = models.BooleanField(default=False, help_text="Whether the message has been read by recipient")
-    read_at = models.DateTimeField(null=True, blank=True, help_text="When the message was read")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.sender.name}: {self.text[:20]}"
+
+    @property
+    def recipient_id(self):
+        conversation = self.conversation
+        return conversation.host_id if self.sender_id == conversation.user_id else conversation.user_id
+
+    @property
+    def is_read(self):
+        """Whether the recipient's read watermark has passed this message"""
+        return self.id <= self.conversation.last_read_id(self.recipient_id)
+
+    @property
+    def read_at(self):
+        """When the recipient last marked the thread read, if that covered this message"""
+        return self.conversation.read_at(self.recipient_id) if self.is_read else None
     
     class Meta:
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['conversation', '-created_at']),
-            models.Index(fields=['is_read']),
         ]
 
 
@@ -280,5 +495,48 @@ class Review(models.Model):
         ]
 
 
+class EventStats(models.Model):
+    """
+    Per-event counters behind the organizer dashboard
+    Updated incrementally on conversation, message and review writes (see event_stats.py);
+    rebuild from scratch with: python manage.py rebuild_event_stats
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # Plain integers: deltas are applied with F() expressions
+    pending_count = models.IntegerField(default=0, help_text="Conversations with status pending")
+    confirmed_count = models.IntegerField(default=0, help_text="Conversations with status confirmed")
+    rejected_count = models.IntegerField(default=0, help_text="Conversations with status rejected")
+    message_count = models.IntegerField(default=0, help_text="Messages in the event's conversations")
+    review_count = models.IntegerField(default=0, help_text="Reviews of the event")
+    rating_sum = models.IntegerField(default=0, help_text="Sum of review ratings")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.review_count, 2) if self.review_count else 0
+    
+    def __str__(self):
+        return f"Stats for event {self.event_id}"
+    
+    class Meta:
+        db_table = 'event_stats'
+        verbose_name = 'Event stats'
+        verbose_name_plural = 'Event stats'
 
 
+class InboxCounter(models.Model):
+    """
+    Per-user unread totals behind the unread badge (GET /api/conversations/unread-count/)
+    Updated incrementally on new messages and mark-read (see inbox.py);
+    fix drift with: python manage.py reconcile_inbox_counters
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='inbox_counter')
+    unread_messages = models.IntegerField(default=0, help_text="Unread messages across all conversations")
+    unread_threads = models.IntegerField(default=0, help_text="Conversations with at least one unread message")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Inbox counter for user {self.user_id}"
+
+    class Meta:
+        db_table = 'inbox_counters'
@@ -0,0 +1,110 @@
+"""
+Keyset (cursor) pagination for the function-based listing views
+
+Instead of OFFSET, each page continues after the last row of the previous
+one: the cursor is an opaque token holding that row's ordering values, and
+the next page is fetched with a WHERE on them. Pages cost the same however
+deep the client scrolls and stay stable while new rows are inserted. The
+ordering must end in a unique field (id) so rows are never skipped or
+repeated.
+"""
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised for malformed cursor or limit query parameters"""
+
+
+def _json_default(value):
+    # Full precision: DjangoJSONEncoder cuts datetimes to milliseconds, which would skip rows
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    """Turn a cursor back into Python values for the ordering fields"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        return [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, values)
+        ]
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after(ordering, values):
+    """
+    Q for rows strictly after `values` in `ordering`, e.g. for ('-created_at', '-id'):
+    created_at < v0 OR (created_at = v0 AND id < v1)
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def get_limit(request, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    limit = request.query_params.get('limit')
+    if limit is None:
+        return default
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidCursor('limit must be a number')
+    if limit < 1:
+        raise InvalidCursor('limit must be at least 1')
+    return min(limit, maximum)
+
+
+def paginate_keyset(request, queryset, ordering):
+    """
+    Return (rows, pagination) for the page selected by ?cursor= and ?limit=
+
+    `ordering` is a tuple of field names (prefixed with - for descending)
+    ending in a unique field. Raises InvalidCursor for bad parameters.
+    """
+    limit = get_limit(request)
+    queryset = queryset.order_by(*ordering)
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(_after(ordering, values))
+
+    # One extra row tells whether there is a next page without a COUNT
+    rows = list(queryset[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+
+    return rows, {
+        'limit': limit,
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,100 @@
+"""
+Password hashing helpers used by the user and login views
+
+- Hashing and verification can run in a process pool
+  (PASSWORD_HASHING['PROCESSES'] > 0) so a slow hash doesn't hold the
+  GIL while the worker's other threads serve requests
+- Hashes made with an outdated algorithm or parameters are upgraded after
+  a successful login on a background thread, off the request path
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.db import connection
+
+from .models import User
+
+_process_pool = None
+_rehash_executor = None
+_rehash_pending = set()
+_lock = threading.Lock()
+
+
+def _get_process_pool():
+    """Lazily start the hashing process pool (after gunicorn has forked the worker)"""
+    global _process_pool
+    processes = settings.PASSWORD_HASHING['PROCESSES']
+    if not processes:
+        return None
+    with _lock:
+        if _process_pool is None:
+            # Spawn, not fork: the pool starts on a request thread while other threads hold locks
+            _process_pool = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """Stop the hashing processes, e.g. before a multiprocessing child exits and joins them"""
+    global _process_pool
+    with _lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _get_rehash_executor():
+    global _rehash_executor
+    with _lock:
+        if _rehash_executor is None:
+            _rehash_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='password-rehash')
+        return _rehash_executor
+
+
+def hash_password(raw_password):
+    """Hash a password with the preferred hasher"""
+    pool = _get_process_pool()
+    if pool is None:
+        return make_password(raw_password)
+    return pool.submit(make_password, raw_password).result()
+
+
+def check_user_password(user, raw_password):
+    """
+    Check a user's password, scheduling a background rehash if the stored hash is outdated
+    """
+    pool = _get_process_pool()
+    if pool is None:
+        is_correct, must_update = verify_password(raw_password, user.password)
+    else:
+        is_correct, must_update = pool.submit(verify_password, raw_password, user.password).result()
+
+    if is_correct and must_update:
+        schedule_rehash(user.id, raw_password, user.password)
+    return is_correct
+
+
+def schedule_rehash(user_id, raw_password, old_encoded):
+    """Queue a rehash for the user unless one is already pending"""
+    with _lock:
+        if user_id in _rehash_pending:
+            return
+        _rehash_pending.add(user_id)
+    _get_rehash_executor().submit(_rehash, user_id, raw_password, old_encoded)
+
+
+def _rehash(user_id, raw_password, old_encoded):
+    try:
+        # Only replace the hash we verified, never a password changed in the meantime
+        User.objects.filter(id=user_id, password=old_encoded).update(password=hash_password(raw_password))
+    finally:
+        with _lock:
+            _rehash_pending.discard(user_id)
+        connection.close()
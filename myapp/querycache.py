@@ -0,0 +1,189 @@
+"""
+Opt-in result cache for read queries on rarely changing tables
+
+Models whose manager is built on CachingQuerySet (Category, User, Event)
+can mark a read with .cached(), e.g. User.objects.cached().get(id=...).
+The rows are stored in the 'querycache' cache under a key made of the
+SQL, its parameters and the current version of every table the SQL
+mentions.
+
+- The cache is only enabled with Redis (QUERY_CACHE['ENABLED'] is False
+  without REDIS_URL): versions must be shared by every worker, or a
+  write in one worker leaves the others serving rows read before it,
+  including revoked tokens and deleted users in authentication.
+- Each tracked table has a version counter, bumped after commit by
+  post_save/post_delete (signals.py) and by CachingQuerySet's own bulk
+  writes (update(), bulk_create(), bulk_update()), so a write makes every
+  cached read of its table unreachable.
+- Versions are read before the query runs, so a result is never stored
+  under a version newer than the data it was read from.
+- Queries are not cached inside transaction.atomic() (they may see
+  uncommitted writes), nor when they touch an untracked table (including
+  in subqueries) or use prefetch_related() / select_for_update().
+- A version key lost to eviction is recreated from the clock, never reset
+  to a value an older entry could still be stored under.
+"""
+import functools
+import hashlib
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+
+from backend_api import metrics
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'bumps': 0}
+
+
+def _cache():
+    return caches['querycache']
+
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def stats():
+    with _lock:
+        return dict(_stats)
+
+
+metrics.register('query_cache', stats)
+
+
+def _version_key(table):
+    return f'table:{table}'
+
+
+@functools.cache
+def _tables():
+    """(db_table of every model, db_table of the models whose default manager is a CachingQuerySet)"""
+    models_ = apps.get_models()
+    return (
+        frozenset(model._meta.db_table for model in models_),
+        frozenset(model._meta.db_table for model in models_ if isinstance(model._default_manager.all(), CachingQuerySet)),
+    )
+
+
+def table_versions(tables):
+    """{table: version}, creating missing versions"""
+    keys = {_version_key(table): table for table in tables}
+    found = _cache().get_many(list(keys))
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, table in keys.items():
+        if table not in versions:
+            # Nanoseconds since the epoch: always above any version used before the key was lost
+            _cache().add(key, time.time_ns(), timeout=None)
+            versions[table] = _cache().get(key)
+    return versions
+
+
+def bump_table_versions(tables):
+    """Invalidate every cached read of these tables"""
+    for table in tables:
+        try:
+            _cache().incr(_version_key(table))
+        except ValueError:
+            _cache().add(_version_key(table), time.time_ns(), timeout=None)
+        _count('bumps')
+
+
+def bump_after_commit(model, using=None, deleted=False):
+    """
+    Bump model's table version once the current transaction commits; for deletes also
+    the tracked tables pointing at it, whose SET_NULL updates send no signals
+    """
+    tables = {model._meta.db_table}
+    if deleted:
+        tables.update(
+            relation.related_model._meta.db_table for relation in model._meta.related_objects
+            if relation.related_model._meta.db_table in _tables()[1]
+        )
+    transaction.on_commit(lambda: bump_table_versions(sorted(tables)), using=using)
+
+
+class CachingQuerySet(models.QuerySet):
+    """QuerySet with an opt-in result cache, see the module docstring"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+        self._use_cache = False
+
+    def cached(self, timeout=None):
+        """Serve this query from the query cache (timeout in seconds, default QUERY_CACHE['TIMEOUT'])"""
+        clone = self._chain()
+        clone._use_cache = True
+        clone._cache_timeout = timeout
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._use_cache = self._use_cache
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def _cache_key(self):
+        """Key for this query's rows, or None if it can't be cached"""
+        if (
+            not settings.QUERY_CACHE['ENABLED']
+            or self._prefetch_related_lookups
+            or self.query.select_for_update
+            or connections[self.db].in_atomic_block
+        ):
+            return None
+        try:
+            sql, params = self.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+
+        quote = connections[self.db].ops.quote_name
+        tables, tracked = _tables()
+        used = {table for table in tables if quote(table) in sql}
+        if not used or not used <= tracked:
+            return None
+
+        versions = table_versions(sorted(used))
+        raw = repr((
+            self.db, self._iterable_class.__name__, self._fields, sql, params, sorted(versions.items())
+        ))
+        return f'rows:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._use_cache:
+            key = self._cache_key()
+            if key is None:
+                _count('bypassed')
+            else:
+                rows = _cache().get(key)
+                if rows is not None:
+                    _count('hits')
+                    self._result_cache = rows
+                    return
+                _count('misses')
+                super()._fetch_all()
+                timeout = settings.QUERY_CACHE['TIMEOUT'] if self._cache_timeout is None else self._cache_timeout
+                _cache().set(key, self._result_cache, timeout)
+                return
+        super()._fetch_all()
+
+    # Bulk writes send no post_save/post_delete, so they bump the version themselves
+    # (bulk_update() goes through update())
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        bump_after_commit(self.model, using=self.db)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, *args, **kwargs):
+        objs = super().bulk_create(*args, **kwargs)
+        bump_after_commit(self.model, using=self.db)
+        return objs
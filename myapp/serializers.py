@@ -355,6 +355,9 @@ class EventListSerializer(serializers.ModelSerializer):
     is_past = serializers.BooleanField(read_only=True)
     host_average_rating = serializers.SerializerMethodField()
     host_total_reviews = serializers.SerializerMethodField()
+    # Only with context['include_my_status'], from EventViewSet's subquery annotations
+    my_request_status = serializers.CharField(read_only=True, allow_null=True, default=None)
+    my_review_id = serializers.IntegerField(read_only=True, allow_null=True, default=None)
     
     class Meta:
         model = Event
@@ -366,9 +369,16 @@ class EventListSerializer(serializers.ModelSerializer):
             'host_average_rating', 'host_total_reviews',
             'is_active', 'created_at', 
             'primary_image', 'all_images', 'image_count', 
-            'full_address', 'is_upcoming', 'is_past'
+            'full_address', 'is_upcoming', 'is_past',
+            'my_request_status', 'my_review_id'
         ]
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('include_my_status'):
+            self.fields.pop('my_request_status')
+            self.fields.pop('my_review_id')
+    
     def get_primary_image(self, obj):
         """Get primary image URL"""
         primary_image = obj.images.filter(is_primary=True).first()
@@ -403,6 +413,9 @@ class EventListSerializer(serializers.ModelSerializer):
     
     def get_host_average_rating(self, obj):
         """Get average rating for the event host across all their events"""
+        if 'host_stats' in self.context:
+            # {host id: (average, count)} computed once for the page (fragments.host_stats)
+            return self.context['host_stats'].get(obj.organizer_id_id, (0, 0))[0]
         host_reviews = Review.objects.filter(host_id=obj.organizer_id.id)
         if host_reviews.exists():
             avg_rating = host_reviews.aggregate(Avg('rating'))['rating__avg']
@@ -411,6 +424,8 @@ class EventListSerializer(serializers.ModelSerializer):
     
     def get_host_total_reviews(self, obj):
         """Get total number of reviews for the event host"""
+        if 'host_stats' in self.context:
+            return self.context['host_stats'].get(obj.organizer_id_id, (0, 0))[1]
         return Review.objects.filter(host_id=obj.organizer_id.id).count()
 
 
@@ -463,13 +478,26 @@ class ConversationCreateSerializer(serializers.ModelSerializer):
 class MessageSerializer(serializers.ModelSerializer):
     """
     Serializer for Message model with full sender details and read status
+
+    is_read/read_at come from the conversation's read watermarks, so pass
+    messages fetched through their conversation (conversation.messages...)
+    to avoid a query per message.
+
+    read_at is a thread-level value: when the recipient last marked the
+    whole conversation read, the same for every message it covered, not
+    when this message was read. Per-message read times are not recorded.
     """
     sender = serializers.SerializerMethodField()
+    is_read = serializers.BooleanField(read_only=True)
+    read_at = serializers.DateTimeField(
+        read_only=True,
+        help_text="When the recipient last marked the conversation read (thread-level, same for every read message)"
+    )
     
     class Meta:
         model = Message
         fields = ['id', 'conversation', 'sender', 'text', 'is_read', 'read_at', 'created_at']
-        read_only_fields = ['id', 'created_at', 'read_at']
+        read_only_fields = ['id', 'created_at']
     
     def get_sender(self, obj):
         """Get full sender details"""
@@ -513,7 +541,7 @@ class ConversationSerializer(serializers.ModelSerializer):
     
     def get_message_count(self, obj):
         """Get total number of messages in the conversation"""
-        return obj.messages.count()
+        return obj.message_count
 
 
 class ConversationStatusUpdateSerializer(serializers.ModelSerializer):
@@ -524,32 +552,51 @@ class ConversationStatusUpdateSerializer(serializers.ModelSerializer):
         model = Conversation
         fields = ['status']
     
+    # The columns a status change writes: message_count, last_message_at, the read watermarks and
+    # unread counts on the same row are kept by F() updates in inbox.py, and saving the values the
+    # view loaded would undo any message sent or read in the meantime
+    UPDATE_FIELDS = ['status', 'confirmed_at', 'rejected_at', 'updated_at']
+
     def update(self, instance, validated_data):
         """Update conversation status and handle event capacity"""
+        from django.db import transaction
+        from django.db.models import F
+        from django.db.models.functions import Greatest
         from django.utils import timezone
+        from .facets import bump_events_version
         
-        new_status = validated_data.get('status')
-        old_status = instance.status
+        new_status = validated_data.get('status', instance.status)
+        now = timezone.now()
         
-        # Update the conversation
-        instance = super().update(instance, validated_data)
-        
-        # Handle capacity changes
-        if new_status == 'confirmed' and old_status != 'confirmed':
-            # Increment confirmed attendees
-            instance.event.confirmed_attendees += 1
-            instance.event.save()
-            instance.confirmed_at = timezone.now()
-            instance.save()
+        with transaction.atomic():
+            # Status as of the lock, so two concurrent updates can't both move the capacity
+            old_status = Conversation.objects.select_for_update().filter(
+                id=instance.id
+            ).values_list('status', flat=True).get()
             
-        elif old_status == 'confirmed' and new_status != 'confirmed':
-            # Decrement confirmed attendees
-            instance.event.confirmed_attendees = max(0, instance.event.confirmed_attendees - 1)
-            instance.event.save()
+            instance.status = new_status
+            if new_status == 'confirmed' and old_status != 'confirmed':
+                instance.confirmed_at = now
+            if new_status == 'rejected':
+                instance.rejected_at = now
+            # Tells the dashboard counters (signals.py) which status the row is leaving
+            instance._stats_status = old_status
+            instance.save(update_fields=self.UPDATE_FIELDS)
             
-        if new_status == 'rejected':
-            instance.rejected_at = timezone.now()
-            instance.save()
+            # Handle capacity changes
+            delta = 0
+            if new_status == 'confirmed' and old_status != 'confirmed':
+                delta = 1
+            elif old_status == 'confirmed' and new_status != 'confirmed':
+                delta = -1
+            if delta:
+                Event.objects.filter(id=instance.event_id).update(
+                    confirmed_attendees=Greatest(F('confirmed_attendees') + delta, 0),
+                    updated_at=now
+                )
+                # update() skips the post_save receivers; has_spots facet counts depend on capacity
+                transaction.on_commit(bump_events_version)
+                instance.event.refresh_from_db(fields=['confirmed_attendees', 'updated_at'])
         
         return instance
 
@@ -598,7 +645,7 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         
         # Check if event exists
         try:
-            event = Event.objects.get(id=event_id)
+            event = Event.objects.cached().get(id=event_id)
         except Event.DoesNotExist:
             raise serializers.ValidationError({"event_id": "Event not found"})
         
@@ -608,7 +655,7 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         
         # Validate host exists
         try:
-            host = User.objects.get(id=attrs['host_id'])
+            host = User.objects.cached().get(id=attrs['host_id'])
         except User.DoesNotExist:
             raise serializers.ValidationError({"host_id": "Host not found"})
         
@@ -0,0 +1,178 @@
+"""
+Model signal receivers, connected in MyappConfig.ready()
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import forget_token_version
+from .calendar_index import calendar_index
+from .event_stats import adjust_event_stats, rebuild_event_stats, status_deltas
+from .facets import bump_events_version
+from .inbox import forget_message, record_message
+from .querycache import bump_after_commit
+from .snapshot import shared_snapshot
+from .models import Category, Conversation, Event, EventImage, EventStats, InboxCounter, Message, Review, User
+
+
+@receiver(post_save, sender=Event, dispatch_uid='calendar_index_event_saved')
+def update_calendar_index(sender, instance, **kwargs):
+    # After commit, so a rolled back save never reaches the index
+    transaction.on_commit(lambda: calendar_index.update_event(
+        instance.id, instance.city, instance.start_date, instance.end_date, instance.is_active
+    ))
+
+
+@receiver(post_delete, sender=Event, dispatch_uid='calendar_index_event_deleted')
+def remove_from_calendar_index(sender, instance, **kwargs):
+    event_id = instance.id
+    transaction.on_commit(lambda: calendar_index.remove_event(event_id))
+
+
+# The events version keys facets and the cached upcoming list, which also show
+# each event's images and category
+
+@receiver(post_save, sender=Event, dispatch_uid='facets_event_saved')
+@receiver(post_delete, sender=Event, dispatch_uid='facets_event_deleted')
+@receiver(post_save, sender=EventImage, dispatch_uid='events_version_event_image_saved')
+@receiver(post_delete, sender=EventImage, dispatch_uid='events_version_event_image_deleted')
+@receiver(post_save, sender=Category, dispatch_uid='events_version_category_saved')
+@receiver(post_delete, sender=Category, dispatch_uid='events_version_category_deleted')
+def invalidate_event_facets(sender, **kwargs):
+    transaction.on_commit(bump_events_version)
+
+
+# Organizer dashboard counters (EventStats). These run inside the write's transaction,
+# so a rolled back write never changes them. post_init remembers the loaded status/rating
+# so post_save can apply the difference; when it wasn't loaded (deferred field) the
+# event's stats are recomputed instead.
+
+@receiver(post_save, sender=Event, dispatch_uid='event_stats_event_created')
+def create_event_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EventStats.objects.get_or_create(event_id=instance.id)
+
+
+@receiver(post_init, sender=Conversation, dispatch_uid='event_stats_conversation_loaded')
+def remember_conversation_status(sender, instance, **kwargs):
+    instance._stats_status = instance.__dict__.get('status') if instance.pk else None
+
+
+@receiver(post_save, sender=Conversation, dispatch_uid='event_stats_conversation_saved')
+def count_conversation_status(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust_event_stats(instance.event_id, **status_deltas(None, instance.status))
+    elif instance._stats_status is None:
+        rebuild_event_stats([instance.event_id])
+    else:
+        adjust_event_stats(instance.event_id, **status_deltas(instance._stats_status, instance.status))
+    instance._stats_status = instance.status
+
+
+@receiver(post_delete, sender=Conversation, dispatch_uid='event_stats_conversation_deleted')
+def uncount_conversation_status(sender, instance, **kwargs):
+    adjust_event_stats(instance.event_id, create_missing=False, **status_deltas(instance.status, None))
+
+
+def _message_event_id(message):
+    if Message.conversation.is_cached(message):
+        return message.conversation.event_id
+    return Conversation.objects.filter(id=message.conversation_id).values_list('event_id', flat=True).first()
+
+
+@receiver(post_delete, sender=Message, dispatch_uid='event_stats_message_deleted')
+def uncount_message(sender, instance, **kwargs):
+    event_id = _message_event_id(instance)
+    if event_id is not None:
+        adjust_event_stats(event_id, create_missing=False, message_count=-1)
+
+
+@receiver(post_init, sender=Review, dispatch_uid='event_stats_review_loaded')
+def remember_review_rating(sender, instance, **kwargs):
+    instance._stats_rating = instance.__dict__.get('rating') if instance.pk else None
+
+
+@receiver(post_save, sender=Review, dispatch_uid='event_stats_review_saved')
+def count_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust_event_stats(instance.event_id, review_count=1, rating_sum=instance.rating)
+    elif instance._stats_rating is None:
+        rebuild_event_stats([instance.event_id])
+    else:
+        adjust_event_stats(instance.event_id, rating_sum=instance.rating - instance._stats_rating)
+    instance._stats_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review, dispatch_uid='event_stats_review_deleted')
+def uncount_review(sender, instance, **kwargs):
+    adjust_event_stats(instance.event_id, create_missing=False, review_count=-1, rating_sum=-instance.rating)
+
+
+# Unread badge counters (InboxCounter), also applied inside the write's transaction
+
+@receiver(post_save, sender=User, dispatch_uid='inbox_counter_user_created')
+def create_inbox_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        InboxCounter.objects.get_or_create(user_id=instance.id)
+
+
+@receiver(post_save, sender=Message, dispatch_uid='inbox_counter_message_saved')
+def count_message(sender, instance, created, raw=False, **kwargs):
+    # inbox.send_message() counts its own messages; this covers any other way of creating one
+    if created and not raw and not getattr(instance, '_counted', False):
+        conversation = Conversation.objects.only('event_id', 'user_id', 'host_id').get(id=instance.conversation_id)
+        record_message(instance, conversation)
+
+
+@receiver(post_delete, sender=Message, dispatch_uid='inbox_counter_message_deleted')
+def uncount_unread_message(sender, instance, **kwargs):
+    forget_message(instance)
+
+
+# Event list fragments (fragments.py) are keyed by the event's updated_at; images are part of them
+
+@receiver(post_save, sender=EventImage, dispatch_uid='fragments_event_image_saved')
+@receiver(post_delete, sender=EventImage, dispatch_uid='fragments_event_image_deleted')
+def touch_image_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Event.objects.filter(id=instance.event_id).update(updated_at=timezone.now())
+
+
+# Query cache (querycache.py): any write to a tracked table invalidates its cached reads
+
+@receiver(post_save, sender=Category, dispatch_uid='querycache_category_saved')
+@receiver(post_save, sender=User, dispatch_uid='querycache_user_saved')
+@receiver(post_save, sender=Event, dispatch_uid='querycache_event_saved')
+def bump_query_cache_version(sender, using=None, **kwargs):
+    bump_after_commit(sender, using=using)
+
+
+@receiver(post_delete, sender=Category, dispatch_uid='querycache_category_deleted')
+@receiver(post_delete, sender=User, dispatch_uid='querycache_user_deleted')
+@receiver(post_delete, sender=Event, dispatch_uid='querycache_event_deleted')
+def bump_query_cache_version_on_delete(sender, using=None, **kwargs):
+    bump_after_commit(sender, using=using, deleted=True)
+
+
+# The shared snapshot (snapshot.py) holds the category list and host rating summaries
+
+@receiver(post_save, sender=Category, dispatch_uid='snapshot_category_saved')
+@receiver(post_delete, sender=Category, dispatch_uid='snapshot_category_deleted')
+@receiver(post_save, sender=Review, dispatch_uid='snapshot_review_saved')
+@receiver(post_delete, sender=Review, dispatch_uid='snapshot_review_deleted')
+def rebuild_shared_snapshot(sender, **kwargs):
+    transaction.on_commit(shared_snapshot.rebuild_in_background)
+
+
+# Stateless auth (authentication.py) caches each user's token version in the shared 'auth' cache
+
+@receiver(post_save, sender=User, dispatch_uid='auth_user_saved')
+@receiver(post_delete, sender=User, dispatch_uid='auth_user_deleted')
+def forget_cached_token_version(sender, instance, **kwargs):
+    user_id = instance.id
+    transaction.on_commit(lambda: forget_token_version(user_id))
@@ -0,0 +1,174 @@
+"""
+Single-flight recomputation with stale-while-revalidate for hot payloads
+
+When a popular payload (an event's detail page, the upcoming list) expires,
+every concurrent request used to recompute it at once. get_or_compute()
+lets one request recompute while the others are served the previous value,
+or wait for the new one if there is none.
+
+- Entries live in the 'singleflight' cache for TTL + STALE_TTL seconds.
+  They are fresh for TTL seconds; after that they're stale but can still
+  be served while one caller recomputes. An entry whose version differs
+  from the caller's (e.g. the event was edited) is never served: callers
+  wait for the recompute instead.
+- Within a process, concurrent requests for a key and version share one
+  flight: the first computes, the rest get the stale value or wait for
+  its result.
+- Across processes, the recompute is claimed with cache.add() on a lock key
+  (Redis when REDIS_URL is set). Losers serve the stale value, or poll for
+  the winner's result; after WAIT_TIMEOUT, or if the winner gives up, they
+  compute it themselves.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from backend_api import metrics
+
+# Seconds between checks while waiting for another process's recompute
+POLL_INTERVAL = 0.05
+
+
+def _cache():
+    return caches['singleflight']
+
+
+class _Flight:
+    """One in-process recompute that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+_lock = threading.Lock()
+_flights = {}
+_stats = {
+    'fresh_hits': 0,
+    'stale_served': 0,
+    'recomputes': 0,
+    'coalesced': 0,
+    'remote_waits': 0,
+    'wait_timeouts': 0,
+}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _lock:
+        return {**_stats, 'in_flight': len(_flights)}
+
+
+metrics.register('single_flight', stats)
+
+
+def _is_fresh(entry, version):
+    return entry is not None and entry['version'] == version and entry['fresh_until'] > time.time()
+
+
+def _store(key, value, version, ttl, stale_ttl):
+    _cache().set(key, {
+        'value': value,
+        'version': version,
+        'fresh_until': time.time() + ttl,
+    }, ttl + stale_ttl)
+
+
+def _compute_across_workers(key, compute, entry, version, ttl, stale_ttl):
+    """Run compute() if no other process is already recomputing key, else serve stale or wait"""
+    config = settings.SINGLE_FLIGHT
+    lock_key = f'{key}:lock'
+    if not _cache().add(lock_key, 1, config['LOCK_TIMEOUT']):
+        if entry is not None:
+            _count('stale_served')
+            return entry['value']
+
+        _count('remote_waits')
+        deadline = time.monotonic() + config['WAIT_TIMEOUT']
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            current = _cache().get(key)
+            if _is_fresh(current, version):
+                return current['value']
+            if _cache().get(lock_key) is None:
+                # The other process failed (or stored an older version): compute ourselves
+                break
+        else:
+            _count('wait_timeouts')
+        return _recompute(key, compute, version, ttl, stale_ttl)
+
+    try:
+        return _recompute(key, compute, version, ttl, stale_ttl)
+    finally:
+        _cache().delete(lock_key)
+
+
+def _recompute(key, compute, version, ttl, stale_ttl):
+    _count('recomputes')
+    value = compute()
+    _store(key, value, version, ttl, stale_ttl)
+    return value
+
+
+def get_or_compute(key, compute, version=None, ttl=None, stale_ttl=None):
+    """
+    Cached value of compute() under key, recomputed by one caller at a time
+    once it is older than ttl seconds or its version differs from version;
+    meanwhile other callers get the expired value of the same version for up
+    to stale_ttl more seconds, or wait for the recompute
+
+    compute() must return something the 'singleflight' cache can pickle.
+    Exceptions it raises reach every caller waiting on the same flight, and
+    nothing is stored.
+    """
+    config = settings.SINGLE_FLIGHT
+    ttl = config['TTL'] if ttl is None else ttl
+    stale_ttl = config['STALE_TTL'] if stale_ttl is None else stale_ttl
+    # Hashed: keys may embed full URLs, longer than some cache backends accept
+    key = hashlib.sha1(key.encode()).hexdigest()
+
+    entry = _cache().get(key)
+    if _is_fresh(entry, version):
+        _count('fresh_hits')
+        return entry['value']
+    if entry is not None and entry['version'] != version:
+        # Computed from other data: only ever served as its own version
+        entry = None
+
+    flight_key = (key, version)
+    with _lock:
+        flight = _flights.get(flight_key)
+        leader = flight is None
+        if leader:
+            flight = _flights[flight_key] = _Flight()
+
+    if not leader:
+        if entry is not None:
+            _count('stale_served')
+            return entry['value']
+        _count('coalesced')
+        if flight.done.wait(config['WAIT_TIMEOUT']):
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        _count('wait_timeouts')
+        return _recompute(key, compute, version, ttl, stale_ttl)
+
+    try:
+        flight.value = _compute_across_workers(key, compute, entry, version, ttl, stale_ttl)
+        return flight.value
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            del _flights[flight_key]
+        flight.done.set()
@@ -0,0 +1,387 @@
+"""
+Shared-memory snapshot of read-mostly reference data for all workers on a host
+
+Each gunicorn worker used to warm its own copy of categories, host rating
+summaries and event list fragments. They are now also written to one
+snapshot file that every worker memory-maps read-only, so the pages are
+shared through the OS page cache and a new worker starts warm.
+
+- File layout: header (magic, version, build time, entry count), an index
+  of (key hash, offset, length) sorted by hash, then one JSON (key, value)
+  record per entry. A lookup is a binary search over the index plus
+  decoding that record; nothing is copied into the worker up front.
+  Values must be JSON-serializable (tuples come back as lists).
+- The file is never unpickled and is only mapped if it is a regular file
+  owned by this user and not writable by anyone else. By default it lives
+  in the user's 0700 runtime directory (backend_api/runtime.py), not under
+  a predictable name in the shared temp directory.
+- Snapshots are written to a temporary file and swapped in with
+  os.replace(), so readers see the old or the new file, never half of one.
+  Readers stat() the path at most every CHECK_INTERVAL seconds and map the
+  new file; the old mapping stays valid until it's garbage collected.
+- Readers never wait: a snapshot older than MAX_AGE is still served while
+  a worker rebuilds it in a background thread (writers take turns with a
+  flock on a lock file). Review and category changes trigger a rebuild
+  right away (signals.py), so summaries lag a write by the rebuild plus
+  up to CHECK_INTERVAL.
+- A snapshot records when the database's last migration was applied and
+  is ignored by workers of any other database (e.g. a recreated test one).
+- manage.py build_shared_snapshot writes it at deploy time. Commands that
+  change categories wait() for the rebuild they trigger before exiting,
+  and a writer removes temporary files a killed writer left behind.
+"""
+import glob
+import hashlib
+import json
+import mmap
+import os
+import stat
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Avg, Count, Max
+
+from backend_api import metrics
+from backend_api.runtime import owned_by_current_user, private_directory
+
+from .models import Category, Event, Review
+from .serializers import CategorySerializer
+
+try:
+    import fcntl
+except ImportError:  # Windows: rebuilds are then only coordinated within a process
+    fcntl = None
+
+MAGIC = b'EVSNAP02'
+HEADER = struct.Struct('<8sQdI')  # magic, version, built_at, entry count
+ENTRY = struct.Struct('<QQI')     # key hash, record offset, record length
+
+CATEGORIES_KEY = 'categories'
+DATABASE_KEY = 'database'
+FRAGMENT_PREFIX = 'fragment:'
+
+
+def host_rating_key(host_id):
+    return f'host_rating:{host_id}'
+
+
+def fragment_key(key):
+    return f'{FRAGMENT_PREFIX}{key}'
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+
+
+def write_snapshot(path, entries, version):
+    """Atomically replace the snapshot at path with entries ({key: JSON-serializable value})"""
+    records = sorted(
+        (_hash(key), json.dumps([key, value], separators=(',', ':')).encode())
+        for key, value in entries.items()
+    )
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    # Created by us, readable and writable only by us; never through a planted file or symlink
+    fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        with open(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, version, time.time(), len(records)))
+            offset = HEADER.size + ENTRY.size * len(records)
+            for key_hash, record in records:
+                f.write(ENTRY.pack(key_hash, offset, len(record)))
+                offset += len(record)
+            for _, record in records:
+                f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+class _Mapping:
+    """One mapped snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.open(path, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0)), 'rb') as f:
+            file_stat = os.fstat(f.fileno())
+            if (
+                not stat.S_ISREG(file_stat.st_mode)
+                or not owned_by_current_user(file_stat)
+                or file_stat.st_mode & 0o022
+            ):
+                raise ValueError(f'{path} is not a regular file owned by this user and writable only by it')
+            self.identity = (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size)
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.built_at, self.count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a snapshot file')
+        self.size = file_stat.st_size
+
+    def _entry(self, index):
+        return ENTRY.unpack_from(self.buffer, HEADER.size + index * ENTRY.size)
+
+    def get(self, key, default=None):
+        key_hash = _hash(key)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < key_hash:
+                low = middle + 1
+            else:
+                high = middle
+        # Several keys can share a hash: compare the stored keys
+        while low < self.count:
+            entry_hash, offset, length = self._entry(low)
+            if entry_hash != key_hash:
+                break
+            stored_key, value = json.loads(self.buffer[offset:offset + length])
+            if stored_key == key:
+                return value
+            low += 1
+        return default
+
+    def items(self):
+        for index in range(self.count):
+            _, offset, length = self._entry(index)
+            yield json.loads(self.buffer[offset:offset + length])
+
+
+class SharedSnapshot:
+    """Lock-free reader of the snapshot file, rebuilding it in the background when it gets old"""
+
+    def __init__(self, path=None, max_age=60.0, check_interval=1.0, max_fragments=2000):
+        self._path = path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.max_fragments = max_fragments
+
+        self._lock = threading.Lock()
+        self._mapping = None
+        self._next_check = 0.0
+        self._rebuilding = False
+        self._pending = False
+        self._thread = None
+        self._database_tokens = {}
+
+        # Metrics
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+        self._rebuilds = 0
+
+    def _database_token(self):
+        """Identifies the database the snapshot was built from: when its last migration was applied"""
+        name = str(connection.settings_dict['NAME'])
+        if name not in self._database_tokens:
+            applied = MigrationRecorder(connection).migration_qs.aggregate(latest=Max('applied'))['latest']
+            self._database_tokens[name] = applied.isoformat() if applied else ''
+        return self._database_tokens[name]
+
+    @property
+    def path(self):
+        if self._path:
+            return self._path
+        # Resolved late: the test runner renames the database after settings are loaded
+        database = hashlib.sha1(str(connection.settings_dict['NAME']).encode()).hexdigest()[:12]
+        return os.path.join(private_directory(), f'snapshot_{database}.bin')
+
+    def _current(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._reload_if_replaced()
+            mapping = self._mapping
+            if mapping is None or time.time() - mapping.built_at > self.max_age:
+                self.rebuild_in_background()
+        return self._mapping
+
+    def _reload_if_replaced(self):
+        try:
+            path = self.path
+            file_stat = os.stat(path)
+        except OSError:
+            # Missing, or the runtime directory isn't private: serve nothing from it
+            self._mapping = None
+            return
+        mapping = self._mapping
+        if mapping is not None and mapping.identity == (file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size):
+            return
+        try:
+            mapping = _Mapping(path)
+        except (OSError, ValueError, struct.error):
+            self._mapping = None
+            return
+        if mapping.get(DATABASE_KEY) != self._database_token():
+            # Written for another database (or before it was recreated): never served
+            self._mapping = None
+            return
+        # Plain assignment: readers holding the previous mapping keep using it safely
+        self._mapping = mapping
+        with self._lock:
+            self._reloads += 1
+
+    def get(self, key, default=None):
+        mapping = self._current()
+        value = mapping.get(key, default) if mapping is not None else default
+        with self._lock:
+            if value is default:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def get_many(self, keys):
+        """{key: value} for the keys in the snapshot"""
+        mapping = self._current()
+        found = {}
+        if mapping is not None:
+            for key in keys:
+                value = mapping.get(key)
+                if value is not None:
+                    found[key] = value
+        with self._lock:
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        return found
+
+    def rebuild(self, carry_over_fragments=False):
+        """
+        Write a new snapshot from the database plus this worker's hottest fragments (and
+        the previous snapshot's, if carry_over_fragments); returns its entry count
+        """
+        # One writer per host at a time, so a rebuild never overwrites one that read newer data
+        with open(f'{self.path}.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Holding the lock, so any temporary file is from a writer that died mid-write
+                for leftover in glob.glob(f'{glob.escape(self.path)}.*.tmp'):
+                    try:
+                        os.remove(leftover)
+                    except OSError:
+                        pass
+
+            from .fragments import fragment_cache
+
+            self._reload_if_replaced()
+            mapping = self._mapping
+            entries = build_entries()
+            entries[DATABASE_KEY] = self._database_token()
+
+            # Previous snapshot's fragments first, so this worker's hottest win the trim
+            fragments = OrderedDict()
+            if carry_over_fragments and mapping is not None:
+                for key, value in mapping.items():
+                    if key.startswith(FRAGMENT_PREFIX):
+                        fragments[key] = value
+            for key, fragment in fragment_cache.hottest(self.max_fragments):
+                fragments.pop(fragment_key(key), None)
+                fragments[fragment_key(key)] = fragment
+            while len(fragments) > self.max_fragments:
+                fragments.popitem(last=False)
+            entries.update(fragments)
+
+            version = (mapping.version if mapping is not None else 0) + 1
+            write_snapshot(self.path, entries, version)
+
+        with self._lock:
+            self._rebuilds += 1
+        self._reload_if_replaced()
+        return len(entries)
+
+    def rebuild_in_background(self):
+        """Rebuild in a thread; a request during a running rebuild makes it run once more"""
+        with self._lock:
+            if self._rebuilding:
+                self._pending = True
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                while True:
+                    try:
+                        self.rebuild()
+                    except Exception:
+                        pass  # Readers keep the previous snapshot; the next stale check retries
+                    with self._lock:
+                        if not self._pending:
+                            self._rebuilding = False
+                            return
+                        self._pending = False
+            finally:
+                connection.close()
+
+        self._thread = threading.Thread(target=run, name='shared-snapshot-rebuild', daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Block until a background rebuild finishes; for processes about to exit (daemon threads die mid-write)"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        mapping = self._mapping
+        with self._lock:
+            return {
+                'path': mapping.path if mapping else None,
+                'version': mapping.version if mapping else None,
+                'entries': mapping.count if mapping else 0,
+                'bytes': mapping.size if mapping else 0,
+                'age_seconds': round(time.time() - mapping.built_at, 1) if mapping else None,
+                'hits': self._hits,
+                'misses': self._misses,
+                'reloads': self._reloads,
+                'rebuilds': self._rebuilds,
+            }
+
+
+def build_entries():
+    """Categories and the rating summary of every event organizer, from the database"""
+    entries = {CATEGORIES_KEY: [dict(data) for data in CategorySerializer(Category.objects.all(), many=True).data]}
+
+    ratings = {host_id: (0, 0) for host_id in Event.objects.order_by().values_list('organizer_id', flat=True).distinct()}
+    for row in Review.objects.order_by().values('host_id').annotate(average=Avg('rating'), total=Count('id')):
+        ratings[row['host_id']] = (round(row['average'], 1) if row['average'] else 0, row['total'])
+    entries.update((host_rating_key(host_id), rating) for host_id, rating in ratings.items())
+    return entries
+
+
+class _Disabled:
+    """Stand-in when SHARED_SNAPSHOT['ENABLED'] is False: every lookup misses"""
+
+    def get(self, key, default=None):
+        return default
+
+    def get_many(self, keys):
+        return {}
+
+    def rebuild_in_background(self):
+        pass
+
+    def wait(self, timeout=None):
+        pass
+
+    def stats(self):
+        return {'enabled': False}
+
+
+if settings.SHARED_SNAPSHOT['ENABLED']:
+    shared_snapshot = SharedSnapshot(
+        settings.SHARED_SNAPSHOT['PATH'],
+        max_age=settings.SHARED_SNAPSHOT['MAX_AGE'],
+        check_interval=settings.SHARED_SNAPSHOT['CHECK_INTERVAL'],
+        max_fragments=settings.SHARED_SNAPSHOT['MAX_FRAGMENTS'],
+    )
+else:
+    shared_snapshot = _Disabled()
+metrics.register('shared_snapshot', shared_snapshot.stats)
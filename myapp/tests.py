@@ -1,3 +1,1866 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from io import StringIO
+from datetime import date, time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Count, F, Value
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from backend_api.db_backends.pool import ConnectionPool, PoolTimeout
+from backend_api.runtime import private_directory
+
+from .models import User, Event, EventImage, EventStats, Category, Conversation, InboxCounter, Message, Review, combine_local
+from . import querycache
+from .calendar_index import CalendarIndex, calendar_index
+from .inbox import mark_read, send_message
+from .jwt_utils import get_tokens_for_user
+from .management.commands import boot
+from .snapshot import CATEGORIES_KEY, SharedSnapshot, host_rating_key
+from .views import EventViewSet
+
+
+def create_event(organizer, **fields):
+    defaults = dict(
+        title='Test event', description='Test', max_attendees=10,
+        start_date=date.today() + timedelta(days=7), end_date=date.today() + timedelta(days=7),
+        start_time=time(18, 0), end_time=time(22, 0),
+        street='1 Main St', city='Testville', state='TS', postal_code='00000',
+        organizer_id=organizer, organizer_name=organizer.name, organizer_email=organizer.email,
+    )
+    defaults.update(fields)
+    return Event.objects.create(**defaults)
+
+
+class HostReviewsPaginationTests(TestCase):
+    """Review listings are keyset paginated and serialized without per-row queries"""
+
+    REVIEWERS = 100
+    EVENTS = 50  # 100 reviewers x 50 events = 5,000 reviews
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        reviewers = User.objects.bulk_create([
+            User(name=f'Reviewer {i}', email=f'reviewer{i}@test.local', password='x')
+            for i in range(cls.REVIEWERS)
+        ])
+        events = [create_event(cls.host, title=f'Event {i}') for i in range(cls.EVENTS)]
+        Review.objects.bulk_create([
+            Review(event=event, host=cls.host, reviewer=reviewer, rating=(i + j) % 5 + 1, comment='ok')
+            for i, event in enumerate(events)
+            for j, reviewer in enumerate(reviewers)
+        ])
+
+    def test_page_query_count_does_not_grow_with_reviews(self):
+        # Host lookup, statistics aggregate, page of reviews with joins
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/reviews/host/{self.host.id}/', {'limit': 100})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['reviews']), 100)
+        self.assertTrue(response.data['pagination']['has_more'])
+        self.assertEqual(response.data['statistics']['total_reviews'], 5000)
+        self.assertEqual(sum(response.data['statistics']['rating_distribution'].values()), 5000)
+        self.assertEqual(response.data['reviews'][0]['host_name'], 'Host')
+
+    def test_cursor_walks_every_review_once(self):
+        for sort in ('newest', 'rating'):
+            seen = []
+            cursor = None
+            while True:
+                params = {'limit': 100, 'sort': sort}
+                if cursor:
+                    params['cursor'] = cursor
+                response = self.client.get(f'/api/reviews/host/{self.host.id}/', params)
+                self.assertEqual(response.status_code, 200)
+                seen.extend(review['id'] for review in response.data['reviews'])
+                cursor = response.data['pagination']['next_cursor']
+                if not cursor:
+                    break
+
+            self.assertEqual(len(seen), 5000)
+            self.assertEqual(len(set(seen)), 5000)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/reviews/host/{self.host.id}/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(QUERY_CACHE={'ENABLED': True, 'TIMEOUT': 300})
+class QueryCacheTests(TransactionTestCase):
+    """
+    .cached() reads never return rows older than the last committed write
+    (TransactionTestCase: reads inside atomic blocks bypass the cache)
+    """
+
+    def setUp(self):
+        caches['querycache'].clear()
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.event = create_event(self.host)
+
+    def test_repeated_read_is_served_from_cache(self):
+        User.objects.cached().get(id=self.host.id)
+        with self.assertNumQueries(0):
+            user = User.objects.cached().get(id=self.host.id)
+        self.assertEqual(user.name, 'Host')
+
+    def test_save_invalidates(self):
+        self.assertEqual(User.objects.cached().get(id=self.host.id).name, 'Host')
+        self.host.name = 'Renamed'
+        self.host.save()
+        self.assertEqual(User.objects.cached().get(id=self.host.id).name, 'Renamed')
+
+    def test_queryset_update_invalidates(self):
+        self.assertEqual(Event.objects.cached().get(id=self.event.id).confirmed_attendees, 0)
+        Event.objects.filter(id=self.event.id).update(confirmed_attendees=3)
+        self.assertEqual(Event.objects.cached().get(id=self.event.id).confirmed_attendees, 3)
+
+    def test_bulk_writes_invalidate(self):
+        self.assertEqual(list(Category.objects.cached()), [])
+        Category.objects.bulk_create([Category(name='Music'), Category(name='Sports')])
+        categories = list(Category.objects.cached())
+        self.assertEqual([category.name for category in categories], ['Music', 'Sports'])
+
+        categories[0].name = 'Concerts'
+        Category.objects.bulk_update(categories[:1], ['name'])
+        self.assertEqual([category.name for category in Category.objects.cached()], ['Concerts', 'Sports'])
+
+    def test_delete_invalidates(self):
+        event_id = self.event.id
+        Event.objects.cached().get(id=event_id)
+        self.event.delete()
+        with self.assertRaises(Event.DoesNotExist):
+            Event.objects.cached().get(id=event_id)
+
+    def test_delete_invalidates_set_null_references(self):
+        category = Category.objects.create(name='Music')
+        Event.objects.filter(id=self.event.id).update(category=category)
+        self.assertEqual(Event.objects.cached().get(id=self.event.id).category_id, category.id)
+        category.delete()
+        self.assertIsNone(Event.objects.cached().get(id=self.event.id).category_id)
+
+    def test_uncommitted_and_rolled_back_writes(self):
+        User.objects.cached().get(id=self.host.id)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                User.objects.filter(id=self.host.id).update(name='Uncommitted')
+                # Inside the transaction the write is visible
+                self.assertEqual(User.objects.cached().get(id=self.host.id).name, 'Uncommitted')
+                raise RuntimeError
+        self.assertEqual(User.objects.cached().get(id=self.host.id).name, 'Host')
+
+    def test_queries_touching_untracked_tables_are_not_cached(self):
+        events = Event.objects.cached().filter(images__isnull=True)
+        self.assertEqual(len(events), 1)
+        EventImage.objects.create(event=self.event, image='event_images/test.jpg')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(Event.objects.cached().filter(images__isnull=True)), 0)
+
+    def test_lost_version_key_never_serves_old_rows(self):
+        User.objects.cached().get(id=self.host.id)
+        caches['querycache'].delete(querycache._version_key(User._meta.db_table))
+        User.objects.filter(id=self.host.id).update(name='Renamed')
+        self.assertEqual(User.objects.cached().get(id=self.host.id).name, 'Renamed')
+
+    def test_authentication_sees_revoked_tokens(self):
+        access = get_tokens_for_user(self.host)['access']
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+        with self.settings(JWT_STATELESS_AUTH=False):
+            self.assertEqual(self.client.get('/api/profile/', **headers).status_code, 200)
+            User.objects.filter(id=self.host.id).update(token_version=1)
+            self.assertEqual(self.client.get('/api/profile/', **headers).status_code, 401)
+
+
+REDIS_QUERY_CACHE = {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': os.environ.get('REDIS_URL'),
+    'KEY_PREFIX': 'querycache-test',
+}
+
+
+@skipUnless(os.environ.get('REDIS_URL'), 'REDIS_URL is not set')
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'querycache': REDIS_QUERY_CACHE,
+})
+class RedisQueryCacheTests(QueryCacheTests):
+    """The same guarantees with the Redis backend"""
+
+
+@override_settings(JWT_STATELESS_AUTH=False)
+class QueryCacheAcrossWorkersTests(TransactionTestCase):
+    """
+    A write in one gunicorn worker is seen by authentication in the others
+    (each worker is simulated with its own 'querycache' store, as LocMemCache is per process)
+    """
+
+    def worker(self, name):
+        return override_settings(CACHES={
+            **settings.CACHES,
+            'querycache': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'worker-{name}'},
+        })
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        access = get_tokens_for_user(self.host)['access']
+        self.headers = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+
+    def test_per_process_cache_is_disabled(self):
+        self.assertEqual(settings.QUERY_CACHE['ENABLED'], bool(settings.REDIS_URL))
+
+    def test_revoked_token_rejected_by_other_worker(self):
+        with self.worker('a'):
+            self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 200)
+        with self.worker('b'):
+            User.objects.filter(id=self.host.id).update(token_version=1)
+        with self.worker('a'):
+            self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 401)
+
+    def test_deleted_user_rejected_by_other_worker(self):
+        with self.worker('a'):
+            self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 200)
+        with self.worker('b'):
+            self.host.delete()
+        with self.worker('a'):
+            self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 401)
+
+
+@skipUnless(os.environ.get('REDIS_URL'), 'REDIS_URL is not set')
+@override_settings(QUERY_CACHE={'ENABLED': True, 'TIMEOUT': 300})
+class RedisQueryCacheAcrossWorkersTests(QueryCacheAcrossWorkersTests):
+    """Workers sharing Redis keep the query cache on and still see each other's writes"""
+
+    def worker(self, name):
+        return override_settings(CACHES={**settings.CACHES, 'querycache': REDIS_QUERY_CACHE})
+
+
+class SharedSnapshotTests(TestCase):
+    """Snapshots are replaced atomically, and only private files written by this user are served"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, 'snapshot.bin')
+        self.snapshot = self.reader()
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.event = create_event(self.host)
+        Category.objects.create(name='Music')
+
+    def reader(self):
+        snapshot = SharedSnapshot(self.path, max_age=3600, check_interval=0)
+        # Rebuilds are explicit here, never from a background thread
+        snapshot.rebuild_in_background = lambda: None
+        return snapshot
+
+    def test_rebuild_replaces_snapshot(self):
+        self.snapshot.rebuild()
+        first = self.snapshot._mapping
+        self.assertEqual([category['name'] for category in self.snapshot.get(CATEGORIES_KEY)], ['Music'])
+        self.assertEqual(self.snapshot.get(host_rating_key(self.host.id)), [0, 0])
+
+        reviewer = User.objects.create(name='Reviewer', email='reviewer@test.local', password='x')
+        Review.objects.create(event=self.event, host=self.host, reviewer=reviewer, rating=4, comment='ok')
+        Category.objects.create(name='Sports')
+        self.snapshot.rebuild()
+
+        self.assertEqual(self.snapshot.stats()['version'], first.version + 1)
+        self.assertEqual([category['name'] for category in self.snapshot.get(CATEGORIES_KEY)], ['Music', 'Sports'])
+        self.assertEqual(self.snapshot.get(host_rating_key(self.host.id)), [4.0, 1])
+        # A reader still holding the previous mapping keeps reading the old file
+        self.assertEqual([category['name'] for category in first.get(CATEGORIES_KEY)], ['Music'])
+        self.assertEqual(sorted(os.listdir(self.directory)), ['snapshot.bin', 'snapshot.bin.lock'])
+
+    def test_rebuild_removes_leftovers_of_killed_writers(self):
+        leftover = f'{self.path}.4242.140.tmp'
+        open(leftover, 'w').close()
+        self.snapshot.rebuild()
+        self.assertFalse(os.path.exists(leftover))
+
+    def test_other_workers_read_the_new_snapshot(self):
+        other = self.reader()
+        self.assertIsNone(other.get(CATEGORIES_KEY))
+        self.snapshot.rebuild()
+        self.assertEqual([category['name'] for category in other.get(CATEGORIES_KEY)], ['Music'])
+
+    def test_snapshot_writable_by_others_is_not_served(self):
+        self.snapshot.rebuild()
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        os.chmod(self.path, 0o666)
+        self.assertIsNone(self.reader().get(CATEGORIES_KEY))
+
+    def test_foreign_file_is_not_served(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'cos\nsystem\n(S"exit 1"\ntR.')
+        os.chmod(self.path, 0o600)
+        self.assertIsNone(self.reader().get(CATEGORIES_KEY))
+
+    def test_runtime_directory_must_be_private(self):
+        with tempfile.TemporaryDirectory() as parent, mock.patch('tempfile.gettempdir', return_value=parent):
+            directory = private_directory()
+            self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+            os.chmod(directory, 0o777)
+            with self.assertRaises(PermissionError):
+                private_directory()
+
+
+class CalendarIndexTests(TestCase):
+    """The per-city day index follows event saves and stays bounded whatever cities are asked for"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create(name='Host', email='host@test.local', password='x')
+
+    def setUp(self):
+        calendar_index.clear()
+        self.addCleanup(calendar_index.clear)
+        self.day = date.today() + timedelta(days=7)
+
+    def window(self, index, city='Testville'):
+        return index.lookup(city, self.day, self.day + timedelta(days=2))
+
+    def test_saves_update_the_loaded_city(self):
+        existing = create_event(self.host, end_date=self.day + timedelta(days=1))
+        calendar_index.load_city('Testville')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = create_event(self.host, start_date=self.day + timedelta(days=2), end_date=self.day + timedelta(days=2))
+        self.assertEqual(list(self.window(calendar_index).values()), [[existing.id], [existing.id], [added.id]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            existing.end_date = self.day
+            existing.save()
+            added.is_active = False
+            added.save()
+        self.assertEqual(list(self.window(calendar_index).values()), [[existing.id], [], []])
+
+        event_id = existing.id
+        with self.captureOnCommitCallbacks(execute=True):
+            existing.delete()
+        self.assertEqual(list(self.window(calendar_index).values()), [[], [], []])
+        self.assertEqual(calendar_index.stats()['events'], 0)
+        self.assertNotIn(event_id, calendar_index._events)
+
+    def test_lookup_matches_the_orm(self):
+        def orm_days(start, end):
+            return {
+                start + timedelta(days=offset): list(Event.objects.filter(
+                    city='Testville', is_active=True,
+                    start_date__lte=start + timedelta(days=offset), end_date__gte=start + timedelta(days=offset),
+                ).order_by('id').values_list('id', flat=True))
+                for offset in range((end - start).days + 1)
+            }
+
+        start, end = self.day - timedelta(days=3), self.day + timedelta(days=10)
+        events = [
+            create_event(
+                self.host, start_date=self.day + timedelta(days=offset), end_date=self.day + timedelta(days=offset + length),
+                is_active=offset != 2, city='Elsewhere' if offset == 4 else 'Testville',
+            )
+            for offset, length in ((-5, 3), (-1, 0), (0, 2), (2, 1), (4, 0), (6, 9), (9, 0), (9, 1), (12, 0))
+        ]
+        calendar_index.load_city('Testville')
+        self.assertEqual(calendar_index.lookup('Testville', start, end), orm_days(start, end))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            events[0].end_date = self.day + timedelta(days=1)
+            events[0].save()
+            events[3].is_active = True
+            events[3].save()
+            events[4].city = 'Testville'
+            events[4].save()
+            events[5].delete()
+        self.assertEqual(calendar_index.lookup('Testville', start, end), orm_days(start, end))
+
+    def test_cities_without_active_events_are_not_indexed(self):
+        index = CalendarIndex(max_cities=5)
+        create_event(self.host, city='Inactive', is_active=False)
+        index.load_city('Nowhere')
+        index.load_city('Inactive')
+        self.assertEqual(index.stats()['cities'], 0)
+
+    def test_least_recently_used_city_is_evicted(self):
+        index = CalendarIndex(max_cities=2)
+        events = {city: create_event(self.host, city=city) for city in ('A', 'B', 'C')}
+        index.load_city('A')
+        index.load_city('B')
+        self.window(index, 'A')
+        index.load_city('C')
+
+        self.assertEqual(list(index._cities), ['A', 'C'])
+        self.assertIsNone(self.window(index, 'B'))
+        self.assertEqual(self.window(index, 'C')[self.day], [events['C'].id])
+        self.assertNotIn(events['B'].id, index._events)
+        self.assertEqual(index.stats()['evictions'], 1)
+
+    def test_unknown_cities_share_one_bounded_loader(self):
+        index = CalendarIndex(max_cities=3)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        index.load_city = lambda city: release.wait(5)
+        threads = threading.active_count()
+
+        for i in range(20):
+            self.assertIsNone(self.window(index, f'Spam {i}'))
+
+        self.assertLessEqual(threading.active_count(), threads + 1)
+        self.assertLessEqual(len(index._loading), 4)  # Queue plus the city being loaded
+        self.assertGreaterEqual(index.stats()['dropped_loads'], 16)
+        self.assertEqual(index.stats()['cities'], 0)
+
+
+def auth_headers(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {get_tokens_for_user(user)["access"]}'}
+
+
+class ConversationStatusUpdateTests(TestCase):
+    """A status change writes its own columns only, never the message counters and watermarks"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.attendee = User.objects.create(name='Attendee', email='attendee@test.local', password='x')
+        self.event = create_event(self.host, max_attendees=1)
+        self.conversation, _, _ = send_message(self.event.id, self.attendee, 'Can I join?')
+
+    def test_status_change_keeps_counters_written_after_load(self):
+        from .serializers import ConversationStatusUpdateSerializer
+        # Loaded by the view before the messages below arrive
+        conversation = Conversation.objects.get(id=self.conversation.id)
+        send_message(self.event.id, self.attendee, 'Please?')
+        mark_read(Conversation.objects.get(id=self.conversation.id), self.attendee)
+
+        serializer = ConversationStatusUpdateSerializer(conversation, data={'status': 'confirmed'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.status, 'confirmed')
+        self.assertIsNotNone(conversation.confirmed_at)
+        self.assertEqual(conversation.message_count, 2)
+        self.assertEqual(conversation.host_unread_count, 2)
+        self.assertGreater(conversation.user_last_read_id, 0)
+        self.assertEqual(InboxCounter.objects.get(user=self.host).unread_messages, 2)
+
+    def test_endpoint_moves_capacity_and_dashboard_counters(self):
+        url = f'/api/conversations/{self.conversation.id}/status/'
+        headers = auth_headers(self.host)
+        response = self.client.patch(url, {'status': 'confirmed'}, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['event']['confirmed_attendees'], 1)
+        self.assertEqual(response.data['conversation']['message_count'], 1)
+
+        # Confirming again changes nothing; rejecting frees the spot
+        self.client.patch(url, {'status': 'confirmed'}, content_type='application/json', **headers)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_attendees, 1)
+        response = self.client.patch(url, {'status': 'rejected'}, content_type='application/json', **headers)
+        self.assertEqual(response.data['event']['confirmed_attendees'], 0)
+
+        stats = EventStats.objects.get(event=self.event)
+        self.assertEqual((stats.pending_count, stats.confirmed_count, stats.rejected_count), (0, 0, 1))
+
+
+def data_statements(queries):
+    """Captured queries other than savepoint bookkeeping"""
+    return [query['sql'] for query in queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))]
+
+
+class SendMessageTests(TestCase):
+    """A message costs a fixed number of single-row statements and keeps every counter in step"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.attendee = User.objects.create(name='Attendee', email='attendee@test.local', password='x')
+        self.event = create_event(self.host)
+
+    def assertCounters(self, message_count, host_unread, host_threads):
+        conversation = Conversation.objects.get(event=self.event)
+        self.assertEqual(conversation.message_count, message_count)
+        self.assertEqual(conversation.host_unread_count, host_unread)
+        self.assertEqual(EventStats.objects.get(event=self.event).message_count, message_count)
+        self.assertEqual(EventStats.objects.get(event=self.event).pending_count, 1)
+        counter = InboxCounter.objects.get(user=self.host)
+        self.assertEqual((counter.unread_messages, counter.unread_threads), (host_unread, host_threads))
+
+    def test_statement_counts(self):
+        with CaptureQueriesContext(connection) as queries:
+            conversation, created, message_count = send_message(self.event.id, self.attendee, 'Can I join?')
+        # Lookup, conversation INSERT and its EventStats count, message INSERT, then the
+        # conversation, InboxCounter and EventStats UPDATEs
+        self.assertEqual(len(data_statements(queries)), 7)
+        self.assertEqual((created, message_count), (True, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            _, created, message_count = send_message(self.event.id, self.attendee, 'Please?')
+        self.assertEqual(len(data_statements(queries)), 5)
+        self.assertEqual((created, message_count), (False, 2))
+
+        # The host answering counts as unread for the attendee, not the host
+        with CaptureQueriesContext(connection) as queries:
+            send_message(self.event.id, self.host, 'Sure')
+        self.assertEqual(len(data_statements(queries)), 5)
+        self.assertCounters(message_count=3, host_unread=2, host_threads=1)
+        self.assertEqual(InboxCounter.objects.get(user=self.attendee).unread_messages, 1)
+
+    def test_concurrent_first_messages_share_one_conversation(self):
+        from django.db.models import FilteredRelation, Q
+        # The other request's first message commits after this request's lookup ran, so
+        # the lookup saw no conversation and the INSERT below hits the unique constraint
+        send_message(self.event.id, self.attendee, 'From the other tab')
+        stale_lookup = FilteredRelation('conversations', condition=Q(conversations__id=-1))
+
+        with mock.patch('myapp.inbox.FilteredRelation', return_value=stale_lookup):
+            conversation, created, message_count = send_message(self.event.id, self.attendee, 'Can I join?')
+
+        self.assertFalse(created)
+        self.assertEqual(message_count, 2)
+        self.assertEqual(Conversation.objects.filter(event=self.event).count(), 1)
+        self.assertEqual(conversation.messages.count(), 2)
+        self.assertCounters(message_count=2, host_unread=2, host_threads=1)
+
+
+    def test_messages_created_elsewhere_are_counted_the_same(self):
+        conversation, _, _ = send_message(self.event.id, self.attendee, 'Can I join?')
+        Message.objects.create(conversation=conversation, sender=self.attendee, text='Please?')
+        self.assertCounters(message_count=2, host_unread=2, host_threads=1)
+        from .inbox import rebuild_inbox_counters
+        self.assertEqual(rebuild_inbox_counters()[1:], (0, 0))
+
+    def test_deleting_messages_rewinds_the_conversation(self):
+        conversation, _, _ = send_message(self.event.id, self.attendee, 'Can I join?')
+        send_message(self.event.id, self.attendee, 'Please?')
+        first, latest = conversation.messages.order_by('id')
+        latest.delete()
+        conversation.refresh_from_db()
+        self.assertEqual((conversation.message_count, conversation.last_message_at), (1, first.created_at))
+        first.delete()
+        conversation.refresh_from_db()
+        self.assertEqual((conversation.message_count, conversation.last_message_at), (0, None))
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    """With SQLITE_TUNING, new connections get the PRAGMAs and atomic() takes the write lock at BEGIN"""
+
+    def setUp(self):
+        from backend_api.db_backends.sqlite3.base import DatabaseWrapper
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuned.sqlite3')
+        self.tuned = DatabaseWrapper(
+            {**connection.settings_dict, 'ENGINE': 'backend_api.db_backends.sqlite3', 'NAME': self.path}, alias='tuned'
+        )
+        connections['tuned'] = self.tuned
+        self.addCleanup(delattr, connections._connections, 'tuned')
+        self.addCleanup(self.tuned.close)
+
+    def pragma(self, name):
+        with self.tuned.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_gets_the_pragmas(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+
+    def test_atomic_takes_the_write_lock_at_begin(self):
+        self.pragma('journal_mode')
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with CaptureQueriesContext(self.tuned) as queries:
+            with transaction.atomic(using='tuned'):
+                # Nothing written yet, but another writer is already locked out
+                with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+                    other.execute('BEGIN IMMEDIATE')
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+
+class StandInConnection:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Idle connections that fail the liveness check are replaced, not handed out"""
+
+    def setUp(self):
+        self.pool = ConnectionPool(min_size=0, max_size=2, timeout=1)
+        self.first, self.second = StandInConnection(), StandInConnection()
+        self.pool.putconn(self.pool.getconn(lambda: self.first))
+
+    def test_live_idle_connection_is_reused(self):
+        checked = []
+        connection = self.pool.getconn(
+            StandInConnection, check=lambda connection, idle: checked.append(connection) or True,
+        )
+        self.assertIs(connection, self.first)
+        self.assertEqual(checked, [self.first])
+
+    def test_dropped_idle_connection_is_replaced(self):
+        self.first.closed = True
+        connection = self.pool.getconn(lambda: self.second, check=lambda connection, idle: not connection.closed)
+        self.assertIs(connection, self.second)
+        stats = self.pool.stats()
+        self.assertEqual(stats['failed_checks'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_check_that_raises_counts_as_failed(self):
+        def ping(connection, idle):
+            raise OSError('server closed the connection unexpectedly')
+
+        self.assertIs(self.pool.getconn(lambda: self.second, check=ping), self.second)
+        self.assertTrue(self.first.closed)
+
+    def test_returned_connection_is_checked_out_again(self):
+        connection = self.pool.getconn(StandInConnection)
+        self.assertIs(connection, self.first)
+        self.assertEqual((self.pool.stats()['in_use'], self.pool.stats()['idle']), (1, 0))
+        self.pool.putconn(connection)
+        self.assertEqual((self.pool.stats()['in_use'], self.pool.stats()['idle']), (0, 1))
+        self.assertIs(self.pool.getconn(StandInConnection), self.first)
+        self.assertEqual(self.pool.stats()['connections_opened'], 1)
+
+    def test_broken_or_discarded_connections_are_not_returned_to_the_pool(self):
+        broken = self.pool.getconn(StandInConnection)
+        broken.closed = True
+        self.pool.putconn(broken)
+        discarded = self.pool.getconn(lambda: self.second)
+        self.assertIs(discarded, self.second)
+        self.pool.putconn(discarded, discard=True)
+        self.assertTrue(self.second.closed)
+        self.assertEqual((self.pool.stats()['size'], self.pool.stats()['connections_closed']), (0, 2))
+        self.assertIsNot(self.pool.getconn(StandInConnection), self.first)
+
+    def test_full_pool_waits_for_a_returned_connection(self):
+        pool = ConnectionPool(min_size=0, max_size=1, timeout=0.05)
+        connection = pool.getconn(StandInConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(StandInConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+        pool.timeout = 5
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(pool.getconn(StandInConnection)))
+        waiter.start()
+        threading.Event().wait(0.05)
+        pool.putconn(connection)
+        waiter.join(5)
+        self.assertEqual(results, [connection])
+        self.assertEqual(pool.stats()['connections_opened'], 1)
+
+    def test_failed_connect_frees_its_slot(self):
+        self.pool.getconn(StandInConnection)
+
+        def refuse():
+            raise OSError('connection refused')
+
+        with self.assertRaises(OSError):
+            self.pool.getconn(refuse)
+        self.assertEqual(self.pool.stats()['size'], 1)
+        self.assertIs(self.pool.getconn(lambda: self.second), self.second)
+
+
+class MetricsEndpointTests(TestCase):
+    """Runtime metrics are only shown to staff users"""
+
+    def test_staff_only(self):
+        user = User.objects.create(name='User', email='user@test.local', password='x')
+        staff = User.objects.create(name='Staff', email='staff@test.local', password='x', is_staff=True)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics/', **auth_headers(user)).status_code, 403)
+        response = self.client.get('/api/metrics/', **auth_headers(staff))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('single_flight', response.data['metrics'])
+
+
+class BootTests(TestCase):
+    """boot only loads the migration graph when the migrations on disk or in the database changed"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch('tempfile.gettempdir', return_value=directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.graph_loads = mock.patch.object(boot, 'pending_migrations', wraps=boot.pending_migrations)
+        # Categories in place, so boot has nothing to do but check migrations
+        call_command('populate_categories', stdout=StringIO())
+
+    def boot(self):
+        output = StringIO()
+        with self.graph_loads as pending_migrations:
+            call_command('boot', stdout=output)
+        return pending_migrations.call_count, output.getvalue()
+
+    def test_unchanged_migrations_skip_the_graph(self):
+        loads, output = self.boot()
+        self.assertEqual(loads, 1)
+        self.assertIn('0 pending', output)
+
+        loads, output = self.boot()
+        self.assertEqual(loads, 0)
+        self.assertIn('applied as of the last boot', output)
+        self.assertIn('Nothing changed', output)
+
+    def test_new_migration_file_loads_the_graph(self):
+        self.boot()
+        with mock.patch.object(boot, 'migrations_on_disk', return_value='0' * 64):
+            loads, _ = self.boot()
+        self.assertEqual(loads, 1)
+
+    def test_migration_applied_elsewhere_loads_the_graph(self):
+        self.boot()
+        MigrationRecorder(connection).record_applied('myapp', '9999_applied_by_another_instance')
+        loads, _ = self.boot()
+        self.assertEqual(loads, 1)
+        loads, _ = self.boot()
+        self.assertEqual(loads, 0)
+
+    def test_populate_categories_waits_for_the_snapshot_rebuild(self):
+        snapshot = SharedSnapshot(os.path.join(tempfile.gettempdir(), 'snapshot.bin'))
+        with mock.patch('myapp.management.commands.populate_categories.shared_snapshot', snapshot), \
+                mock.patch.object(snapshot, 'wait', wraps=snapshot.wait) as wait:
+            call_command('populate_categories', stdout=StringIO())
+        wait.assert_called_once_with()
+
+    def test_boot_with_the_snapshot_disabled(self):
+        from .snapshot import _Disabled
+        with mock.patch('myapp.management.commands.populate_categories.shared_snapshot', _Disabled()):
+            call_command('boot', '--force', stdout=StringIO())
+        self.assertTrue(Category.objects.exists())
+
+
+class EventComputedFieldsTests(TestCase):
+    """Spots and status are filtered and ordered in SQL, and the annotations fill the Event properties"""
+
+    def setUp(self):
+        caches['singleflight'].clear()
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        today = date.today()
+        self.open = create_event(self.host, title='Open', max_attendees=10, confirmed_attendees=2)
+        self.nearly_full = create_event(self.host, title='Nearly full', max_attendees=10, confirmed_attendees=9)
+        self.full = create_event(self.host, title='Full', max_attendees=5, confirmed_attendees=5)
+        self.ongoing = create_event(self.host, title='Ongoing', start_date=today - timedelta(days=1), end_date=today + timedelta(days=1))
+        self.past = create_event(self.host, title='Past', start_date=today - timedelta(days=3), end_date=today - timedelta(days=2))
+
+    def titles(self, **params):
+        response = self.client.get('/api/events/', params, **auth_headers(self.host))
+        self.assertEqual(response.status_code, 200)
+        return [event['title'] for event in response.data['results']]
+
+    def test_annotations_fill_the_properties(self):
+        event = Event.objects.with_computed_fields().get(id=self.nearly_full.id)
+        self.assertEqual(event.__dict__['available_spots'][0], 1)
+        self.assertFalse(event.__dict__['is_full'][0])
+        self.assertEqual((event.available_spots, event.is_full), (1, False))
+
+        event = Event.objects.annotate(available_spots=Value(99)).get(id=self.nearly_full.id)
+        self.assertEqual(event.available_spots, 99)
+        # An in-memory change to the fields it came from falls back to computing
+        event.confirmed_attendees = 10
+        self.assertEqual((event.available_spots, event.is_full), (0, True))
+
+    def test_has_spots(self):
+        self.assertCountEqual(self.titles(has_spots='false'), ['Full'])
+        self.assertNotIn('Full', self.titles(has_spots='true'))
+        self.assertEqual(len(self.titles(has_spots='true')), 4)
+
+    def test_status(self):
+        self.assertCountEqual(self.titles(status='upcoming'), ['Open', 'Nearly full', 'Full'])
+        self.assertEqual(self.titles(status='ongoing'), ['Ongoing'])
+        self.assertEqual(self.titles(status='past'), ['Past'])
+
+    def test_ordering_by_available_spots(self):
+        titles = self.titles(ordering='available_spots', status='upcoming')
+        self.assertEqual(titles, ['Full', 'Nearly full', 'Open'])
+        self.assertEqual(self.titles(ordering='-available_spots', status='upcoming'), titles[::-1])
+
+    def test_open_spots_query_uses_the_partial_index(self):
+        queryset = Event.objects.filter(
+            is_active=True, city='Testville', start_date__gte=date.today(), confirmed_attendees__lt=F('max_attendees')
+        )
+        self.assertIn('events_city_open_start_idx', queryset.explain())
+        self.assertCountEqual(queryset.values_list('title', flat=True), ['Open', 'Nearly full'])
+
+
+class EventScheduleDatetimesTests(TestCase):
+    """starts_at and ends_at follow the dates and times on every write path, not just save()"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.day = date.today() + timedelta(days=7)
+
+    def assertSchedule(self, event, starts, ends):
+        event.refresh_from_db()
+        self.assertEqual(event.starts_at, combine_local(*starts))
+        self.assertEqual(event.ends_at, combine_local(*ends))
+
+    def test_bulk_create(self):
+        Event.objects.bulk_create([Event(
+            title='Bulk', description='Test', max_attendees=10,
+            start_date=self.day, end_date=self.day, start_time=time(9, 0), end_time=time(11, 0),
+            street='1 Main St', city='Testville', state='TS', postal_code='00000',
+            organizer_id=self.host, organizer_name=self.host.name, organizer_email=self.host.email,
+        )])
+        self.assertSchedule(Event.objects.get(title='Bulk'), (self.day, time(9, 0)), (self.day, time(11, 0)))
+
+    def test_update_with_values(self):
+        event = create_event(self.host)
+        later = self.day + timedelta(days=1)
+        Event.objects.filter(id=event.id).update(start_date=later, start_time=time(8, 0))
+        self.assertSchedule(event, (later, time(8, 0)), (self.day, time(22, 0)))
+
+    def test_update_of_one_half_reads_the_other_half_per_row(self):
+        first = create_event(self.host)
+        second = create_event(self.host, start_time=time(12, 0))
+        later = self.day + timedelta(days=3)
+        # Filtering on the field being updated: rows no longer match afterwards
+        Event.objects.filter(start_date=self.day).update(start_date=later, end_date=F('end_date') + timedelta(days=3))
+        self.assertSchedule(first, (later, time(18, 0)), (later, time(22, 0)))
+        self.assertSchedule(second, (later, time(12, 0)), (later, time(22, 0)))
+
+    def test_bulk_update(self):
+        event = create_event(self.host)
+        event.end_time = time(23, 30)
+        Event.objects.bulk_update([event], ['end_time'])
+        self.assertSchedule(event, (self.day, time(18, 0)), (self.day, time(23, 30)))
+
+
+class BatchRequestsTests(TestCase):
+    """Malformed batch bodies are rejected with 400, never a 500"""
+
+    def setUp(self):
+        self.user = User.objects.create(name='User', email='user@test.local', password='x')
+        self.headers = auth_headers(self.user)
+
+    def post(self, body):
+        return self.client.post('/api/batch/', body, content_type='application/json', **self.headers)
+
+    def test_malformed_items_are_bad_requests(self):
+        for body in (
+            [{'path': '/api/profile/'}],
+            {'requests': ['/api/profile/']},
+            {'requests': [{'path': 42}]},
+            {'requests': [{'path': '/api/profile/', 'method': 1}]},
+            {'requests': [{'path': '/api/profile/', 'method': ['GET']}]},
+            {'requests': [{'path': '/api/profile/', 'method': 'POST'}]},
+        ):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+    def test_valid_batch_runs_each_sub_request(self):
+        response = self.post({'requests': [
+            {'id': 'profile', 'path': '/api/profile/', 'method': 'get'},
+            {'id': 'nested', 'path': '/api/batch/'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['status'] for item in response.json()['responses']], [200, 400])
+
+
+class BulkConversationStatusTests(TestCase):
+    """Bulk decisions never confirm past capacity and report a result for every item"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.event = create_event(self.host, max_attendees=2)
+        self.conversations = []
+        for index in range(4):
+            attendee = User.objects.create(name=f'Attendee {index}', email=f'attendee{index}@test.local', password='x')
+            self.conversations.append(send_message(self.event.id, attendee, 'Can I join?')[0])
+        self.url = f'/api/conversations/event/{self.event.id}/status/'
+
+    def decide(self, decisions, user=None):
+        return self.client.post(
+            self.url, {'decisions': [{'conversation_id': conversation_id, 'status': new_status}
+                                     for conversation_id, new_status in decisions]},
+            content_type='application/json', **auth_headers(user or self.host),
+        )
+
+    def statuses(self):
+        return list(Conversation.objects.filter(event=self.event).order_by('id').values_list('status', flat=True))
+
+    def test_confirmations_stop_at_capacity(self):
+        first, second, third, fourth = (conversation.id for conversation in self.conversations)
+        response = self.decide([
+            (first, 'confirmed'), (second, 'confirmed'), (third, 'confirmed'),
+            (first, 'rejected'), (fourth, 'maybe'), (999999, 'confirmed'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['result'] for item in response.data['results']], [
+            'updated', 'updated', 'rejected_event_full', 'duplicate', 'invalid_status', 'not_found',
+        ])
+        self.assertEqual(response.data['event']['confirmed_attendees'], 2)
+        self.assertTrue(response.data['event']['is_full'])
+        self.assertEqual(self.statuses(), ['confirmed', 'confirmed', 'pending', 'pending'])
+
+    def test_released_spots_go_to_confirmations_in_the_same_batch(self):
+        first, second, third, _ = (conversation.id for conversation in self.conversations)
+        self.decide([(first, 'confirmed'), (second, 'confirmed')])
+        response = self.decide([(third, 'confirmed'), (first, 'rejected')])
+        self.assertEqual([item['result'] for item in response.data['results']], ['updated', 'updated'])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_attendees, 2)
+        self.assertEqual(self.statuses(), ['rejected', 'confirmed', 'confirmed', 'pending'])
+        stats = EventStats.objects.get(event=self.event)
+        self.assertEqual((stats.pending_count, stats.confirmed_count, stats.rejected_count), (1, 2, 1))
+
+    def test_only_the_organizer_decides(self):
+        response = self.decide([(self.conversations[0].id, 'confirmed')], user=self.conversations[0].user)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.statuses(), ['pending'] * 4)
+
+    def test_malformed_decisions_are_bad_requests(self):
+        first = self.conversations[0].id
+        for decisions in (
+            [(first, ['confirmed'])], [(first, {'status': 'confirmed'})], [(first, 1)], [('first', 'confirmed')],
+        ):
+            self.assertEqual(self.decide(decisions).status_code, 400)
+        for body in ({'decisions': []}, {'decisions': 'all'}, {'decisions': ['confirmed']}):
+            response = self.client.post(self.url, body, content_type='application/json', **auth_headers(self.host))
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses(), ['pending'] * 4)
+
+
+class OrganizerDashboardTests(TestCase):
+    """The incrementally kept event stats always equal a recount from the source rows"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.event = create_event(self.host, max_attendees=4)
+        self.attendees = [
+            User.objects.create(name=f'Attendee {index}', email=f'attendee{index}@test.local', password='x')
+            for index in range(3)
+        ]
+
+    def assertMatchesRecount(self):
+        from .event_stats import compute_event_stats
+        stored = EventStats.objects.filter(event=self.event).values(
+            'pending_count', 'confirmed_count', 'rejected_count', 'message_count', 'review_count', 'rating_sum',
+        ).get()
+        self.assertEqual(stored, compute_event_stats([self.event.id])[self.event.id])
+
+    def test_counters_follow_every_write(self):
+        conversations = [send_message(self.event.id, attendee, 'Can I join?')[0] for attendee in self.attendees]
+        Message.objects.create(conversation=conversations[0], sender=self.host, text='Welcome')
+        send_message(self.event.id, self.attendees[0], 'Thanks')
+        self.assertMatchesRecount()
+
+        headers = auth_headers(self.host)
+        self.client.patch(
+            f'/api/conversations/{conversations[0].id}/status/', {'status': 'confirmed'},
+            content_type='application/json', **headers,
+        )
+        self.client.post(
+            f'/api/conversations/event/{self.event.id}/status/',
+            {'decisions': [{'conversation_id': conversations[1].id, 'status': 'rejected'}]},
+            content_type='application/json', **headers,
+        )
+        Review.objects.create(event=self.event, host=self.host, reviewer=self.attendees[0], rating=5, comment='Great')
+        Review.objects.create(event=self.event, host=self.host, reviewer=self.attendees[1], rating=2, comment='Meh')
+        self.assertMatchesRecount()
+
+        Review.objects.filter(reviewer=self.attendees[1]).delete()
+        conversations[0].messages.order_by('-id').first().delete()
+        Conversation.objects.get(id=conversations[2].id).delete()
+        self.assertMatchesRecount()
+
+        response = self.client.get('/api/organizer/dashboard/', **headers)
+        self.assertEqual(response.status_code, 200)
+        totals = response.data['totals']
+        self.assertEqual(totals['requests'], {'pending': 0, 'confirmed': 1, 'rejected': 1})
+        self.assertEqual(totals['reviews'], {'count': 1, 'average_rating': 5.0})
+        self.assertEqual(totals['fill_rate'], 0.25)
+
+    def test_missing_stats_are_computed_on_first_read(self):
+        send_message(self.event.id, self.attendees[0], 'Can I join?')
+        EventStats.objects.filter(event=self.event).delete()
+        response = self.client.get('/api/organizer/dashboard/', **auth_headers(self.host))
+        self.assertEqual(response.data['events'][0]['requests']['pending'], 1)
+        self.assertEqual(response.data['events'][0]['message_count'], 1)
+        self.assertMatchesRecount()
+
+
+class ReadWatermarkTests(TestCase):
+    """Marking a thread read moves one watermark, whatever the thread length"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.attendee = User.objects.create(name='Attendee', email='attendee@test.local', password='x')
+        self.event = create_event(self.host)
+        self.conversation, _, _ = send_message(self.event.id, self.attendee, 'Can I join?')
+
+    def send(self, sender, count):
+        for index in range(count):
+            Message.objects.create(conversation=self.conversation, sender=sender, text=f'Message {index}')
+
+    def mark_read(self, user):
+        return self.client.post(
+            '/api/messages/mark-read/', {'conversation_id': self.conversation.id},
+            content_type='application/json', **auth_headers(user),
+        )
+
+    def test_statements_do_not_grow_with_the_thread(self):
+        statements = []
+        for count in (5, 50):
+            self.send(self.attendee, count)
+            conversation = Conversation.objects.get(id=self.conversation.id)
+            with CaptureQueriesContext(connection) as queries:
+                mark_read(conversation, self.host)
+            statements.append(len(data_statements(queries)))
+        self.assertEqual(statements[0], statements[1])
+        self.assertLessEqual(statements[0], 4)
+
+    def test_only_the_other_participants_messages_are_marked(self):
+        self.send(self.attendee, 2)
+        self.send(self.host, 1)
+        response = self.mark_read(self.host)
+        self.assertEqual(response.data['marked_count'], 3)
+        self.assertEqual(self.mark_read(self.host).data['marked_count'], 0)
+
+        conversation = Conversation.objects.get(id=self.conversation.id)
+        self.assertEqual(conversation.host_last_read_id, conversation.messages.order_by('-id').first().id)
+        self.assertEqual(conversation.host_unread_count, 0)
+        self.assertEqual(conversation.user_unread_count, 1)
+        messages = list(conversation.messages.order_by('id'))
+        # The host's own message is unread by the attendee; everything the attendee sent is read
+        self.assertEqual([message.is_read for message in messages], [True, True, True, False])
+        self.assertIsNotNone(messages[0].read_at)
+
+    def test_watermark_never_moves_back(self):
+        self.send(self.attendee, 2)
+        stale = Conversation.objects.get(id=self.conversation.id)
+        mark_read(Conversation.objects.get(id=self.conversation.id), self.host)
+        latest = Conversation.objects.get(id=self.conversation.id).host_last_read_id
+        # A second mark computed from an older view of the conversation finds nothing newer to move to
+        Conversation.objects.filter(id=self.conversation.id).update(host_last_read_id=latest + 1000)
+        self.assertEqual(mark_read(stale, self.host), 0)
+        self.assertEqual(Conversation.objects.get(id=self.conversation.id).host_last_read_id, latest + 1000)
+
+    def test_outsiders_cannot_mark_read(self):
+        outsider = User.objects.create(name='Outsider', email='outsider@test.local', password='x')
+        self.assertEqual(self.mark_read(outsider).status_code, 403)
+
+    def test_serialized_thread_reads_no_row_per_message(self):
+        statements = []
+        for count in (2, 20):
+            self.send(self.attendee, count)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'/api/conversations/{self.conversation.id}/', **auth_headers(self.host))
+            self.assertEqual(response.status_code, 200)
+            statements.append(len(queries))
+        self.assertEqual(statements[0], statements[1])
+
+    def test_read_at_is_the_thread_level_time(self):
+        self.send(self.attendee, 2)
+        self.mark_read(self.host)
+        read_at = Conversation.objects.get(id=self.conversation.id).host_read_at
+        self.send(self.attendee, 1)
+        response = self.client.get(f'/api/conversations/{self.conversation.id}/', **auth_headers(self.host))
+        messages = response.data['messages']
+        self.assertEqual([message['is_read'] for message in messages], [True, True, True, False])
+        self.assertEqual({message['read_at'] for message in messages[:3]}, {read_at.isoformat().replace('+00:00', 'Z')})
+        self.assertIsNone(messages[3]['read_at'])
+
+
+class UnreadBadgeTests(TestCase):
+    """The badge is one counter row that always matches a recount from the watermarks"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.attendees = [
+            User.objects.create(name=f'Attendee {index}', email=f'attendee{index}@test.local', password='x')
+            for index in range(2)
+        ]
+        self.events = [create_event(self.host), create_event(self.host, title='Second event')]
+
+    def badge(self, user):
+        response = self.client.get('/api/conversations/unread-count/', **auth_headers(user))
+        self.assertEqual(response.status_code, 200)
+        return response.data['unread_messages'], response.data['unread_threads']
+
+    def assertMatchesRecount(self):
+        from .inbox import rebuild_inbox_counters
+        _, conversations_fixed, counters_fixed = rebuild_inbox_counters()
+        self.assertEqual((conversations_fixed, counters_fixed), (0, 0))
+
+    def test_counters_match_a_recount_after_send_read_and_delete(self):
+        # First read computes the counters
+        self.assertEqual(self.badge(self.host), (0, 0))
+        for attendee in self.attendees:
+            self.badge(attendee)
+
+        first, _, _ = send_message(self.events[0].id, self.attendees[0], 'Can I join?')
+        send_message(self.events[0].id, self.attendees[0], 'Please?')
+        second, _, _ = send_message(self.events[1].id, self.attendees[1], 'Hello')
+        Message.objects.create(conversation=first, sender=self.host, text='Sure')
+        self.assertEqual(self.badge(self.host), (3, 2))
+        self.assertEqual(self.badge(self.attendees[0]), (1, 1))
+        self.assertMatchesRecount()
+
+        mark_read(Conversation.objects.get(id=first.id), self.host)
+        self.assertEqual(self.badge(self.host), (1, 1))
+        self.assertMatchesRecount()
+
+        # Deleting an unread message, then a whole thread
+        second.messages.get().delete()
+        self.assertEqual(self.badge(self.host), (0, 0))
+        Conversation.objects.get(id=first.id).delete()
+        self.assertEqual(self.badge(self.attendees[0]), (0, 0))
+        self.assertMatchesRecount()
+
+    def test_badge_is_a_single_lookup(self):
+        self.badge(self.host)
+        send_message(self.events[0].id, self.attendees[0], 'Can I join?')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.badge(self.host), (1, 1))
+        inbox_queries = [sql for sql in data_statements(queries) if 'inbox_counters' in sql]
+        self.assertEqual(len(inbox_queries), 1)
+
+
+class IdempotencyKeyTests(TestCase):
+    """A retried POST with the same Idempotency-Key replays the first response instead of running again"""
+
+    def setUp(self):
+        caches['idempotency'].clear()
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.attendee = User.objects.create(name='Attendee', email='attendee@test.local', password='x')
+        self.event = create_event(self.host)
+
+    def post(self, user, message, key='retry-1'):
+        return self.client.post(
+            '/api/conversations/', {'event_id': self.event.id, 'message': message},
+            content_type='application/json', HTTP_IDEMPOTENCY_KEY=key, **auth_headers(user),
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post(self.attendee, 'Can I join?')
+        retry = self.post(self.attendee, 'Can I join?')
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        self.assertEqual(Message.objects.filter(conversation__event=self.event).count(), 1)
+
+        # A new key is a new request
+        self.post(self.attendee, 'Can I join?', key='retry-2')
+        self.assertEqual(Message.objects.filter(conversation__event=self.event).count(), 2)
+
+    def test_key_reused_for_another_body_is_rejected(self):
+        self.post(self.attendee, 'Can I join?')
+        response = self.post(self.attendee, 'Something else')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Message.objects.filter(conversation__event=self.event).count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        other = User.objects.create(name='Other', email='other@test.local', password='x')
+        self.post(self.attendee, 'Can I join?')
+        response = self.post(other, 'Can I join?')
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Conversation.objects.filter(event=self.event).count(), 2)
+
+    @override_settings(IDEMPOTENCY={**settings.IDEMPOTENCY, 'WAIT_TIMEOUT': 0})
+    def test_duplicate_of_an_in_flight_request_gets_409(self):
+        from .idempotency import _cache_keys
+        _, lock_key = _cache_keys(self.attendee.id, 'retry-1')
+        with mock.patch('myapp.idempotency.request_fingerprint', return_value='in-flight'):
+            caches['idempotency'].add(lock_key, 'in-flight')
+            response = self.post(self.attendee, 'Can I join?')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Message.objects.exists())
+
+
+class EventFragmentTests(TestCase):
+    """List pages reuse cached per-event fragments but never serve stale or per-viewer data from them"""
+
+    def setUp(self):
+        from .fragments import fragment_cache
+        self.fragments = fragment_cache
+        self.fragments.clear()
+        # Fragments and host ratings come from this process only, not a snapshot another test wrote
+        patcher = mock.patch.object(SharedSnapshot, 'get_many', return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.viewer = User.objects.create(name='Viewer', email='viewer@test.local', password='x')
+        self.events = [create_event(self.host, title=f'Event {index}') for index in range(3)]
+        self.baseline = self.fragments.stats()['misses']
+
+    def list_events(self, user=None, **params):
+        response = self.client.get('/api/events/', params, **auth_headers(user or self.viewer))
+        self.assertEqual(response.status_code, 200)
+        return {event['id']: event for event in response.data['results']}
+
+    def misses(self):
+        return self.fragments.stats()['misses'] - self.baseline
+
+    def test_second_page_load_serializes_nothing(self):
+        first = self.list_events()
+        self.assertEqual(self.misses(), 3)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.list_events()
+        self.assertEqual(self.misses(), 3)
+        self.assertEqual(second, first)
+        self.assertFalse(any('event_images' in query['sql'] for query in queries))
+
+    def test_edited_event_is_serialized_again(self):
+        self.list_events()
+        event = self.events[0]
+        event.title = 'Renamed'
+        event.save()
+        events = self.list_events()
+        self.assertEqual(self.misses(), 4)
+        self.assertEqual(events[event.id]['title'], 'Renamed')
+
+    def test_renamed_category_is_serialized_again(self):
+        category = Category.objects.create(name='Music', icon='note')
+        Event.objects.filter(id__in=[event.id for event in self.events]).update(category=category)
+        self.list_events()
+        category.name = 'Live music'
+        category.save()
+        events = self.list_events()
+        self.assertEqual(self.misses(), 6)
+        self.assertEqual({event['category_details']['name'] for event in events.values()}, {'Live music'})
+
+    def test_host_rating_and_viewer_fields_are_not_cached(self):
+        self.list_events(include_my_status='true')
+        event = self.events[0]
+        send_message(event.id, self.viewer, 'Can I join?')
+        Review.objects.create(event=event, host=self.host, reviewer=self.viewer, rating=4, comment='Good')
+
+        events = self.list_events(include_my_status='true')
+        self.assertEqual(self.misses(), 3)
+        self.assertEqual(events[event.id]['my_request_status'], 'pending')
+        self.assertEqual(events[event.id]['host_total_reviews'], 1)
+        self.assertEqual(events[event.id]['host_average_rating'], 4.0)
+
+        other = User.objects.create(name='Other', email='other@test.local', password='x')
+        self.assertIsNone(self.list_events(other, include_my_status='true')[event.id]['my_request_status'])
+        self.assertNotIn('my_request_status', self.list_events(other)[event.id])
+
+
+class SingleFlightTests(SimpleTestCase):
+    """One caller recomputes an expired payload; the others share its result or get the stale value"""
+
+    def setUp(self):
+        from . import singleflight
+        self.singleflight = singleflight
+        caches['singleflight'].clear()
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def compute(self, value='fresh', block=False):
+        def compute():
+            self.calls += 1
+            self.started.set()
+            if block:
+                self.release.wait(5)
+            return value
+        return compute
+
+    def counted(self, name):
+        return self.singleflight.stats()[name]
+
+    def in_thread(self, target):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(target()))
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        return thread, results
+
+    def wait_for(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail('timed out')
+
+    def test_fresh_value_is_computed_once(self):
+        get = self.singleflight.get_or_compute
+        self.assertEqual(get('fresh-once', self.compute(), version=1), 'fresh')
+        self.assertEqual(get('fresh-once', self.compute(), version=1), 'fresh')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(get('fresh-once', self.compute('edited'), version=2), 'edited')
+        self.assertEqual(self.calls, 2)
+
+    def test_concurrent_misses_share_one_computation(self):
+        get = self.singleflight.get_or_compute
+        coalesced = self.counted('coalesced')
+        leader, leader_result = self.in_thread(lambda: get('coalesce', self.compute(block=True)))
+        self.assertTrue(self.started.wait(5))
+        followers = [self.in_thread(lambda: get('coalesce', self.compute('duplicate'))) for _ in range(4)]
+        self.wait_for(lambda: self.counted('coalesced') - coalesced == 4)
+        self.release.set()
+        for thread, _ in [(leader, leader_result), *followers]:
+            thread.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([leader_result] + [results for _, results in followers], [['fresh']] * 5)
+
+    def test_stale_value_is_served_during_the_recompute(self):
+        get = self.singleflight.get_or_compute
+        get('stale', self.compute('old'), ttl=0)
+        self.started.clear()
+        leader, result = self.in_thread(lambda: get('stale', self.compute('new', block=True)))
+        self.assertTrue(self.started.wait(5))
+        self.assertEqual(get('stale', self.compute('duplicate')), 'old')
+        self.release.set()
+        leader.join(5)
+        self.assertEqual(result, ['new'])
+        self.assertEqual(get('stale', self.compute('duplicate')), 'new')
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(SINGLE_FLIGHT={**settings.SINGLE_FLIGHT, 'WAIT_TIMEOUT': 0.1})
+    def test_recompute_claimed_by_another_worker(self):
+        get = self.singleflight.get_or_compute
+        get('remote', self.compute('old'), ttl=0)
+        lock_key = f'{hashlib.sha1(b"remote").hexdigest()}:lock'
+        caches['singleflight'].add(lock_key, 1)
+        self.assertEqual(get('remote', self.compute('new')), 'old')
+        self.assertEqual(self.calls, 1)
+
+        # Nothing to serve meanwhile: wait for the other worker, then give up and compute
+        timeouts = self.counted('wait_timeouts')
+        caches['singleflight'].add(f'{hashlib.sha1(b"cold").hexdigest()}:lock', 1)
+        self.assertEqual(get('cold', self.compute('computed')), 'computed')
+        self.assertEqual(self.counted('wait_timeouts'), timeouts + 1)
+
+    def test_other_version_is_never_served(self):
+        get = self.singleflight.get_or_compute
+        get('edited', self.compute('old'), version=1)
+        self.started.clear()
+        leader, result = self.in_thread(lambda: get('edited', self.compute('new', block=True), version=2))
+        self.assertTrue(self.started.wait(5))
+        coalesced = self.counted('coalesced')
+        follower, follower_result = self.in_thread(lambda: get('edited', self.compute('duplicate'), version=2))
+        self.wait_for(lambda: self.counted('coalesced') > coalesced)
+        self.assertEqual(follower_result, [])
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(result + follower_result, ['new', 'new'])
+        self.assertEqual(self.calls, 2)
+
+        # Another worker is recomputing version 3: wait for it rather than serve version 2
+        caches['singleflight'].add(f'{hashlib.sha1(b"edited").hexdigest()}:lock', 1)
+        with override_settings(SINGLE_FLIGHT={**settings.SINGLE_FLIGHT, 'WAIT_TIMEOUT': 0.1}):
+            self.assertEqual(get('edited', self.compute('newer'), version=3), 'newer')
+
+    def test_errors_reach_the_caller_and_are_not_stored(self):
+        def broken():
+            raise RuntimeError('database went away')
+
+        with self.assertRaises(RuntimeError):
+            self.singleflight.get_or_compute('broken', broken)
+        self.assertEqual(self.singleflight.get_or_compute('broken', self.compute()), 'fresh')
+        self.assertEqual(self.counted('in_flight'), 0)
+
+
+class EventDetailCacheTests(TestCase):
+    """The cached event detail changes as soon as anything it shows does"""
+
+    def setUp(self):
+        caches['singleflight'].clear()
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.reviewer = User.objects.create(name='Reviewer', email='reviewer@test.local', password='x')
+        self.category = Category.objects.create(name='Music', icon='note')
+        self.event = create_event(self.host, category=self.category)
+
+    def detail(self):
+        response = self.client.get(f'/api/events/{self.event.id}/', **auth_headers(self.reviewer))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cached_until_something_changes(self):
+        first = self.detail()
+        with mock.patch.object(EventViewSet, 'detail_payload') as detail_payload:
+            self.assertEqual(self.detail(), first)
+        detail_payload.assert_not_called()
+
+    def test_new_host_review_is_shown(self):
+        self.assertEqual(self.detail()['host_reviews']['statistics']['total_reviews'], 0)
+        review = Review.objects.create(event=self.event, host=self.host, reviewer=self.reviewer, rating=5, comment='Great')
+        self.assertEqual(self.detail()['host_reviews']['statistics']['total_reviews'], 1)
+        review.rating = 2
+        review.save()
+        self.assertEqual(self.detail()['host_reviews']['statistics']['average_rating'], 2)
+        review.delete()
+        self.assertEqual(self.detail()['host_reviews']['statistics']['total_reviews'], 0)
+
+    def test_category_rename_is_shown(self):
+        self.detail()
+        self.category.name = 'Live music'
+        self.category.save()
+        self.assertEqual(self.detail()['event']['category_details']['name'], 'Live music')
+
+    def test_new_image_is_shown(self):
+        self.assertEqual(self.detail()['event']['image_count'], 0)
+        EventImage.objects.create(event=self.event, image='event_images/poster.png')
+        self.assertEqual(self.detail()['event']['image_count'], 1)
+
+
+class AsyncMessagingTests(TestCase):
+    """The async messaging views answer exactly like their sync counterparts"""
+
+    def setUp(self):
+        from . import async_views
+        self.async_views = async_views
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.attendee = User.objects.create(name='Attendee', email='attendee@test.local', password='x')
+        self.event = create_event(self.host)
+        self.conversation, _, _ = send_message(self.event.id, self.attendee, 'Can I join?')
+        send_message(self.event.id, self.host, 'Sure')
+
+    def call_async(self, view, method, path, user, body=None, **kwargs):
+        factory = AsyncRequestFactory()
+        headers = {'Authorization': auth_headers(user)['HTTP_AUTHORIZATION']}
+        if method == 'post':
+            request = factory.post(path, body, content_type='application/json', headers=headers)
+        else:
+            request = factory.get(path, headers=headers)
+        return async_to_sync(view)(request, **kwargs)
+
+    def call_sync(self, method, path, user, body=None):
+        if method == 'post':
+            return self.client.post(path, body, content_type='application/json', **auth_headers(user))
+        return self.client.get(path, **auth_headers(user))
+
+    def assertSameResponse(self, view, method, path, user, body=None, **kwargs):
+        expected = self.call_sync(method, path, user, body)
+        response = self.call_async(view, method, path, user, body, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+        return response
+
+    def test_get_conversation(self):
+        path = f'/api/conversations/{self.conversation.id}/'
+        response = self.assertSameResponse(
+            self.async_views.get_conversation, 'get', path, self.host, conversation_id=self.conversation.id
+        )
+        self.assertEqual(json.loads(response.content)['conversation']['message_count'], 2)
+
+    def test_get_my_conversations(self):
+        path = '/api/conversations/my-conversations/'
+        for user in (self.host, self.attendee):
+            response = self.assertSameResponse(self.async_views.get_my_conversations, 'get', path, user)
+        conversation = json.loads(response.content)['conversations'][0]
+        self.assertEqual((conversation['message_count'], conversation['unread_count']), (2, 1))
+        self.assertEqual(conversation['last_message']['text'], 'Sure')
+
+    def test_my_conversations_do_not_load_the_threads(self):
+        statements = []
+        for count in (1, 20):
+            for index in range(count):
+                send_message(self.event.id, self.attendee, f'Message {index}')
+            with CaptureQueriesContext(connection) as queries:
+                self.call_async(self.async_views.get_my_conversations, 'get', '/api/conversations/my-conversations/', self.host)
+            statements.append(len(queries))
+        self.assertEqual(statements[0], statements[1])
+
+    def test_create_conversation_and_mark_read(self):
+        # Stateful, so checked against the sync response's values rather than a second sync call
+        response = self.call_async(
+            self.async_views.mark_messages_as_read, 'post', '/api/messages/mark-read/', self.host,
+            {'conversation_id': self.conversation.id},
+        )
+        self.assertEqual(json.loads(response.content), {
+            'success': True, 'message': '1 messages marked as read', 'marked_count': 1
+        })
+        self.assertEqual(self.call_sync(
+            'post', '/api/messages/mark-read/', self.host, {'conversation_id': self.conversation.id}
+        ).json()['marked_count'], 0)
+        response = self.call_async(
+            self.async_views.create_conversation, 'post', '/api/conversations/', self.attendee,
+            {'event_id': self.event.id, 'message': 'Thanks'},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)['message_count'], 3)
+
+    def test_malformed_json_is_a_bad_request(self):
+        for view, path in (
+            (self.async_views.create_conversation, '/api/conversations/'),
+            (self.async_views.mark_messages_as_read, '/api/messages/mark-read/'),
+        ):
+            self.assertEqual(self.call_sync('post', path, self.host, '{"event_id": ').status_code, 400)
+            self.assertEqual(self.call_async(view, 'post', path, self.host, '{"event_id": ').status_code, 400)
+
+
+@override_settings(JWT_STATELESS_AUTH=True)
+class StatelessAuthTests(TestCase):
+    """Users built from token claims never outlive a revocation, a profile edit or a forged claim"""
+
+    def setUp(self):
+        from .passwords import hash_password
+        self.user = User.objects.create(name='Ann', email='ann@test.local', password=hash_password('secret1'))
+        self.headers = auth_headers(self.user)
+
+    def profile(self, headers):
+        return self.client.get('/api/profile/', **headers)
+
+    def shared_cache(self):
+        return override_settings(CACHES={
+            **settings.CACHES, 'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth'},
+        })
+
+    def test_claims_are_used(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/conversations/unread-count/', **self.headers).status_code, 200)
+        # Only the version check reads the users table
+        self.assertEqual(len([query for query in queries if 'FROM "users"' in query['sql']]), 1)
+
+    def test_password_change_revokes_tokens(self):
+        response = self.client.post(
+            '/api/profile/change-password/', {'current_password': 'secret1', 'new_password': 'secret2'},
+            content_type='application/json', **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile(self.headers).status_code, 401)
+        self.assertEqual(self.profile({'HTTP_AUTHORIZATION': f'Bearer {response.data["tokens"]["access"]}'}).status_code, 200)
+
+    def test_profile_update_revokes_tokens_with_the_old_claims(self):
+        response = self.client.patch(
+            '/api/profile/update/', {'name': 'Anne'}, content_type='application/json', **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile(self.headers).status_code, 401)
+        fresh = {'HTTP_AUTHORIZATION': f'Bearer {response.data["tokens"]["access"]}'}
+        self.assertEqual(self.profile(fresh).data['user']['name'], 'Anne')
+
+    def test_tampered_claims_are_rejected(self):
+        header, payload, signature = self.headers['HTTP_AUTHORIZATION'].split()[1].split('.')
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        claims['email'] = 'admin@test.local'
+        forged = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b'=').decode()
+        self.assertEqual(self.profile({'HTTP_AUTHORIZATION': f'Bearer {header}.{forged}.{signature}'}).status_code, 401)
+
+    def test_stale_version_is_rejected_by_every_worker(self):
+        self.assertEqual(self.profile(self.headers).status_code, 200)
+        # No shared cache: the version is read from the database, so a write anywhere is seen at once
+        User.objects.filter(id=self.user.id).update(token_version=5)
+        self.assertEqual(self.profile(self.headers).status_code, 401)
+
+    def test_shared_cache_is_dropped_on_revocation(self):
+        def version_reads(headers, expected_status):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.profile(headers).status_code, expected_status)
+            return len([query for query in queries if 'token_version' in query['sql']])
+
+        with self.shared_cache():
+            caches['auth'].clear()
+            self.assertEqual(version_reads(self.headers, 200), 1)
+            self.assertEqual(version_reads(self.headers, 200), 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.token_version += 1
+                self.user.save(update_fields=['token_version'])
+            self.assertEqual(self.profile(self.headers).status_code, 401)
+
+            fresh = auth_headers(self.user)
+            self.assertEqual(self.profile(fresh).status_code, 200)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.delete()
+            self.assertEqual(self.profile(fresh).status_code, 401)
+
+
+class EventConversationsPaginationTests(TestCase):
+    """The host's attendee list pages on (created_at, id), so activity while paging moves nothing"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.event = create_event(self.host)
+        self.conversations = []
+        for index in range(7):
+            attendee = User.objects.create(name=f'Attendee {index}', email=f'attendee{index}@test.local', password='x')
+            self.conversations.append(send_message(self.event.id, attendee, 'Can I join?')[0])
+
+    def page(self, **params):
+        response = self.client.get(f'/api/conversations/event/{self.event.id}/', params, **auth_headers(self.host))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def walk(self, on_page=None, **params):
+        seen, cursor = [], None
+        while True:
+            data = self.page(limit=3, **({'cursor': cursor} if cursor else {}), **params)
+            seen.extend(conversation['conversation_id'] for conversation in data['conversations'])
+            if on_page:
+                on_page(len(seen))
+            cursor = data['pagination']['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_cursor_round_trip_returns_every_conversation_once(self):
+        newest_first = [conversation.id for conversation in reversed(self.conversations)]
+        self.assertEqual(self.walk(), newest_first)
+
+    def test_activity_while_paging_skips_and_repeats_nothing(self):
+        def touch(seen):
+            # New activity on a conversation not reached yet and on one already returned
+            for conversation in (self.conversations[0], self.conversations[-1]):
+                Conversation.objects.filter(id=conversation.id).update(updated_at=timezone.now())
+
+        seen = self.walk(on_page=touch)
+        self.assertEqual(seen, [conversation.id for conversation in reversed(self.conversations)])
+
+    def test_cursor_with_status_filter(self):
+        Conversation.objects.filter(id__in=[conversation.id for conversation in self.conversations[:4]]).update(status='confirmed')
+        self.assertEqual(self.walk(status='confirmed'), [conversation.id for conversation in reversed(self.conversations[:4])])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            f'/api/conversations/event/{self.event.id}/', {'cursor': 'not-a-cursor'}, **auth_headers(self.host)
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class PasswordHashingTests(TransactionTestCase):
+    """New hashes use the configured hasher; outdated ones are upgraded after a successful login"""
+
+    def setUp(self):
+        from . import passwords
+        self.passwords = passwords
+
+    def login(self, password):
+        return self.client.post(
+            '/api/token/', {'email': 'ann@test.local', 'password': password}, content_type='application/json'
+        )
+
+    def stored_after_login(self, encoded, password='secret1'):
+        user = User.objects.create(name='Ann', email='ann@test.local', password=encoded)
+        response = self.login(password)
+        # The rehash runs on the single background thread; wait for everything queued before this
+        self.passwords._get_rehash_executor().submit(lambda: None).result(5)
+        return response, User.objects.get(id=user.id).password
+
+    def test_configured_hasher_is_used(self):
+        from .hashers import TunedPBKDF2PasswordHasher
+        self.assertTrue(self.passwords.hash_password('secret1').startswith(
+            f'pbkdf2_sha256${TunedPBKDF2PasswordHasher.iterations}$'
+        ))
+        with override_settings(PASSWORD_HASHERS=['myapp.hashers.TunedScryptPasswordHasher', *settings.PASSWORD_HASHERS]):
+            encoded = self.passwords.hash_password('secret1')
+            self.assertTrue(encoded.startswith('scrypt$'))
+            self.assertTrue(check_password('secret1', encoded))
+
+    def test_other_algorithm_is_upgraded_on_login(self):
+        response, stored = self.stored_after_login(make_password('secret1', hasher='pbkdf2_sha1'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(stored.startswith('pbkdf2_sha256$'))
+        self.assertTrue(check_password('secret1', stored))
+
+    def test_old_parameters_are_upgraded_on_login(self):
+        from .hashers import TunedPBKDF2PasswordHasher
+        hasher = TunedPBKDF2PasswordHasher()
+        response, stored = self.stored_after_login(hasher.encode('secret1', hasher.salt(), iterations=1000))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(stored.startswith(f'pbkdf2_sha256${hasher.iterations}$'))
+
+    def test_failed_login_leaves_the_hash_alone(self):
+        encoded = make_password('secret1', hasher='pbkdf2_sha1')
+        response, stored = self.stored_after_login(encoded, password='wrong')
+        self.assertNotEqual(response.status_code, 200)
+        self.assertEqual(stored, encoded)
+
+
+class EventFacetsTests(TestCase):
+    """Facet counts equal plain per-value ORM counts of the filtered events, and follow edits"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        music = Category.objects.create(name='Music')
+        sport = Category.objects.create(name='Sport')
+        today = date.today()
+        for offset, length, category, city, state, full in (
+            (-4, 1, music, 'Austin', 'TX', False), (-1, 2, music, 'Austin', 'TX', True),
+            (3, 0, sport, 'Austin', 'TX', False), (6, 0, None, 'Dallas', 'TX', False),
+            (12, 1, sport, 'Denver', 'CO', True), (45, 0, music, 'Denver', 'CO', False),
+        ):
+            create_event(
+                self.host, category=category, city=city, state=state,
+                start_date=today + timedelta(days=offset), end_date=today + timedelta(days=offset + length),
+                max_attendees=2, confirmed_attendees=2 if full else 0,
+            )
+        create_event(self.host, category=music, city='Austin', is_active=False)
+
+    def facets(self, **params):
+        response = self.client.get('/api/events/facets/', params, **auth_headers(self.host))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def expected(self, queryset):
+        today = date.today()
+
+        def counts(field):
+            return {row[field]: row['count'] for row in queryset.order_by().values(field).annotate(count=Count('id'))}
+
+        buckets = dict.fromkeys(['past', 'ongoing', 'this_week', 'this_month', 'later'], 0)
+        for start_date, end_date in queryset.values_list('start_date', 'end_date'):
+            if end_date < today:
+                buckets['past'] += 1
+            elif start_date <= today:
+                buckets['ongoing'] += 1
+            elif start_date <= today + timedelta(days=7):
+                buckets['this_week'] += 1
+            elif start_date <= today + timedelta(days=30):
+                buckets['this_month'] += 1
+            else:
+                buckets['later'] += 1
+        return queryset.count(), counts('category'), counts('city'), counts('state'), buckets
+
+    def actual(self, facets):
+        return (
+            facets['total'],
+            {item['id']: item['count'] for item in facets['category']},
+            {item['value']: item['count'] for item in facets['city']},
+            {item['value']: item['count'] for item in facets['state']},
+            {item['value']: item['count'] for item in facets['date']},
+        )
+
+    def test_counts_match_the_orm(self):
+        active = Event.objects.filter(is_active=True)
+        self.assertEqual(self.actual(self.facets()['facets']), self.expected(active))
+        self.assertEqual(self.actual(self.facets(state='TX')['facets']), self.expected(active.filter(state='TX')))
+        self.assertEqual(
+            self.actual(self.facets(has_spots='true')['facets']),
+            self.expected(active.filter(confirmed_attendees__lt=F('max_attendees'))),
+        )
+
+    def test_cached_until_an_event_changes(self):
+        self.assertFalse(self.facets()['cached'])
+        self.assertTrue(self.facets()['cached'])
+        event = Event.objects.filter(city='Dallas').get()
+        with self.captureOnCommitCallbacks(execute=True):
+            event.city = 'Austin'
+            event.save()
+        data = self.facets()
+        self.assertFalse(data['cached'])
+        self.assertEqual(self.actual(data['facets']), self.expected(Event.objects.filter(is_active=True)))
+
+
+class ViewerFieldsTests(TestCase):
+    """my_request_status/my_review_id are the viewer's own, from subqueries, and only on request"""
+
+    def setUp(self):
+        caches['singleflight'].clear()
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.viewer = User.objects.create(name='Viewer', email='viewer@test.local', password='x')
+        self.other = User.objects.create(name='Other', email='other@test.local', password='x')
+        self.events = [create_event(self.host, title=f'Event {index}') for index in range(4)]
+        send_message(self.events[0].id, self.viewer, 'Can I join?')
+        confirmed, _, _ = send_message(self.events[1].id, self.viewer, 'Can I join?')
+        confirmed.status = 'confirmed'
+        confirmed.save()
+        Review.objects.create(event=self.events[1], host=self.host, reviewer=self.viewer, rating=5, comment='Great')
+        send_message(self.events[2].id, self.other, 'Can I join?')
+        Review.objects.create(event=self.events[2], host=self.host, reviewer=self.other, rating=3, comment='Fine')
+
+    def list_events(self, user, path='/api/events/', **params):
+        response = self.client.get(path, params, **(auth_headers(user) if user else {}))
+        return response
+
+    def expected(self, user):
+        return {
+            event.id: (
+                Conversation.objects.filter(event=event, user=user).values_list('status', flat=True).first(),
+                Review.objects.filter(event=event, reviewer=user).values_list('id', flat=True).first(),
+            )
+            for event in self.events
+        }
+
+    def viewer_fields(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {event['id']: (event['my_request_status'], event['my_review_id']) for event in response.data['results']}
+
+    def test_anonymous_requests_get_no_viewer_fields(self):
+        self.assertEqual(self.list_events(None, include_my_status='true').status_code, 401)
+        # Should the list ever allow anonymous reads, there is no viewer to annotate for
+        view = EventViewSet(request=mock.Mock(query_params={'include_my_status': 'true'}, user=AnonymousUser()))
+        self.assertFalse(view.include_my_status())
+
+    def test_fields_are_only_included_on_request(self):
+        for event in self.list_events(self.viewer).data['results']:
+            self.assertNotIn('my_request_status', event)
+            self.assertNotIn('my_review_id', event)
+
+    def test_fields_match_the_orm_for_each_viewer(self):
+        for user in (self.viewer, self.other, self.host):
+            for path in ('/api/events/', '/api/events/upcoming/'):
+                self.assertEqual(
+                    self.viewer_fields(self.list_events(user, path, include_my_status='true')), self.expected(user)
+                )
+
+    def test_statements_do_not_grow_with_the_page(self):
+        statements = []
+        for count in (0, 10):
+            for index in range(count):
+                create_event(self.host, title=f'Extra {index}')
+            self.list_events(self.viewer, include_my_status='true')  # Fragments of the new events
+            with CaptureQueriesContext(connection) as queries:
+                self.viewer_fields(self.list_events(self.viewer, include_my_status='true'))
+            statements.append(len(queries))
+        self.assertEqual(statements[0], statements[1])
+
+
+class ReviewEligibilityBatchTests(TestCase):
+    """The batch endpoint answers every event like check_can_review, in three queries"""
+
+    def setUp(self):
+        self.host = User.objects.create(name='Host', email='host@test.local', password='x')
+        self.viewer = User.objects.create(name='Viewer', email='viewer@test.local', password='x')
+        self.own = create_event(self.viewer, title='Own')
+        self.reviewed, self.attended, self.open = (create_event(self.host, title=title) for title in ('Reviewed', 'Attended', 'Open'))
+        conversation, _, _ = send_message(self.attended.id, self.viewer, 'Can I join?')
+        conversation.status = 'confirmed'
+        conversation.save()
+        self.review = Review.objects.create(event=self.reviewed, host=self.host, reviewer=self.viewer, rating=4, comment='Good')
+
+    def batch(self, event_ids):
+        return self.client.post(
+            '/api/reviews/can-review/', {'event_ids': event_ids}, content_type='application/json', **auth_headers(self.viewer)
+        )
+
+    def test_results_match_the_single_event_check(self):
+        event_ids = [self.open.id, self.reviewed.id, self.own.id, self.attended.id, 999999, self.open.id]
+        # Authentication, then organizers, reviews and confirmed requests
+        with self.assertNumQueries(4):
+            response = self.batch(event_ids)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([result['event_id'] for result in results], list(dict.fromkeys(event_ids)))
+
+        for result in results:
+            single = self.client.get(f'/api/reviews/can-review/{result["event_id"]}/', **auth_headers(self.viewer))
+            if single.status_code == 404:
+                self.assertEqual((result['can_review'], result['reason']), (False, 'Event not found'))
+                continue
+            self.assertEqual((result['can_review'], result['reason']), (single.data['can_review'], single.data['reason']))
+            self.assertEqual(result['existing_review_id'], single.data.get('existing_review', {}).get('id'))
+            if 'has_attended' in single.data:
+                self.assertEqual(result['has_attended'], single.data['has_attended'])
+        self.assertEqual({result['event_id']: result['has_attended'] for result in results}[self.attended.id], True)
+
+    def test_bad_requests(self):
+        for event_ids in ([], 'all', ['one'], [[1]], list(range(101))):
+            self.assertEqual(self.batch(event_ids).status_code, 400)
@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 
+# Messaging endpoints: native async views when served over ASGI (ASYNC_MESSAGING=True)
+if settings.ASYNC_MESSAGING:
+    from . import async_views as messaging_views
+else:
+    messaging_views = views
+
 # Create router for EventViewSet
 router = DefaultRouter()
 router.register(r'events', views.EventViewSet, basename='event')
@@ -24,15 +31,17 @@ urlpatterns = [
     path('login/', views.login_user, name='login_user'),
     
     # Conversation endpoints (Active - Used by Frontend)
-    path('conversations/', views.create_conversation, name='create_conversation'),  # Create conversation & send messages
-    path('conversations/my-conversations/', views.get_my_conversations, name='get_my_conversations'),  # Get user's inbox
-    path('conversations/<int:conversation_id>/', views.get_conversation, name='get_conversation'),  # Get conversation with messages
+    path('conversations/', messaging_views.create_conversation, name='create_conversation'),  # Create conversation & send messages
+    path('conversations/my-conversations/', messaging_views.get_my_conversations, name='get_my_conversations'),  # Get user's inbox
+    path('conversations/unread-count/', views.get_unread_count, name='get_unread_count'),  # Unread badge totals
+    path('conversations/<int:conversation_id>/', messaging_views.get_conversation, name='get_conversation'),  # Get conversation with messages
     path('conversations/event/<int:event_id>/my-conversation/', views.get_conversation_by_event, name='get_conversation_by_event'),  # Check my conversation for event
     path('conversations/event/<int:event_id>/', views.get_event_conversations, name='get_event_conversations'),  # Get event attendees (host only)
     path('conversations/<int:conversation_id>/status/', views.update_conversation_status, name='update_conversation_status'),  # Confirm/reject attendee
+    path('conversations/event/<int:event_id>/status/', views.bulk_update_conversation_status, name='bulk_update_conversation_status'),  # Confirm/reject several attendees
     
     # Message endpoints (Active - Used by Frontend)
-    path('messages/mark-read/', views.mark_messages_as_read, name='mark_messages_as_read'),  # Mark messages as read
+    path('messages/mark-read/', messaging_views.mark_messages_as_read, name='mark_messages_as_read'),  # Mark messages as read
     
     # Review endpoints
     path('reviews/', views.create_review, name='create_review'),  # Create a review
@@ -44,6 +53,16 @@ urlpatterns = [
     path('reviews/host/<int:host_id>/', views.get_host_reviews, name='get_host_reviews'),  # Get host reviews
     path('reviews/host/<int:host_id>/stats/', views.get_host_rating_stats, name='get_host_rating_stats'),  # Get host stats
     path('reviews/can-review/<int:event_id>/', views.check_can_review, name='check_can_review'),  # Check if user can review
+    path('reviews/can-review/', views.check_can_review_batch, name='check_can_review_batch'),  # Check several events at once
+    
+    # Organizer dashboard
+    path('organizer/dashboard/', views.get_organizer_dashboard, name='get_organizer_dashboard'),
+    
+    # Runtime metrics (connection pool, caches)
+    path('metrics/', views.get_metrics, name='get_metrics'),
+    
+    # Several GET requests in one round trip
+    path('batch/', views.batch_requests, name='batch_requests'),
     
     # Event endpoints
     path('', include(router.urls)),
@@ -3,19 +3,35 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.filters import SearchFilter, OrderingFilter
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, F, Avg, Count, Max, OuterRef, Subquery
+from django.db.models.functions import Greatest
 from django.utils import timezone
-from django.contrib.auth.hashers import make_password, check_password
-from datetime import date
+from datetime import date, timedelta
+import os
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
 from .serializers import UserSerializer, LoginSerializer, EventSerializer, EventCreateSerializer, EventListSerializer, EventImageUploadSerializer, ConversationCreateSerializer, ConversationSerializer, MessageSerializer, ConversationStatusUpdateSerializer, CategorySerializer, ReviewSerializer, ReviewCreateSerializer, ReviewUpdateSerializer, HostRatingSerializer, EventRatingSerializer
-from .models import User, Event, EventImage, Conversation, Message, Category, Review
-from .jwt_utils import get_tokens_for_user
+from .models import User, Event, EventImage, Conversation, Message, Category, Review, EventStats, start_of_day
+from .jwt_utils import get_tokens_for_user, add_user_claims
+from .passwords import hash_password, check_user_password
+from .pagination import paginate_keyset, InvalidCursor
+from .calendar_index import get_events_by_day
+from .facets import get_facets, get_events_version, bump_events_version
+from .event_stats import adjust_event_stats, rebuild_event_stats, status_deltas
+from .inbox import get_inbox_counter, mark_read, send_message
+from .idempotency import idempotent
+from .batch import dispatch_get, InvalidSubRequest, validate_sub_request
+from .fragments import assemble_events, fragment_rows
+from .singleflight import get_or_compute
+from .snapshot import CATEGORIES_KEY, shared_snapshot
+from backend_api import metrics
 
 @api_view(['POST'])
 @permission_classes([AllowAny])  # Allow signup without authentication
@@ -33,7 +49,7 @@ def create_user(request):
         # Hash the password before saving
         data = request.data.copy()
         if 'password' in data:
-            data['password'] = make_password(data['password'])
+            data['password'] = hash_password(data['password'])
         
         serializer = UserSerializer(data=data)
         if serializer.is_valid():
@@ -117,8 +133,8 @@ def login_user(request):
                 'message': 'Invalid email or password'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        # VALIDATE PASSWORD - Check if password matches (with hashing support)
-        if not check_password(password, user.password):
+        # VALIDATE PASSWORD - Check if password matches (outdated hashes are upgraded in the background)
+        if not check_user_password(user, password):
             return Response({
                 'success': False,
                 'message': 'Invalid email or password'
@@ -181,9 +197,18 @@ def refresh_token(request):
         # Validate and refresh the token
         try:
             refresh = RefreshToken(refresh_token)
+            access = refresh.access_token
+            
+            # Tokens carrying profile claims get them re-read, and are rejected once revoked
+            if 'ver' in refresh:
+                user = User.objects.get(id=refresh['user_id'])
+                if refresh['ver'] != user.token_version:
+                    raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+                add_user_claims(access, user)
+            
             return Response({
                 'success': True,
-                'access': str(refresh.access_token)
+                'access': str(access)
             }, status=status.HTTP_200_OK)
         except Exception as token_error:
             return Response({
@@ -255,9 +280,13 @@ def update_my_profile(request):
         name = request.data.get('name')
         email = request.data.get('email')
         
+        # Only write the fields that change (request.user may be built from token claims)
+        update_fields = []
+        
         # Update name if provided
         if name:
             user.name = name
+            update_fields.append('name')
         
         # Update email if provided and not already taken
         if email and email != user.email:
@@ -268,8 +297,13 @@ def update_my_profile(request):
                     'message': 'Email already in use by another account'
                 }, status=status.HTTP_400_BAD_REQUEST)
             user.email = email
+            update_fields.append('email')
         
-        user.save()
+        if update_fields:
+            # Name and email are token claims: revoke the tokens carrying the old ones
+            user.token_version += 1
+            update_fields.append('token_version')
+        user.save(update_fields=update_fields)
         
         return Response({
             'success': True,
@@ -279,7 +313,8 @@ def update_my_profile(request):
                 'name': user.name,
                 'email': user.email,
                 'created_at': user.created_at
-            }
+            },
+            'tokens': get_tokens_for_user(User.objects.get(id=user.id))  # Fresh claims; the old tokens are revoked
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -319,7 +354,7 @@ def change_password(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Verify current password
-        if not check_password(current_password, user.password):
+        if not check_user_password(user, current_password):
             return Response({
                 'success': False,
                 'message': 'Current password is incorrect'
@@ -332,13 +367,15 @@ def change_password(request):
                 'message': 'New password must be at least 6 characters long'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update password
-        user.password = make_password(new_password)
-        user.save()
+        # Update password and revoke every token issued before the change
+        user.password = hash_password(new_password)
+        user.token_version += 1
+        user.save(update_fields=['password', 'token_version'])
         
         return Response({
             'success': True,
-            'message': 'Password changed successfully'
+            'message': 'Password changed successfully',
+            'tokens': get_tokens_for_user(User.objects.get(id=user.id))
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -360,13 +397,15 @@ def get_categories(request):
     Authentication required: No
     """
     try:
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
+        # Shared snapshot first (snapshot.py), the query cache when it has no categories yet
+        categories = shared_snapshot.get(CATEGORIES_KEY)
+        if categories is None:
+            categories = CategorySerializer(Category.objects.cached(), many=True).data
         
         return Response({
             'success': True,
-            'count': categories.count(),
-            'categories': serializer.data
+            'count': len(categories),
+            'categories': categories
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -377,6 +416,194 @@ def get_categories(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])  # Staff only: pool sizes and cache stats are operational details
+def get_metrics(request):
+    """
+    Runtime metrics of this worker process (connection pool, caches)
+    GET /api/metrics/
+    
+    Authentication required: Yes (staff users only, User.is_staff)
+    """
+    try:
+        return Response({
+            'success': True,
+            'pid': os.getpid(),
+            'metrics': metrics.snapshot()
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'An error occurred while collecting metrics',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# Most sub-requests accepted by one batch_requests call
+BATCH_LIMIT = 20
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@csrf_exempt
+def batch_requests(request):
+    """
+    Run several GET API requests in one round trip (app startup)
+    POST /api/batch/
+    Body: { "requests": [{ "id": "profile", "path": "/api/profile/" },
+                         { "id": "upcoming", "path": "/api/events/upcoming/?page_size=10" }] }
+    Returns one result per sub-request, in request order:
+    { "id": "profile", "path": "/api/profile/", "status": 200, "body": {...} }
+    
+    Sub-requests run in this process as the authenticated user (authentication
+    runs once for the whole batch); a failing sub-request only fails its own item
+    Authentication required: Yes
+    """
+    try:
+        sub_requests = request.data.get('requests') if isinstance(request.data, dict) else None
+        
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return Response({
+                'success': False,
+                'message': 'requests must be a non-empty list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(sub_requests) > BATCH_LIMIT:
+            return Response({
+                'success': False,
+                'message': f'At most {BATCH_LIMIT} requests per batch'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            for item in sub_requests:
+                validate_sub_request(item)
+        except InvalidSubRequest as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = []
+        for item in sub_requests:
+            try:
+                item_status, body = dispatch_get(request, item['path'])
+            except InvalidSubRequest as e:
+                item_status, body = status.HTTP_400_BAD_REQUEST, {'success': False, 'message': str(e)}
+            except Exception as e:
+                item_status, body = status.HTTP_500_INTERNAL_SERVER_ERROR, {
+                    'success': False,
+                    'message': 'An error occurred while processing this request',
+                    'error': str(e)
+                }
+            results.append({
+                'id': item.get('id'),
+                'path': item['path'],
+                'status': item_status,
+                'body': body
+            })
+        
+        return Response({
+            'success': True,
+            'responses': results
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'An error occurred while processing the batch',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_organizer_dashboard(request):
+    """
+    Get request, review and message totals for every event the user organizes
+    GET /api/organizer/dashboard/
+    
+    Served from the incrementally maintained EventStats rows
+    Authentication required: Yes
+    """
+    try:
+        user = request.user
+        
+        events = Event.objects.filter(organizer_id=user.id).select_related('stats').order_by('-start_date', '-id')
+        events = list(events)
+        
+        # Events created before stats existed (or by bulk imports) get theirs computed once
+        missing = [event.id for event in events if not hasattr(event, 'stats')]
+        if missing:
+            rebuild_event_stats(missing)
+            stats_by_event = EventStats.objects.in_bulk(missing)
+            for event in events:
+                if event.id in stats_by_event:
+                    event.stats = stats_by_event[event.id]
+        
+        totals = {
+            'events': len(events),
+            'pending': 0, 'confirmed': 0, 'rejected': 0,
+            'capacity': 0, 'messages': 0, 'reviews': 0, 'rating_sum': 0
+        }
+        events_data = []
+        for event in events:
+            stats = event.stats
+            totals['pending'] += stats.pending_count
+            totals['confirmed'] += stats.confirmed_count
+            totals['rejected'] += stats.rejected_count
+            totals['capacity'] += event.max_attendees
+            totals['messages'] += stats.message_count
+            totals['reviews'] += stats.review_count
+            totals['rating_sum'] += stats.rating_sum
+            
+            events_data.append({
+                'id': event.id,
+                'title': event.title,
+                'start_date': event.start_date,
+                'end_date': event.end_date,
+                'is_active': event.is_active,
+                'max_attendees': event.max_attendees,
+                'requests': {
+                    'pending': stats.pending_count,
+                    'confirmed': stats.confirmed_count,
+                    'rejected': stats.rejected_count
+                },
+                'fill_rate': round(stats.confirmed_count / event.max_attendees, 4) if event.max_attendees else 0,
+                'reviews': {
+                    'count': stats.review_count,
+                    'average_rating': stats.average_rating
+                },
+                'message_count': stats.message_count
+            })
+        
+        return Response({
+            'success': True,
+            'totals': {
+                'events': totals['events'],
+                'requests': {
+                    'pending': totals['pending'],
+                    'confirmed': totals['confirmed'],
+                    'rejected': totals['rejected']
+                },
+                'fill_rate': round(totals['confirmed'] / totals['capacity'], 4) if totals['capacity'] else 0,
+                'reviews': {
+                    'count': totals['reviews'],
+                    'average_rating': round(totals['rating_sum'] / totals['reviews'], 2) if totals['reviews'] else 0
+                },
+                'message_count': totals['messages']
+            },
+            'events': events_data
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'An error occurred while fetching the organizer dashboard',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class EventViewSet(ModelViewSet):
     """
     ViewSet for Event CRUD operations with filtering and search capabilities
@@ -390,7 +617,7 @@ class EventViewSet(ModelViewSet):
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['city', 'state', 'category', 'organizer_id', 'is_active']  # start_date and end_date handled in get_queryset()
     search_fields = ['title', 'description', 'city', 'state', 'category__name']
-    ordering_fields = ['created_at', 'start_date', 'end_date', 'title', 'max_attendees']
+    ordering_fields = ['created_at', 'start_date', 'end_date', 'title', 'max_attendees', 'confirmed_attendees', 'available_spots', 'starts_at', 'ends_at']
     ordering = ['-created_at']
     
     def get_permissions(self):
@@ -415,11 +642,25 @@ class EventViewSet(ModelViewSet):
             return EventListSerializer
         return EventSerializer
     
+    def include_my_status(self):
+        """
+        Whether list responses include the viewer's my_request_status and my_review_id
+        (?include_my_status=true)
+        """
+        value = self.request.query_params.get('include_my_status', '')
+        return value.lower() == 'true' and self.request.user.is_authenticated
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_my_status'] = self.include_my_status()
+        return context
+    
     def get_queryset(self):
         """
         Filter queryset based on query parameters
         """
-        queryset = Event.objects.select_related('organizer_id').prefetch_related('images')
+        today = date.today()
+        queryset = Event.objects.select_related('organizer_id', 'category').prefetch_related('images').with_computed_fields(today)
         
         # Filter by date range
         start_date = self.request.query_params.get('start_date')
@@ -441,41 +682,74 @@ class EventViewSet(ModelViewSet):
         # Filter by upcoming events
         upcoming = self.request.query_params.get('upcoming')
         if upcoming and upcoming.lower() == 'true':
-            today = date.today()
             queryset = queryset.filter(start_date__gte=today)
         
         # Filter by past events
         past = self.request.query_params.get('past')
         if past and past.lower() == 'true':
-            today = date.today()
             queryset = queryset.filter(end_date__lt=today)
         
+        # Filter by status: upcoming (starts today or later), ongoing (today is within its dates) or past
+        event_status = self.request.query_params.get('status')
+        if event_status == 'upcoming':
+            queryset = queryset.filter(start_date__gte=today)
+        elif event_status == 'ongoing':
+            queryset = queryset.filter(start_date__lte=today, end_date__gte=today)
+        elif event_status == 'past':
+            queryset = queryset.filter(end_date__lt=today)
+        
+        # Filter by free spots; compares the columns directly so the open-spots index applies
+        has_spots = self.request.query_params.get('has_spots')
+        if has_spots and has_spots.lower() == 'true':
+            queryset = queryset.filter(confirmed_attendees__lt=F('max_attendees'))
+        elif has_spots and has_spots.lower() == 'false':
+            queryset = queryset.filter(confirmed_attendees__gte=F('max_attendees'))
+        
         # Filter by active events only (default)
         active_only = self.request.query_params.get('active_only', 'true')
         if active_only.lower() == 'true':
             queryset = queryset.filter(is_active=True)
         
+        # Viewer's request status and review for every event on the page, as two subqueries
+        # (replaces a get_conversation_by_event + check_can_review call per card)
+        if self.include_my_status():
+            user = self.request.user
+            queryset = queryset.annotate(
+                my_request_status=Subquery(
+                    Conversation.objects.filter(event=OuterRef('pk'), user=user).values('status')[:1]
+                ),
+                my_review_id=Subquery(
+                    Review.objects.filter(event=OuterRef('pk'), reviewer=user).values('id')[:1]
+                ),
+            )
+        
         return queryset
     
+    def event_list_response(self, queryset):
+        """
+        Paginated EventListSerializer output for a filtered queryset, assembled from
+        cached per-event fragments (only the page's ids are read from the queryset)
+        """
+        include_my_status = self.include_my_status()
+        rows = fragment_rows(queryset, include_my_status)
+        
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(assemble_events(page, self.request, date.today(), include_my_status))
+        
+        return Response({
+            'success': True,
+            'count': queryset.count(),
+            'results': assemble_events(rows, self.request, date.today(), include_my_status)
+        }, status=status.HTTP_200_OK)
+    
     def list(self, request, *args, **kwargs):
         """
         List events with enhanced filtering
         """
         try:
             queryset = self.filter_queryset(self.get_queryset())
-            
-            # Pagination
-            page = self.paginate_queryset(queryset)
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-            
-            serializer = self.get_serializer(queryset, many=True)
-            return Response({
-                'success': True,
-                'count': queryset.count(),
-                'results': serializer.data
-            }, status=status.HTTP_200_OK)
+            return self.event_list_response(queryset)
             
         except Exception as e:
             return Response({
@@ -484,9 +758,11 @@ class EventViewSet(ModelViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @method_decorator(idempotent)
     def create(self, request, *args, **kwargs):
         """
         Create a new event
+        Honours the Idempotency-Key header (retries replay the first response)
         """
         try:
             serializer = self.get_serializer(data=request.data)
@@ -517,40 +793,19 @@ class EventViewSet(ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         """
         Retrieve a specific event with host reviews
+        
+        The payload is cached per version of everything it shows (detail_version());
+        one request recomputes it while concurrent ones wait, or get the expired
+        payload if nothing changed since (singleflight.py)
         """
         try:
             instance = self.get_object()
-            serializer = self.get_serializer(instance)
-            
-            # Get all reviews for the host across all their events
-            host_reviews = Review.objects.filter(
-                host_id=instance.organizer_id.id
-            ).order_by('-created_at')
-            
-            # Calculate host rating statistics
-            from django.db.models import Avg, Count
-            host_stats = host_reviews.aggregate(
-                average_rating=Avg('rating'),
-                total_reviews=Count('id')
+            payload = get_or_compute(
+                f'event-detail:{instance.id}:{request.build_absolute_uri("/")}',
+                lambda: self.detail_payload(instance),
+                version=self.detail_version(instance),
             )
-            
-            # Get rating distribution for host
-            host_rating_distribution = {}
-            for i in range(1, 6):
-                host_rating_distribution[str(i)] = host_reviews.filter(rating=i).count()
-            
-            return Response({
-                'success': True,
-                'event': serializer.data,
-                'host_reviews': {
-                    'statistics': {
-                        'average_rating': round(host_stats['average_rating'], 1) if host_stats['average_rating'] else 0,
-                        'total_reviews': host_stats['total_reviews'],
-                        'rating_distribution': host_rating_distribution
-                    },
-                    'reviews': ReviewSerializer(host_reviews[:10], many=True).data  # Latest 10 reviews
-                }
-            }, status=status.HTTP_200_OK)
+            return Response(payload, status=status.HTTP_200_OK)
             
         except Event.DoesNotExist:
             return Response({
@@ -564,6 +819,60 @@ class EventViewSet(ModelViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    def detail_version(self, instance):
+        """
+        Version of detail_payload(), read from the database so every worker sees an edit
+        at once: the event row (image changes touch its updated_at), its category, the
+        host's reviews and the day (is_upcoming/is_past)
+        """
+        reviews = Review.objects.filter(host_id=instance.organizer_id_id).aggregate(
+            count=Count('id'), latest=Max('updated_at')
+        )
+        category = instance.category
+        return repr((
+            instance.updated_at.isoformat(),
+            (category.id, category.name, category.description, category.icon) if category else None,
+            reviews['count'],
+            reviews['latest'].isoformat() if reviews['latest'] else None,
+            date.today().isoformat(),
+        ))
+    
+    def detail_payload(self, instance):
+        """
+        Response body of retrieve(): the event plus its host's review statistics
+        """
+        serializer = self.get_serializer(instance)
+        
+        # Get all reviews for the host across all their events
+        host_reviews = Review.objects.filter(
+            host_id=instance.organizer_id.id
+        ).order_by('-created_at')
+        
+        # Calculate host rating statistics
+        from django.db.models import Avg, Count
+        host_stats = host_reviews.aggregate(
+            average_rating=Avg('rating'),
+            total_reviews=Count('id')
+        )
+        
+        # Get rating distribution for host
+        host_rating_distribution = {}
+        for i in range(1, 6):
+            host_rating_distribution[str(i)] = host_reviews.filter(rating=i).count()
+        
+        return {
+            'success': True,
+            'event': serializer.data,
+            'host_reviews': {
+                'statistics': {
+                    'average_rating': round(host_stats['average_rating'], 1) if host_stats['average_rating'] else 0,
+                    'total_reviews': host_stats['total_reviews'],
+                    'rating_distribution': host_rating_distribution
+                },
+                'reviews': ReviewSerializer(host_reviews[:10], many=True).data  # Latest 10 reviews
+            }
+        }
+    
     def update(self, request, *args, **kwargs):
         """
         Update an event
@@ -606,25 +915,28 @@ class EventViewSet(ModelViewSet):
     def upcoming(self, request):
         """
         Get upcoming events
+        
+        Pages without the viewer's status are cached per query string and shared
+        by all users; when stale one request recomputes while the rest get the previous page
         """
         try:
-            today = date.today()
-            queryset = self.get_queryset().filter(start_date__gte=today)
+            # starts_at range scan on the active/starts_at index; same rows as start_date >= today
+            queryset = self.get_queryset().filter(starts_at__gte=start_of_day(date.today()))
             
-            # Apply additional filters
+            # Apply additional filters, soonest first unless ?ordering= is given
             queryset = self.filter_queryset(queryset)
+            if 'ordering' not in request.query_params:
+                queryset = queryset.order_by('starts_at', 'id')
             
-            page = self.paginate_queryset(queryset)
-            if page is not None:
-                serializer = EventListSerializer(page, many=True, context={'request': request})
-                return self.get_paginated_response(serializer.data)
+            if self.include_my_status():
+                return self.event_list_response(queryset)
             
-            serializer = EventListSerializer(queryset, many=True, context={'request': request})
-            return Response({
-                'success': True,
-                'count': queryset.count(),
-                'results': serializer.data
-            }, status=status.HTTP_200_OK)
+            payload = get_or_compute(
+                f'events-upcoming:{request.build_absolute_uri()}',
+                lambda: self.event_list_response(queryset).data,
+                version=f'{get_events_version()}:{date.today().isoformat()}',
+            )
+            return Response(payload, status=status.HTTP_200_OK)
             
         except Exception as e:
             return Response({
@@ -639,28 +951,125 @@ class EventViewSet(ModelViewSet):
         Get past events
         """
         try:
-            today = date.today()
-            queryset = self.get_queryset().filter(end_date__lt=today)
+            # Same rows as end_date < today; the redundant starts_at bound (an event never
+            # starts after it ends) lets the active/starts_at index serve the scan
+            day_start = start_of_day(date.today())
+            queryset = self.get_queryset().filter(ends_at__lt=day_start, starts_at__lt=day_start)
             
-            # Apply additional filters
+            # Apply additional filters, most recent first unless ?ordering= is given
+            queryset = self.filter_queryset(queryset)
+            if 'ordering' not in request.query_params:
+                queryset = queryset.order_by('-starts_at', '-id')
+            
+            return self.event_list_response(queryset)
+            
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'An error occurred while fetching past events',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def happening_now(self, request):
+        """
+        Get events in progress right now (started and not yet ended)
+        """
+        try:
+            now = timezone.now()
+            queryset = self.get_queryset().filter(starts_at__lte=now, ends_at__gt=now)
+            
+            # Apply additional filters, ending soonest first unless ?ordering= is given
             queryset = self.filter_queryset(queryset)
+            if 'ordering' not in request.query_params:
+                queryset = queryset.order_by('ends_at', 'id')
             
-            page = self.paginate_queryset(queryset)
-            if page is not None:
-                serializer = EventListSerializer(page, many=True, context={'request': request})
-                return self.get_paginated_response(serializer.data)
+            return self.event_list_response(queryset)
+            
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'An error occurred while fetching events happening now',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Get filter chip counts (category, city, state, date bucket) for the current filters
+        GET /api/events/facets/?city=Austin&search=jazz
+        
+        Accepts the same filters as the event list; counts come from one grouped query
+        and are cached per filter combination
+        """
+        try:
+            queryset = self.filter_queryset(self.get_queryset())
+            facets, cached = get_facets(queryset, request.query_params, date.today())
             
-            serializer = EventListSerializer(queryset, many=True, context={'request': request})
             return Response({
                 'success': True,
-                'count': queryset.count(),
-                'results': serializer.data
+                'cached': cached,
+                'facets': facets
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
             return Response({
                 'success': False,
-                'message': 'An error occurred while fetching past events',
+                'message': 'An error occurred while fetching event facets',
+                'error': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Get per-day event counts and ids for a city over a date window
+        GET /api/events/calendar/?city=Austin&start=2025-06-01&end=2025-06-30
+        
+        start defaults to today, end to start + 30 days; windows are limited to 366 days
+        Served from the in-memory calendar index, or the database while it warms up
+        """
+        try:
+            city = request.query_params.get('city')
+            if not city:
+                return Response({
+                    'success': False,
+                    'message': 'Please provide city parameter'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                start = date.fromisoformat(request.query_params.get('start') or date.today().isoformat())
+                end_param = request.query_params.get('end')
+                end = date.fromisoformat(end_param) if end_param else start + timedelta(days=30)
+            except ValueError:
+                return Response({
+                    'success': False,
+                    'message': 'start and end must be dates in YYYY-MM-DD format'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            if end < start or (end - start).days >= 366:
+                return Response({
+                    'success': False,
+                    'message': 'end must be on or after start, and the window at most 366 days'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            events_by_day, source = get_events_by_day(city, start, end)
+            
+            return Response({
+                'success': True,
+                'city': city,
+                'start': start,
+                'end': end,
+                'source': source,
+                'days': [
+                    {'date': day, 'count': len(event_ids), 'event_ids': event_ids}
+                    for day, event_ids in events_by_day.items()
+                ]
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response({
+                'success': False,
+                'message': 'An error occurred while fetching the event calendar',
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
@@ -689,17 +1098,7 @@ class EventViewSet(ModelViewSet):
             # Apply additional filters
             queryset = self.filter_queryset(queryset)
             
-            page = self.paginate_queryset(queryset)
-            if page is not None:
-                serializer = EventListSerializer(page, many=True, context={'request': request})
-                return self.get_paginated_response(serializer.data)
-            
-            serializer = EventListSerializer(queryset, many=True, context={'request': request})
-            return Response({
-                'success': True,
-                'count': queryset.count(),
-                'results': serializer.data
-            }, status=status.HTTP_200_OK)
+            return self.event_list_response(queryset)
             
         except Exception as e:
             return Response({
@@ -791,6 +1190,7 @@ class EventViewSet(ModelViewSet):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])  # Require authentication
 @csrf_exempt
+@idempotent
 def create_conversation(request):
     """
     Create a new conversation or add message to existing conversation
@@ -801,6 +1201,7 @@ def create_conversation(request):
     - If conversation doesn't exist: Creates conversation + adds message
     - If conversation already exists: Adds message to existing conversation
     - Works for both attendee (user) and host sending messages
+    - Honours the Idempotency-Key header (retries replay the first response)
     
     Note: user_id is extracted from authenticated user (JWT token)
     Authentication required: Yes
@@ -819,67 +1220,31 @@ def create_conversation(request):
                 'message': 'event_id and message are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get the event
+        # Find the user's conversation (as attendee or host) and add the message,
+        # creating the conversation on the first message (see inbox.send_message)
         try:
-            event = Event.objects.get(id=event_id)
+            conversation, created, message_count = send_message(event_id, authenticated_user, message_text)
         except Event.DoesNotExist:
             return Response({
                 'success': False,
                 'message': 'Event not found'
             }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Check if conversation already exists where authenticated user is participant
-        # User can be either the attendee (user) OR the organizer (host)
-        conversation = None
-        conversation_exists = False
-        
-        try:
-            # Try to find conversation where user is either the attendee or the host
-            conversation = Conversation.objects.get(
-                Q(event_id=event_id, user=authenticated_user) |
-                Q(event_id=event_id, host=authenticated_user)
-            )
-            conversation_exists = True
-            
-            # Add message to existing conversation
-            Message.objects.create(
-                conversation=conversation,
-                sender=authenticated_user,
-                text=message_text
-            )
-            
-        except Conversation.DoesNotExist:
-            # No existing conversation - create new one
-            # The authenticated user is requesting to join the event (they are the attendee)
-            conversation, created = Conversation.objects.get_or_create(
-                event=event,
-                user=authenticated_user,
-                host=event.organizer_id,
-                defaults={}
-            )
-            
-            # Add the initial message
-            Message.objects.create(
-                conversation=conversation,
-                sender=authenticated_user,
-                text=message_text
-            )
-            conversation_exists = False
-        
-        # Get the latest message count
-        message_count = conversation.messages.count()
+        conversation_exists = not created
         
         return Response({
             'success': True,
             'message': 'Message sent successfully' if conversation_exists else 'Conversation created successfully',
             'conversation_id': conversation.id,
-            'event_id': conversation.event.id,
-            'user_id': conversation.user.id,
-            'host_id': conversation.host.id,
+            'event_id': conversation.event_id,
+            'user_id': conversation.user_id,
+            'host_id': conversation.host_id,
             'message_count': message_count,
             'is_new_conversation': not conversation_exists
         }, status=status.HTTP_201_CREATED)
         
+    except ParseError:
+        # Malformed JSON body: DRF's handler answers 400
+        raise
     except Exception as e:
         return Response({
             'success': False,
@@ -905,15 +1270,18 @@ def get_conversation(request, conversation_id):
     """
     try:
         try:
-            conversation = Conversation.objects.select_related('event', 'user', 'host').prefetch_related('messages__sender').get(id=conversation_id)
+            conversation = Conversation.objects.select_related('event', 'user', 'host').get(id=conversation_id)
         except Conversation.DoesNotExist:
             return Response({
                 'success': False,
                 'message': 'Conversation not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Serialize messages with full sender details
-        messages_serializer = MessageSerializer(conversation.messages.all().order_by('created_at'), many=True)
+        # Serialize messages with full sender details; fetched through the conversation,
+        # which is_read/read_at read their watermark from
+        messages_serializer = MessageSerializer(
+            conversation.messages.select_related('sender').order_by('created_at'), many=True
+        )
         
         # Build comprehensive response
         return Response({
@@ -949,7 +1317,7 @@ def get_conversation(request, conversation_id):
                     'name': conversation.host.name,
                     'email': conversation.host.email
                 },
-                'message_count': conversation.messages.count()
+                'message_count': conversation.message_count
             },
             'messages': messages_serializer.data
         }, status=status.HTTP_200_OK)
@@ -986,8 +1354,6 @@ def get_conversation_by_event(request, event_id):
         try:
             conversation = Conversation.objects.select_related(
                 'event', 'user', 'host'
-            ).prefetch_related(
-                'messages__sender'
             ).get(
                 event_id=event_id,
                 user=authenticated_user
@@ -999,9 +1365,10 @@ def get_conversation_by_event(request, event_id):
                 'message': 'No conversation found for this event'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Serialize messages with full sender details
+        # Serialize messages with full sender details; fetched through the conversation,
+        # which is_read/read_at read their watermark from
         messages_serializer = MessageSerializer(
-            conversation.messages.all().order_by('created_at'), 
+            conversation.messages.select_related('sender').order_by('created_at'), 
             many=True
         )
         
@@ -1040,7 +1407,7 @@ def get_conversation_by_event(request, event_id):
                     'name': conversation.host.name,
                     'email': conversation.host.email
                 },
-                'message_count': conversation.messages.count()
+                'message_count': conversation.message_count
             },
             'messages': messages_serializer.data
         }, status=status.HTTP_200_OK)
@@ -1077,10 +1444,18 @@ def get_my_conversations(request):
         # Get authenticated user from JWT token
         authenticated_user = request.user
         
-        # Get all conversations where user is participant (as user or host)
-        conversations = Conversation.objects.filter(
+        # Get all conversations where user is participant (as user or host); the last
+        # message id is a subquery and the counts are columns, so no thread is loaded
+        conversations = list(Conversation.objects.filter(
             Q(user=authenticated_user) | Q(host=authenticated_user)
-        ).select_related('event', 'user', 'host').prefetch_related('messages')
+        ).select_related('event', 'user', 'host').annotate(
+            last_message_id=Subquery(
+                Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-id').values('id')[:1]
+            ),
+        ))
+        last_messages = Message.objects.select_related('sender').in_bulk(
+            [conversation.last_message_id for conversation in conversations if conversation.last_message_id]
+        )
         
         # Build enhanced response with sorting by latest message
         conversations_data = []
@@ -1095,13 +1470,13 @@ def get_my_conversations(request):
                 other_person = conversation.user
                 my_role = 'host'
             
-            # Get last message
-            last_message = conversation.messages.last()
+            last_message = last_messages.get(conversation.last_message_id)
+            if last_message is not None:
+                # is_read reads the watermark from its conversation
+                last_message.conversation = conversation
             
-            # Count unread messages (messages from other person that current user hasn't read)
-            unread_count = conversation.messages.filter(
-                is_read=False
-            ).exclude(sender=authenticated_user).count()
+            # Messages from the other person past the current user's read watermark
+            unread_count = getattr(conversation, conversation.unread_count_field(authenticated_user.id))
             
             conversations_data.append({
                 'conversation_id': conversation.id,
@@ -1130,7 +1505,7 @@ def get_my_conversations(request):
                     'created_at': last_message.created_at,
                     'is_read': last_message.is_read
                 } if last_message else None,
-                'message_count': conversation.messages.count(),
+                'message_count': conversation.message_count,
                 'unread_count': unread_count,
                 # Add timestamp for sorting
                 'last_message_time': last_message.created_at if last_message else conversation.created_at
@@ -1165,8 +1540,12 @@ def get_my_conversations(request):
 @permission_classes([IsAuthenticated])  # Require authentication
 def get_event_conversations(request, event_id):
     """
-    Get all conversations for a specific event with event details and images
-    GET /api/conversations/event/{event_id}/
+    Get conversations for a specific event with event details and images
+    GET /api/conversations/event/{event_id}/?status=pending&limit=20&cursor=...
+    
+    Newest request first, keyset paginated on (created_at, id), which never change, so
+    a conversation updated while paging can't be skipped or repeated; status filters by
+    request status and totals has the per-status counts for the whole event
     
     Note: Only the event organizer (host) can view this list
     Authentication required: Yes
@@ -1177,7 +1556,7 @@ def get_event_conversations(request, event_id):
         
         # Get the event first to include event details
         try:
-            event = Event.objects.prefetch_related('images').get(id=event_id)
+            event = Event.objects.select_related('organizer_id').prefetch_related('images').get(id=event_id)
         except Event.DoesNotExist:
             return Response({
                 'success': False,
@@ -1191,10 +1570,41 @@ def get_event_conversations(request, event_id):
                 'message': 'Only the event organizer can view the list of attendees'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Get all conversations for this event
-        conversations = Conversation.objects.filter(
-            event_id=event_id
-        ).select_related('event', 'user', 'host').prefetch_related('messages').order_by('-updated_at')
+        conversations = Conversation.objects.filter(event_id=event_id)
+        
+        # Per-status totals in one aggregate
+        totals = conversations.aggregate(
+            all=Count('id'),
+            **{choice: Count('id', filter=Q(status=choice)) for choice, _ in Conversation.STATUS_CHOICES}
+        )
+        
+        # Filter by status
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            if status_filter not in totals or status_filter == 'all':
+                return Response({
+                    'success': False,
+                    'message': 'status must be one of pending, confirmed, rejected'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            conversations = conversations.filter(status=status_filter)
+        
+        # Last message id as a subquery instead of a query per row (message_count is a column)
+        event_messages = Message.objects.filter(conversation=OuterRef('pk'))
+        conversations = conversations.select_related('user').annotate(
+            last_message_id=Subquery(event_messages.order_by('-created_at', '-id').values('id')[:1]),
+        )
+        
+        try:
+            page, pagination = paginate_keyset(request, conversations, ('-created_at', '-id'))
+        except InvalidCursor as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        last_messages = Message.objects.select_related('sender').in_bulk(
+            [conv.last_message_id for conv in page if conv.last_message_id]
+        )
         
         # Get event images
         images = []
@@ -1203,7 +1613,6 @@ def get_event_conversations(request, event_id):
             image_url = None
             if img.image:
                 # Build full URL
-                from django.conf import settings
                 image_url = f"{request.scheme}://{request.get_host()}{img.image.url}"
             
             images.append({
@@ -1217,9 +1626,8 @@ def get_event_conversations(request, event_id):
         
         # Build enhanced conversations list for host
         conversations_data = []
-        for conv in conversations:
-            # Get last message
-            last_message = conv.messages.last()
+        for conv in page:
+            last_message = last_messages.get(conv.last_message_id)
             
             conversations_data.append({
                 'conversation_id': conv.id,
@@ -1238,7 +1646,7 @@ def get_event_conversations(request, event_id):
                     'sender_id': last_message.sender.id,
                     'created_at': last_message.created_at
                 } if last_message else None,
-                'message_count': conv.messages.count()
+                'message_count': conv.message_count
             })
         
         # Prepare event details
@@ -1274,9 +1682,11 @@ def get_event_conversations(request, event_id):
         
         return Response({
             'success': True,
-            'count': len(conversations_data),
+            'count': totals[status_filter] if status_filter else totals['all'],
+            'totals': totals,
             'event': event_data,
-            'conversations': conversations_data
+            'conversations': conversations_data,
+            'pagination': pagination
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -1325,29 +1735,15 @@ def mark_messages_as_read(request):
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Verify user is part of the conversation
-        if authenticated_user not in [conversation.user, conversation.host]:
+        if authenticated_user.id not in [conversation.user_id, conversation.host_id]:
             return Response({
                 'success': False,
                 'message': 'You are not authorized to access this conversation'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Mark all unread messages from the OTHER person as read
-        # (Don't mark own messages as read)
-        from django.utils import timezone
-        
-        unread_messages = Message.objects.filter(
-            conversation=conversation,
-            is_read=False
-        ).exclude(sender=authenticated_user)
-        
-        # Get count before updating
-        unread_count = unread_messages.count()
-        
-        # Update all unread messages
-        unread_messages.update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        # Move the user's read watermark to the latest message: one conversation row
+        # written however long the thread is. Only messages from the OTHER person count.
+        unread_count = mark_read(conversation, authenticated_user)
         
         return Response({
             'success': True,
@@ -1355,6 +1751,9 @@ def mark_messages_as_read(request):
             'marked_count': unread_count
         }, status=status.HTTP_200_OK)
         
+    except ParseError:
+        # Malformed JSON body: DRF's handler answers 400
+        raise
     except Exception as e:
         return Response({
             'success': False,
@@ -1363,6 +1762,35 @@ def mark_messages_as_read(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_unread_count(request):
+    """
+    Get the unread badge totals for authenticated user
+    GET /api/conversations/unread-count/
+    
+    Returns unread messages across all conversations and the number of
+    conversations with unread messages, from the user's InboxCounter row
+    (a single lookup, instead of building the whole inbox)
+    Authentication required: Yes
+    """
+    try:
+        counter = get_inbox_counter(request.user)
+        
+        return Response({
+            'success': True,
+            'unread_messages': counter.unread_messages,
+            'unread_threads': counter.unread_threads
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'An error occurred while fetching unread counts',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # REMOVED: get_conversation_messages() - Redundant, messages already included in get_conversation()
 # GET /api/conversations/{conversation_id}/messages/ endpoint removed - use GET /api/conversations/{conversation_id}/ instead
 
@@ -1434,16 +1862,207 @@ def update_conversation_status(request, conversation_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Most decisions accepted by one bulk_update_conversation_status request
+BULK_STATUS_LIMIT = 200
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@csrf_exempt
+def bulk_update_conversation_status(request, event_id):
+    """
+    Confirm/reject several attendee requests of one event at once
+    POST /api/conversations/event/{event_id}/status/
+    Body: { "decisions": [{ "conversation_id": 1, "status": "confirmed" }, ...] }
+    
+    Applied in one transaction with the event row locked: requests moving away from
+    confirmed free their spots first, then confirmations are granted in request order
+    while spots remain. Per-item result: updated, unchanged, rejected_event_full,
+    not_found, invalid_status or duplicate
+    
+    Note: Only the host (event organizer) can update conversation status
+    Authentication required: Yes
+    """
+    try:
+        authenticated_user = request.user
+        decisions = request.data.get('decisions')
+        
+        if not isinstance(decisions, list) or not decisions:
+            return Response({
+                'success': False,
+                'message': 'decisions must be a non-empty list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(decisions) > BULK_STATUS_LIMIT:
+            return Response({
+                'success': False,
+                'message': f'At most {BULK_STATUS_LIMIT} decisions per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            decisions = [(int(item['conversation_id']), item.get('status')) for item in decisions]
+            # A missing status is reported per item (invalid_status); a list or object one
+            # would fail the set lookup below with a TypeError
+            if not all(new_status is None or isinstance(new_status, str) for _, new_status in decisions):
+                raise TypeError
+        except (TypeError, ValueError, KeyError):
+            return Response({
+                'success': False,
+                'message': 'Each decision needs an integer conversation_id and a status'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        valid_statuses = {choice for choice, _ in Conversation.STATUS_CHOICES}
+        
+        with transaction.atomic():
+            # Lock the event so concurrent decisions can't both take the last spot
+            try:
+                event = Event.objects.select_for_update().get(id=event_id)
+            except Event.DoesNotExist:
+                return Response({
+                    'success': False,
+                    'message': 'Event not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            if event.organizer_id_id != authenticated_user.id:
+                return Response({
+                    'success': False,
+                    'message': 'Only the event organizer can update conversation status'
+                }, status=status.HTTP_403_FORBIDDEN)
+            
+            current = dict(Conversation.objects.select_for_update().filter(
+                event_id=event.id,
+                id__in=[conversation_id for conversation_id, _ in decisions]
+            ).values_list('id', 'status'))
+            
+            results = {}
+            seen = set()
+            changes = {}  # conversation id -> new status
+            for index, (conversation_id, new_status) in enumerate(decisions):
+                if conversation_id in seen:
+                    results[index] = (conversation_id, None, 'duplicate')
+                    continue
+                seen.add(conversation_id)
+                if conversation_id not in current:
+                    results[index] = (conversation_id, None, 'not_found')
+                elif new_status not in valid_statuses:
+                    results[index] = (conversation_id, current[conversation_id], 'invalid_status')
+                elif new_status == current[conversation_id]:
+                    results[index] = (conversation_id, new_status, 'unchanged')
+                elif new_status != 'confirmed':
+                    results[index] = (conversation_id, new_status, 'updated')
+                    changes[conversation_id] = new_status
+            
+            # Spots freed by this batch are available to its confirmations
+            released = sum(1 for conversation_id in changes if current[conversation_id] == 'confirmed')
+            spots_left = max(0, event.max_attendees - event.confirmed_attendees) + released
+            confirmed = 0
+            for index, (conversation_id, new_status) in enumerate(decisions):
+                if index in results:
+                    continue
+                if spots_left > 0:
+                    spots_left -= 1
+                    confirmed += 1
+                    results[index] = (conversation_id, 'confirmed', 'updated')
+                    changes[conversation_id] = 'confirmed'
+                else:
+                    results[index] = (conversation_id, current[conversation_id], 'rejected_event_full')
+            
+            # Duplicates report the status the batch left the conversation in
+            for index, (conversation_id, _, result) in list(results.items()):
+                if result == 'duplicate':
+                    results[index] = (conversation_id, changes.get(conversation_id, current.get(conversation_id)), result)
+            
+            # One UPDATE per target status, and one capacity adjustment
+            now = timezone.now()
+            by_status = {}
+            for conversation_id, new_status in changes.items():
+                by_status.setdefault(new_status, []).append(conversation_id)
+            for new_status, conversation_ids in by_status.items():
+                fields = {'status': new_status, 'updated_at': now}
+                if new_status == 'confirmed':
+                    fields['confirmed_at'] = now
+                elif new_status == 'rejected':
+                    fields['rejected_at'] = now
+                Conversation.objects.filter(id__in=conversation_ids).update(**fields)
+            
+            # Dashboard counters: update() skips the signals that normally maintain them
+            stats_deltas = {}
+            for conversation_id, new_status in changes.items():
+                for field, change in status_deltas(current[conversation_id], new_status).items():
+                    stats_deltas[field] = stats_deltas.get(field, 0) + change
+            adjust_event_stats(event.id, **stats_deltas)
+            
+            delta = confirmed - released
+            if delta:
+                Event.objects.filter(id=event.id).update(
+                    confirmed_attendees=Greatest(F('confirmed_attendees') + delta, 0),
+                    updated_at=now
+                )
+                # update() skips the post_save receivers; has_spots facet counts depend on capacity
+                transaction.on_commit(bump_events_version)
+                event.refresh_from_db(fields=['confirmed_attendees', 'updated_at'])
+        
+        return Response({
+            'success': True,
+            'message': f'{len(changes)} conversations updated',
+            'results': [
+                {'conversation_id': conversation_id, 'status': result_status, 'result': result}
+                for conversation_id, result_status, result in (results[index] for index in range(len(decisions)))
+            ],
+            'event': {
+                'id': event.id,
+                'title': event.title,
+                'confirmed_attendees': event.confirmed_attendees,
+                'available_spots': event.available_spots,
+                'is_full': event.is_full
+            }
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'An error occurred while updating conversation statuses',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # ==================== REVIEW ENDPOINTS ====================
 
+# Keyset orderings for the review listings (?sort=); each ends in id so cursors are unambiguous
+REVIEW_ORDERINGS = {
+    'newest': ('-created_at', '-id'),
+    'rating': ('-rating', '-created_at', '-id'),
+}
+
+
+def get_review_ordering(request):
+    return REVIEW_ORDERINGS.get(request.query_params.get('sort'), REVIEW_ORDERINGS['newest'])
+
+
+def review_statistics(reviews):
+    """Average, total and 1-5 distribution of a review queryset in a single aggregate query"""
+    stats = reviews.aggregate(
+        average_rating=Avg('rating'),
+        total_reviews=Count('id'),
+        **{f'rating_{i}': Count('id', filter=Q(rating=i)) for i in range(1, 6)}
+    )
+    return {
+        'average_rating': round(stats['average_rating'], 2) if stats['average_rating'] else 0,
+        'total_reviews': stats['total_reviews'],
+        'rating_distribution': {str(i): stats[f'rating_{i}'] for i in range(1, 6)}
+    }
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @csrf_exempt
+@idempotent
 def create_review(request):
     """
     Create a new review for an event and host
     POST /api/reviews/
     Body: { "event_id": 1, "host_id": 2 (optional), "rating": 5, "comment": "Great event!" }
+    Honours the Idempotency-Key header (retries replay the first response)
     """
     try:
         serializer = ReviewCreateSerializer(data=request.data, context={'request': request})
@@ -1475,33 +2094,32 @@ def create_review(request):
 @permission_classes([AllowAny])
 def get_event_reviews(request, event_id):
     """
-    Get all reviews for a specific event
-    GET /api/reviews/event/{event_id}/
+    Get reviews for a specific event, newest first
+    GET /api/reviews/event/{event_id}/?limit=20&cursor=...&sort=newest|rating
     """
     try:
         # Check if event exists
         try:
-            event = Event.objects.get(id=event_id)
+            event = Event.objects.cached().get(id=event_id)
         except Event.DoesNotExist:
             return Response({
                 'success': False,
                 'message': 'Event not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Get all reviews for the event
-        reviews = Review.objects.filter(event_id=event_id).order_by('-created_at')
+        # Get reviews for the event, with reviewer/event/host joined for the serializer
+        reviews = Review.objects.filter(event_id=event_id).select_related('reviewer', 'event', 'host')
         
-        # Calculate rating statistics
-        from django.db.models import Avg, Count
-        stats = reviews.aggregate(
-            average_rating=Avg('rating'),
-            total_reviews=Count('id')
-        )
+        # Rating statistics over every review, not just this page
+        statistics = review_statistics(reviews)
         
-        # Get rating distribution
-        rating_distribution = {}
-        for i in range(1, 6):
-            rating_distribution[str(i)] = reviews.filter(rating=i).count()
+        try:
+            page, pagination = paginate_keyset(request, reviews, get_review_ordering(request))
+        except InvalidCursor as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'success': True,
@@ -1509,12 +2127,9 @@ def get_event_reviews(request, event_id):
                 'id': event.id,
                 'title': event.title
             },
-            'statistics': {
-                'average_rating': round(stats['average_rating'], 2) if stats['average_rating'] else 0,
-                'total_reviews': stats['total_reviews'],
-                'rating_distribution': rating_distribution
-            },
-            'reviews': ReviewSerializer(reviews, many=True).data
+            'statistics': statistics,
+            'reviews': ReviewSerializer(page, many=True).data,
+            'pagination': pagination
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -1529,33 +2144,32 @@ def get_event_reviews(request, event_id):
 @permission_classes([AllowAny])
 def get_host_reviews(request, host_id):
     """
-    Get all reviews for a specific host (all their events)
-    GET /api/reviews/host/{host_id}/
+    Get reviews for a specific host (all their events), newest first
+    GET /api/reviews/host/{host_id}/?limit=20&cursor=...&sort=newest|rating
     """
     try:
         # Check if host exists
         try:
-            host = User.objects.get(id=host_id)
+            host = User.objects.cached().get(id=host_id)
         except User.DoesNotExist:
             return Response({
                 'success': False,
                 'message': 'Host not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Get all reviews for the host
-        reviews = Review.objects.filter(host_id=host_id).order_by('-created_at')
+        # Get reviews for the host, with reviewer/event/host joined for the serializer
+        reviews = Review.objects.filter(host_id=host_id).select_related('reviewer', 'event', 'host')
         
-        # Calculate rating statistics
-        from django.db.models import Avg, Count
-        stats = reviews.aggregate(
-            average_rating=Avg('rating'),
-            total_reviews=Count('id')
-        )
+        # Rating statistics over every review, not just this page
+        statistics = review_statistics(reviews)
         
-        # Get rating distribution
-        rating_distribution = {}
-        for i in range(1, 6):
-            rating_distribution[str(i)] = reviews.filter(rating=i).count()
+        try:
+            page, pagination = paginate_keyset(request, reviews, get_review_ordering(request))
+        except InvalidCursor as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'success': True,
@@ -1564,12 +2178,9 @@ def get_host_reviews(request, host_id):
                 'name': host.name,
                 'email': host.email
             },
-            'statistics': {
-                'average_rating': round(stats['average_rating'], 2) if stats['average_rating'] else 0,
-                'total_reviews': stats['total_reviews'],
-                'rating_distribution': rating_distribution
-            },
-            'reviews': ReviewSerializer(reviews, many=True).data
+            'statistics': statistics,
+            'reviews': ReviewSerializer(page, many=True).data,
+            'pagination': pagination
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -1584,19 +2195,28 @@ def get_host_reviews(request, host_id):
 @permission_classes([IsAuthenticated])
 def get_my_reviews(request):
     """
-    Get all reviews written by the authenticated user
-    GET /api/reviews/my-reviews/
+    Get reviews written by the authenticated user, newest first
+    GET /api/reviews/my-reviews/?limit=20&cursor=...&sort=newest|rating
     """
     try:
         user = request.user
         
-        # Get all reviews by the user
-        reviews = Review.objects.filter(reviewer_id=user.id).order_by('-created_at')
+        # Get reviews by the user, with reviewer/event/host joined for the serializer
+        reviews = Review.objects.filter(reviewer_id=user.id).select_related('reviewer', 'event', 'host')
+        
+        try:
+            page, pagination = paginate_keyset(request, reviews, get_review_ordering(request))
+        except InvalidCursor as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'success': True,
             'message': f'Found {reviews.count()} reviews',
-            'reviews': ReviewSerializer(reviews, many=True).data
+            'reviews': ReviewSerializer(page, many=True).data,
+            'pagination': pagination
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -1716,7 +2336,7 @@ def get_event_rating_stats(request, event_id):
     try:
         # Check if event exists
         try:
-            event = Event.objects.get(id=event_id)
+            event = Event.objects.cached().get(id=event_id)
         except Event.DoesNotExist:
             return Response({
                 'success': False,
@@ -1727,25 +2347,15 @@ def get_event_rating_stats(request, event_id):
         reviews = Review.objects.filter(event_id=event_id)
         
         # Calculate statistics
-        from django.db.models import Avg, Count
-        stats = reviews.aggregate(
-            average_rating=Avg('rating'),
-            total_reviews=Count('id')
-        )
-        
-        # Get rating distribution
-        rating_distribution = {}
-        for i in range(1, 6):
-            count = reviews.filter(rating=i).count()
-            rating_distribution[str(i)] = count
+        statistics = review_statistics(reviews)
         
         return Response({
             'success': True,
             'event_id': event.id,
             'event_title': event.title,
-            'average_rating': round(stats['average_rating'], 2) if stats['average_rating'] else 0,
-            'total_reviews': stats['total_reviews'],
-            'rating_distribution': rating_distribution
+            'average_rating': statistics['average_rating'],
+            'total_reviews': statistics['total_reviews'],
+            'rating_distribution': statistics['rating_distribution']
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -1766,7 +2376,7 @@ def get_host_rating_stats(request, host_id):
     try:
         # Check if host exists
         try:
-            host = User.objects.get(id=host_id)
+            host = User.objects.cached().get(id=host_id)
         except User.DoesNotExist:
             return Response({
                 'success': False,
@@ -1777,17 +2387,7 @@ def get_host_rating_stats(request, host_id):
         reviews = Review.objects.filter(host_id=host_id)
         
         # Calculate statistics
-        from django.db.models import Avg, Count
-        stats = reviews.aggregate(
-            average_rating=Avg('rating'),
-            total_reviews=Count('id')
-        )
-        
-        # Get rating distribution
-        rating_distribution = {}
-        for i in range(1, 6):
-            count = reviews.filter(rating=i).count()
-            rating_distribution[str(i)] = count
+        statistics = review_statistics(reviews)
         
         # Get number of events hosted
         events_count = Event.objects.filter(organizer_id=host_id).count()
@@ -1797,10 +2397,10 @@ def get_host_rating_stats(request, host_id):
             'host_id': host.id,
             'host_name': host.name,
             'host_email': host.email,
-            'average_rating': round(stats['average_rating'], 2) if stats['average_rating'] else 0,
-            'total_reviews': stats['total_reviews'],
+            'average_rating': statistics['average_rating'],
+            'total_reviews': statistics['total_reviews'],
             'total_events_hosted': events_count,
-            'rating_distribution': rating_distribution
+            'rating_distribution': statistics['rating_distribution']
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -1824,7 +2424,7 @@ def check_can_review(request, event_id):
         
         # Check if event exists
         try:
-            event = Event.objects.get(id=event_id)
+            event = Event.objects.cached().get(id=event_id)
         except Event.DoesNotExist:
             return Response({
                 'success': False,
@@ -1871,4 +2471,88 @@ def check_can_review(request, event_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Most event ids accepted by one check_can_review_batch request
+CAN_REVIEW_BATCH_LIMIT = 100
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@csrf_exempt
+def check_can_review_batch(request):
+    """
+    Check review eligibility for several events at once
+    POST /api/reviews/can-review/
+    Body: { "event_ids": [1, 2, 3] }
+    Returns one result per event id, in request order:
+    { "event_id": 1, "can_review": true/false, "reason": "...", "existing_review_id": null, "has_attended": true }
+    
+    Uses three queries whatever the number of events
+    """
+    try:
+        user = request.user
+        event_ids = request.data.get('event_ids')
+        
+        if not isinstance(event_ids, list) or not event_ids:
+            return Response({
+                'success': False,
+                'message': 'event_ids must be a non-empty list'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            event_ids = list(dict.fromkeys(int(event_id) for event_id in event_ids))
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'message': 'event_ids must contain integers'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(event_ids) > CAN_REVIEW_BATCH_LIMIT:
+            return Response({
+                'success': False,
+                'message': f'At most {CAN_REVIEW_BATCH_LIMIT} event_ids per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Organizer of every requested event, the user's reviews and confirmed requests among them
+        organizers = dict(Event.objects.filter(id__in=event_ids).values_list('id', 'organizer_id'))
+        review_ids = dict(
+            Review.objects.filter(event_id__in=event_ids, reviewer_id=user.id).values_list('event_id', 'id')
+        )
+        attended = set(Conversation.objects.filter(
+            event_id__in=event_ids,
+            user_id=user.id,
+            status='confirmed'
+        ).values_list('event_id', flat=True))
+        
+        results = []
+        for event_id in event_ids:
+            result = {
+                'event_id': event_id,
+                'can_review': False,
+                'existing_review_id': review_ids.get(event_id),
+                'has_attended': event_id in attended
+            }
+            if event_id not in organizers:
+                result['reason'] = 'Event not found'
+            elif organizers[event_id] == user.id:
+                result['reason'] = 'You cannot review your own event'
+            elif event_id in review_ids:
+                result['reason'] = 'You have already reviewed this event'
+            else:
+                result['can_review'] = True
+                result['reason'] = 'You can review this event'
+            results.append(result)
+        
+        return Response({
+            'success': True,
+            'results': results
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'message': 'An error occurred while checking review eligibility',
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
     
\ No newline at end of file